@@ -0,0 +1,63 @@
+# coding=utf-8
+"""
+Compare multi-criteria searches on a grid with three-element edge costs: astar() with SumTuple and
+MaxFirstSumTuple costs, astar() with the equivalent cost_vector() classes, and MultiCostGraph.dijkstra().
+
+    python benchmarks/bench_costs.py [grid size]
+"""
+import random
+import sys
+from time import perf_counter
+
+from mumblecode.graphs import MaxFirstSumTuple, MultiCostGraph, SumTuple, astar, cost_vector
+
+directions = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+
+def grid_costs(size, rng):
+    """(danger, distance, turns)-style costs for every edge of a size x size grid"""
+    costs = {}
+    for x in range(size):
+        for y in range(size):
+            out = costs[x, y] = []
+            for dx, dy in directions:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < size and 0 <= ny < size:
+                    out.append(((nx, ny), (rng.randint(0, 3), rng.randint(1, 9), rng.randint(0, 1))))
+    return costs
+
+
+def timed(fn):
+    start = perf_counter()
+    result = fn()
+    return perf_counter() - start, result
+
+
+def main(size=200):
+    rng = random.Random(0)
+    raw = grid_costs(size, rng)
+    goal = (size - 1, size - 1)
+    print("{0}x{0} grid, three-element costs".format(size))
+    for max_first, tuple_class in ((False, SumTuple), (True, MaxFirstSumTuple)):
+        vector = cost_vector(3, max_first)
+        as_tuples = {node: [(nb, tuple_class(c)) for nb, c in out] for node, out in raw.items()}
+        as_vectors = {node: [(nb, vector(c)) for nb, c in out] for node, out in raw.items()}
+        graph = MultiCostGraph.from_edges(
+            ((node, nb, c) for node, out in raw.items() for nb, c in out), max_first=max_first
+        )
+        cases = [
+            ("astar " + tuple_class.__name__, lambda: next(astar([(0, 0)], lambda n: n == goal, as_tuples.get))),
+            ("astar " + vector.__name__, lambda: next(astar([(0, 0)], lambda n: n == goal, as_vectors.get))),
+            ("MultiCostGraph", lambda: graph.dijkstra_simple((0, 0), goal)),
+        ]
+        results = []
+        for name, fn in cases:
+            seconds, (cost, _) = timed(fn)
+            results.append(cost)
+            print("{:<28} {:>8.3f}s  cost {}".format(name, seconds, tuple(cost)))
+        assert len(set(results)) == 1
+        print()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
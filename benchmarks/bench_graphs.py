@@ -0,0 +1,149 @@
+# coding=utf-8
+"""
+Compare astar() over an edgefinder against CompiledGraph searches on open grids, and count how many nodes ALT
+landmark heuristics save expanding on a road-like grid with random edge costs, and how fast a contraction
+hierarchy answers queries on the same kind of grid, including origin x destination distance tables, and how
+batch_paths() scales queries over worker processes.
+
+    python benchmarks/bench_graphs.py [grid size]
+"""
+import random
+import sys
+from time import perf_counter
+
+from mumblecode.contraction import ContractionHierarchy
+from mumblecode.graphs import CompiledGraph, Landmarks, astar, batch_paths, distance_matrix
+
+directions = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+
+def grid_edgefinder(size):
+    def edgefinder(node):
+        x, y = node
+        for dx, dy in directions:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size:
+                yield (nx, ny), 1
+    return edgefinder
+
+
+def timed(fn):
+    start = perf_counter()
+    result = fn()
+    return perf_counter() - start, result
+
+
+def main(size=300):
+    edgefinder = grid_edgefinder(size)
+    goal = (size - 1, size - 1)
+
+    def manhattan(node):
+        return goal[0] - node[0] + goal[1] - node[1]
+
+    compile_time, graph = timed(lambda: CompiledGraph.from_edgefinder([(0, 0)], edgefinder))
+    print("{}x{} grid, {} nodes, {} edges, compiled in {:.3f}s".format(
+        size, size, len(graph), graph.edge_count(), compile_time))
+    cases = [
+        ("astar dijkstra", lambda: next(astar([(0, 0)], lambda n: n == goal, edgefinder))),
+        ("compiled dijkstra", lambda: next(graph.astar([(0, 0)], lambda n: n == goal))),
+        ("astar manhattan", lambda: next(astar([(0, 0)], lambda n: n == goal, edgefinder, manhattan))),
+        ("compiled manhattan", lambda: next(graph.astar([(0, 0)], lambda n: n == goal, manhattan))),
+    ]
+    for name, fn in cases:
+        seconds, (cost, _) = timed(fn)
+        print("{:<20} {:>8.3f}s  cost {}".format(name, seconds, cost))
+
+    landmark_expansions(size)
+    # preprocessing is much slower than searching, so keep this one to at most 10000 nodes
+    hierarchy_queries(min(size, 100))
+    batch_queries(min(size, 100))
+
+
+def road_graph(size, rng):
+    """Grid with random costs, so there is no useful geometric heuristic"""
+    edges = {}
+    for x in range(size):
+        for y in range(size):
+            edges[x, y] = []
+    for (x, y), out in edges.items():
+        for dx, dy in directions:
+            nb = (x + dx, y + dy)
+            if nb in edges:
+                out.append((nb, rng.randint(1, 10)))
+    return edges
+
+
+def landmark_expansions(size, queries=20):
+    rng = random.Random(0)
+    edges = road_graph(size, rng)
+    expansions = [0]
+
+    def edgefinder(node):
+        expansions[0] += 1
+        return edges[node]
+
+    graph = CompiledGraph.from_edges((n, nb, c) for n, out in edges.items() for nb, c in out)
+    pairs = [(rng.choice(graph.nodes), rng.choice(graph.nodes)) for _ in range(queries)]
+    print()
+    print("{} random queries on a {}x{} grid with random costs".format(queries, size, size))
+    for name, make_heuristic in [
+        ("dijkstra", None),
+        ("ALT farthest x8", Landmarks.build(graph, num_landmarks=8, rng=random.Random(1)).heuristic),
+        ("ALT avoid x8", Landmarks.build(graph, num_landmarks=8, strategy='avoid', rng=random.Random(1)).heuristic),
+    ]:
+        expansions[0] = 0
+        start = perf_counter()
+        for a, b in pairs:
+            heuristic = make_heuristic(b) if make_heuristic else None
+            next(astar([a], lambda n: n == b, edgefinder, heuristic))
+        print("{:<20} {:>10} expansions {:>8.3f}s".format(name, expansions[0], perf_counter() - start))
+
+
+def hierarchy_queries(size, queries=200):
+    rng = random.Random(0)
+    edges = road_graph(size, rng)
+    graph = CompiledGraph.from_edges((n, nb, c) for n, out in edges.items() for nb, c in out)
+    build_time, hierarchy = timed(lambda: ContractionHierarchy.build(graph))
+    pairs = [(rng.choice(graph.nodes), rng.choice(graph.nodes)) for _ in range(queries)]
+    print()
+    print("contraction hierarchy on a {}x{} grid with random costs: built in {:.3f}s, {} edges".format(
+        size, size, build_time, hierarchy.edge_count()))
+    for name, query in [
+        ("compiled dijkstra", graph.dijkstra_simple),
+        ("hierarchy query", hierarchy.query),
+        ("hierarchy distance", hierarchy.distance),
+    ]:
+        seconds, _ = timed(lambda: [query(a, b) for a, b in pairs])
+        print("{:<20} {:>10.1f}us per query".format(name, seconds / queries * 1e6))
+
+    table = 100
+    origins = [rng.choice(graph.nodes) for _ in range(table)]
+    destinations = [rng.choice(graph.nodes) for _ in range(table)]
+    print()
+    print("{0}x{0} distance matrix".format(table))
+    for name, build in [
+        ("dijkstra per origin", lambda: distance_matrix(origins, destinations, graph.edgefinder)),
+        ("dijkstra 4 processes", lambda: distance_matrix(origins, destinations, graph.edgefinder, workers=4)),
+        ("hierarchy buckets", lambda: hierarchy.distance_matrix(origins, destinations)),
+    ]:
+        seconds, _ = timed(build)
+        print("{:<20} {:>8.3f}s".format(name, seconds))
+
+
+def batch_queries(size, queries=400):
+    rng = random.Random(0)
+    edges = road_graph(size, rng)
+    graph = CompiledGraph.from_edges((n, nb, c) for n, out in edges.items() for nb, c in out)
+    batch = [(i, rng.choice(graph.nodes), rng.choice(graph.nodes)) for i in range(queries)]
+    print()
+    print("{} batched queries on a {}x{} grid with random costs".format(queries, size, size))
+    for workers in (None, 2, 4):
+        for costs_only in (False, True):
+            seconds, _ = timed(lambda: list(batch_paths(batch, graph, workers=workers, costs_only=costs_only,
+                                                        chunksize=25)))
+            print("{:<20} {:>8.3f}s".format("{} workers{}".format(workers or 1, ", costs" if costs_only else ""),
+                                           seconds))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
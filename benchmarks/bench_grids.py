@@ -0,0 +1,61 @@
+# coding=utf-8
+"""
+Compare astar() over a tuple-node edgefinder against Grid.astar() and Grid.jump_point_search() on 8-connected
+maps: one with scattered single-cell obstacles and one of open space with random straight walls.
+
+    python benchmarks/bench_grids.py [map size]
+"""
+import random
+import sys
+from time import perf_counter
+
+from mumblecode.graphs import astar
+from mumblecode.grids import Grid
+
+
+def scattered(size, rng, density=0.2):
+    return bytearray(rng.random() < density for _ in range(size * size))
+
+
+def walls(size, rng, count=None):
+    blocked = bytearray(size * size)
+    for _ in range(count or size // 10):
+        x, y = rng.randrange(size), rng.randrange(size)
+        if rng.random() < 0.5:
+            length = rng.randrange(size // 4)
+            for i in range(x, min(x + length, size)):
+                blocked[y * size + i] = 1
+        else:
+            length = rng.randrange(size // 4)
+            for i in range(y, min(y + length, size)):
+                blocked[i * size + x] = 1
+    return blocked
+
+
+def timed(fn):
+    start = perf_counter()
+    result = fn()
+    return perf_counter() - start, result
+
+
+def main(size=1000):
+    rng = random.Random(0)
+    start, goal = (0, 0), (size - 1, size - 1)
+    for name, blocked in (("scattered obstacles", scattered(size, rng)), ("random walls", walls(size, rng))):
+        blocked[0] = blocked[-1] = 0
+        grid = Grid(size, size, blocked, diagonal=True)
+        print("{0}x{0} map, {1}".format(size, name))
+        cases = [
+            ("astar edgefinder", lambda: next(
+                astar([start], lambda n: n == goal, grid.edgefinder, grid.heuristic(goal)), (None, ()))),
+            ("Grid.astar", lambda: grid.astar(start, goal)),
+            ("Grid.jump_point_search", lambda: grid.jump_point_search(start, goal)),
+        ]
+        for case, fn in cases:
+            seconds, (cost, _) = timed(fn)
+            print("{:<24} {:>8.3f}s  cost {}".format(case, seconds, cost if cost is None else round(cost, 3)))
+        print()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,53 @@
+# coding=utf-8
+"""
+Compare IntervalMapping against BlockedIntervalMapping for random updates and point lookups at growing sizes, to
+find where the blocked storage starts to pay off.
+
+    python benchmarks/bench_intervals.py [largest size]
+"""
+import random
+import sys
+from time import perf_counter
+
+from intervaltree import Interval
+
+from mumblecode.collections import BlockedIntervalMapping, IntervalMapping
+
+
+def timed(fn):
+    start = perf_counter()
+    result = fn()
+    return perf_counter() - start, result
+
+
+def updates(mapping, spots):
+    for begin, value in spots:
+        mapping[begin:begin + 5] = value
+
+
+def lookups(mapping, points):
+    for point in points:
+        mapping[point]
+
+
+def main(largest=1000000):
+    rng = random.Random(0)
+    print("{:>10}  {:>22}  {:>22}".format("intervals", "2000 updates", "20000 lookups"))
+    size = 1000
+    while size <= largest:
+        intervals = [Interval(i * 10, i * 10 + 10, i) for i in range(size)]
+        spots = [(rng.randrange(size * 10), -i) for i in range(2000)]
+        points = [rng.randrange(size * 10) for _ in range(20000)]
+        row = []
+        for cls in (IntervalMapping, BlockedIntervalMapping):
+            mapping = cls.from_intervals(intervals, presorted=True)
+            row.append((timed(lambda: updates(mapping, spots))[0], timed(lambda: lookups(mapping, points))[0]))
+        (list_update, list_lookup), (blocked_update, blocked_lookup) = row
+        print("{:>10}  {:>7.3f}s vs {:>7.3f}s x{:<4.1f}  {:>7.3f}s vs {:>7.3f}s x{:<4.1f}".format(
+            size, list_update, blocked_update, list_update / blocked_update,
+            list_lookup, blocked_lookup, list_lookup / blocked_lookup))
+        size *= 10
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
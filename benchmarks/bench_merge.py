@@ -0,0 +1,106 @@
+# coding=utf-8
+"""
+Compare collate/merge against the heap-based implementation they replaced and
+against heapq.merge, for a range of iterator counts.
+
+    python benchmarks/bench_merge.py [total items]
+"""
+from collections import namedtuple
+from heapq import heapify, heappush, heappop, merge as heapq_merge
+from itertools import count
+from operator import itemgetter
+import random
+import sys
+from time import perf_counter
+
+from mumblecode.iterables import collate
+
+
+class _MaxHeapItem(namedtuple("MaxHeapItemTuple", "item")):
+    def __lt__(self, other):
+        return other.item < self.item
+
+
+def heap_collate(iterables, *, reverse=False):
+    """The previous heapq-based collate, kept here as a baseline"""
+    wrap = _MaxHeapItem if reverse else lambda x: x
+    heap = []
+    c = count()
+    for feed in iterables:
+        it = iter(feed)
+        try:
+            item = next(it)
+        except StopIteration:
+            continue
+        else:
+            heap.append((wrap(item), next(c), item, it))
+    heapify(heap)
+
+    while heap:
+        _wrapped_item, iter_index, item, top_iter = heappop(heap)
+        yield item
+        try:
+            new_item = next(top_iter)
+            heappush(heap, (wrap(new_item), iter_index, new_item, top_iter))
+        except StopIteration:
+            pass
+
+
+class Counted(object):
+    """Comparable wrapper that counts comparisons, standing in for costly keys"""
+    __slots__ = ('v',)
+    comparisons = 0
+
+    def __init__(self, v):
+        self.v = v
+
+    def __lt__(self, other):
+        Counted.comparisons += 1
+        return self.v < other.v
+
+    def __eq__(self, other):
+        Counted.comparisons += 1
+        return self.v == other.v
+
+
+def make_shards(k, total, rng, reverse=False):
+    per_shard = total // k
+    return [sorted((rng.random() for _ in range(per_shard)), reverse=reverse) for _ in range(k)]
+
+
+def run(name, make_iter):
+    Counted.comparisons = 0
+    start = perf_counter()
+    for _ in make_iter():
+        pass
+    return name, perf_counter() - start, Counted.comparisons
+
+
+def main(total=200000):
+    rng = random.Random(0)
+    print("{:>5} {:<22} {:>9} {:>13}".format("k", "implementation", "seconds", "comparisons"))
+    for k in (2, 8, 64, 256, 1024):
+        floats = make_shards(k, total, rng)
+        floats_rev = [shard[::-1] for shard in floats]
+        objects = [[Counted(x) for x in shard] for shard in floats]
+        pairs = [[(x, i) for x in shard] for i, shard in enumerate(floats)]
+        cases = [
+            run("heap_collate", lambda: heap_collate(floats)),
+            run("heapq.merge", lambda: heapq_merge(*floats)),
+            run("collate", lambda: collate(floats)),
+            run("heap_collate reverse", lambda: heap_collate(floats_rev, reverse=True)),
+            run("heapq.merge reverse", lambda: heapq_merge(*floats_rev, reverse=True)),
+            run("collate reverse", lambda: collate(floats_rev, reverse=True)),
+            run("heapq.merge key=", lambda: heapq_merge(*pairs, key=itemgetter(0))),
+            run("collate key=", lambda: collate(pairs, key=itemgetter(0))),
+            run("heap_collate objects", lambda: heap_collate(objects)),
+            run("heapq.merge objects", lambda: heapq_merge(*objects)),
+            run("collate objects", lambda: collate(objects)),
+        ]
+        for name, seconds, comparisons in cases:
+            print("{:>5} {:<22} {:>9.3f} {:>13}".format(k, name, seconds, comparisons or ''))
+        print()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
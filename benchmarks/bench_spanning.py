@@ -0,0 +1,43 @@
+# coding=utf-8
+"""
+Time prim(), kruskal() and wilson() on a random sparse graph with about a million undirected edges.
+
+    python benchmarks/bench_spanning.py [edges]
+"""
+import random
+import sys
+from time import perf_counter
+
+from mumblecode.graphs import CompiledGraph, kruskal, prim, wilson
+
+
+def timed(fn):
+    start = perf_counter()
+    result = fn()
+    return perf_counter() - start, result
+
+
+def main(num_edges=1000000):
+    rng = random.Random(0)
+    size = num_edges // 4
+    edges = [(rng.randrange(size), rng.randrange(size), rng.randint(1, 1000)) for _ in range(num_edges)]
+    adjacency = {node: [] for node in range(size)}
+    for a, b, cost in edges:
+        adjacency[a].append((b, cost))
+        adjacency[b].append((a, cost))
+    compile_time, graph = timed(lambda: CompiledGraph.from_edgefinder(range(size), adjacency.__getitem__))
+    print("{} nodes, {} undirected edges; compiled both directions in {:.3f}s".format(size, num_edges, compile_time))
+
+    cases = [
+        ("prim over edgefinder", lambda: prim(range(size), adjacency.__getitem__)),
+        ("kruskal over edge list", lambda: kruskal(edges, nodes=range(size))),
+        ("kruskal over compiled", lambda: kruskal(graph)),
+        ("wilson over compiled", lambda: wilson(graph, rng=random.Random(1))),
+    ]
+    for name, fn in cases:
+        seconds, tree = timed(fn)
+        print("{:<24} {:>8.3f}s  {} trees, total cost {}".format(name, seconds, len(tree.roots()), tree.total_cost()))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,309 @@
+# coding=utf-8
+"""
+Benchmark suite for the hot paths of mumblecode: graph searches, merging sorted iterables, IntervalMapping writes,
+WeightedSet choices, and CacheWrapper fetches.
+
+    python benchmarks/suite.py run [-o results.json] [-k name filter] [--quick] [--repeat N]
+    python benchmarks/suite.py compare base.json new.json [--threshold 1.25]
+
+Every benchmark builds seeded synthetic data, so runs are reproducible, and is timed at several sizes to show
+how it scales. Results are written as JSON; compare lines up two result files and exits with status 1 if any
+benchmark got slower by more than the threshold ratio. Everything runs offline: the caching benchmarks fetch
+from an HTTP stub on localhost.
+"""
+import argparse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import platform
+import random
+from socketserver import ThreadingMixIn
+from statistics import median
+import sys
+from threading import Thread
+from time import perf_counter
+
+BENCHMARKS = []
+
+
+def benchmark(name, param, sizes, quick_sizes):
+    """
+    Register a benchmark. The decorated function takes (size, rng) and returns a function of no arguments that
+    performs the work to be timed; anything it does before returning is setup and is not timed.
+    """
+    def dec(setup):
+        BENCHMARKS.append((name, param, sizes, quick_sizes, setup))
+        return setup
+
+    return dec
+
+
+# graphs
+
+def random_cost_grid(size, rng):
+    edges = {}
+    for x in range(size):
+        for y in range(size):
+            out = edges[x, y] = []
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= nx < size and 0 <= ny < size:
+                    out.append(((nx, ny), rng.randint(1, 10)))
+    return edges
+
+
+@benchmark('graphs.astar', 'grid size', [50, 100, 200], [20, 40])
+def bench_astar(size, rng):
+    from mumblecode.graphs import astar
+
+    edges = random_cost_grid(size, rng)
+    goal = (size - 1, size - 1)
+    return lambda: next(astar([(0, 0)], lambda n: n == goal, edges.__getitem__))
+
+
+@benchmark('graphs.astar tol', 'grid size', [6, 8, 10], [4, 6])
+def bench_astar_tol(size, rng):
+    from mumblecode.graphs import astar
+
+    edges = {node: [(nb, 1) for nb, _ in out] for node, out in random_cost_grid(size, rng).items()}
+    goal = (size - 1, size - 1)
+    return lambda: sum(1 for _ in astar([(0, 0)], lambda n: n == goal, edges.__getitem__, tol=0))
+
+
+@benchmark('graphs.CompiledGraph.dijkstra_simple', 'grid size', [50, 100, 200], [20, 40])
+def bench_compiled_dijkstra_simple(size, rng):
+    from mumblecode.graphs import CompiledGraph
+
+    graph = CompiledGraph.from_edgefinder([(0, 0)], random_cost_grid(size, rng).__getitem__)
+    goal = (size - 1, size - 1)
+    return lambda: graph.dijkstra_simple((0, 0), goal)
+
+
+# iterables
+
+def sorted_shards(k, total, rng):
+    return [sorted(rng.random() for _ in range(total // k)) for _ in range(k)]
+
+
+@benchmark('iterables.collate', 'k', [2, 16, 128, 1024], [2, 16])
+def bench_collate(k, rng):
+    from mumblecode.iterables import collate
+
+    shards = sorted_shards(k, 100000, rng)
+    return lambda: sum(1 for _ in collate(shards))
+
+
+@benchmark('iterables.merge', 'k', [2, 16, 128, 1024], [2, 16])
+def bench_merge(k, rng):
+    from mumblecode.iterables import merge
+
+    # few distinct values, so that there are many repeats to remove
+    shards = [sorted(rng.randrange(1000) for _ in range(100000 // k)) for _ in range(k)]
+    return lambda: sum(1 for _ in merge(shards))
+
+
+# collections
+
+def random_intervals(n, rng, span=None):
+    from intervaltree import Interval
+
+    span = span or n * 10
+    result = []
+    for _ in range(n):
+        begin = rng.randrange(span)
+        result.append(Interval(begin, begin + rng.randint(1, 20), rng.randrange(5)))
+    return result
+
+
+@benchmark('collections.IntervalMapping._set_range', 'n', [1000, 4000, 16000], [500, 1000])
+def bench_interval_set_range(n, rng):
+    from mumblecode.collections import IntervalMapping
+
+    intervals = random_intervals(n, rng)
+
+    def run():
+        mapping = IntervalMapping()
+        for iv in intervals:
+            mapping._set_range(iv.begin, iv.end, (iv.data,))
+        return mapping
+
+    return run
+
+
+@benchmark('collections.IntervalMapping.from_intervals', 'n', [1000, 4000, 16000, 100000], [500, 1000])
+def bench_interval_from_intervals(n, rng):
+    from mumblecode.collections import IntervalMapping
+
+    intervals = random_intervals(n, rng)
+    return lambda: IntervalMapping.from_intervals(intervals)
+
+
+@benchmark('collections.WeightedSet.choose', 'n', [1000, 10000, 100000], [1000, 10000])
+def bench_weighted_choose(n, rng):
+    from mumblecode.collections import WeightedSet
+
+    weights = WeightedSet((i, rng.random()) for i in range(n))
+    total = weights.sum()
+    points = [rng.random() * total for _ in range(20000)]
+    choose = weights.choose
+    return lambda: [choose(point) for point in points]
+
+
+# caching
+
+class _StubHandler(BaseHTTPRequestHandler):
+    body = b'{"ok": true}' * 50
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Cache-Control', 'max-age=3600')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+_stub_server = None
+
+
+def stub_url():
+    """Base URL of an HTTP stub on localhost, started on first use"""
+    global _stub_server
+    if _stub_server is None:
+        _stub_server = _StubServer(('127.0.0.1', 0), _StubHandler)
+        Thread(target=_stub_server.serve_forever, daemon=True).start()
+    return 'http://127.0.0.1:{}/'.format(_stub_server.server_address[1])
+
+
+class DictCache(object):
+    """In-memory cache with the get/set/delete interface of the caches in mumblecode.caching"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@benchmark('caching.CacheWrapper.get hit', 'urls', [10, 100, 1000], [10, 100])
+def bench_cache_hit(n, rng):
+    import requests
+    from mumblecode.caching import CacheWrapper, header_max_age_heuristic
+
+    wrapper = CacheWrapper(requests.Session(), DictCache(), header_max_age_heuristic)
+    urls = ['{}item/{}'.format(stub_url(), i) for i in range(n)]
+    for url in urls:
+        wrapper.get(url)
+    gets = [rng.choice(urls) for _ in range(2000)]
+    return lambda: [wrapper.get(url) for url in gets]
+
+
+@benchmark('caching.CacheWrapper.get miss', 'urls', [10, 50], [10])
+def bench_cache_miss(n, rng):
+    import requests
+    from mumblecode.caching import CacheWrapper, header_max_age_heuristic
+
+    session = requests.Session()
+    urls = ['{}item/{}'.format(stub_url(), i) for i in range(n)]
+    return lambda: [CacheWrapper(session, DictCache(), header_max_age_heuristic).get(url) for url in urls]
+
+
+# running and comparing
+
+def run(args):
+    results = []
+    for name, param, sizes, quick_sizes, setup in BENCHMARKS:
+        if args.filter and args.filter not in name:
+            continue
+        for size in (quick_sizes if args.quick else sizes):
+            work = setup(size, random.Random(size))
+            times = []
+            for _ in range(args.repeat):
+                start = perf_counter()
+                work()
+                times.append(perf_counter() - start)
+            result = {
+                'benchmark': name,
+                'param': param,
+                'size': size,
+                'repeat': args.repeat,
+                'best': min(times),
+                'median': median(times),
+            }
+            results.append(result)
+            print("{:<42} {:>10} {:>8}  best {:>9.4f}s  median {:>9.4f}s".format(
+                name, param, size, result['best'], result['median']))
+    document = {
+        'python': sys.version,
+        'platform': platform.platform(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'quick': args.quick,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    return 0
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+    with open(args.new) as f:
+        new = {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+    slower = 0
+    for key in sorted(base.keys() | new.keys(), key=lambda k: (k[0], str(k[1]))):
+        name, size = key
+        if key not in base or key not in new:
+            print("{:<42} {:>8}  {}".format(name, size, "only in new" if key in new else "only in base"))
+            continue
+        ratio = new[key]['best'] / base[key]['best']
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  SLOWER'
+            slower += 1
+        elif ratio < 1 / args.threshold:
+            flag = '  faster'
+        print("{:<42} {:>8}  {:>9.4f}s -> {:>9.4f}s  x{:.2f}{}".format(
+            name, size, base[key]['best'], new[key]['best'], ratio, flag))
+    if slower:
+        print("{} benchmark(s) slower than x{} of the base run".format(slower, args.threshold))
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help="run the benchmarks")
+    run_parser.add_argument('-o', '--output', help="file to write JSON results to")
+    run_parser.add_argument('-k', '--filter', help="only run benchmarks whose name contains this")
+    run_parser.add_argument('--quick', action='store_true', help="only run the small sizes")
+    run_parser.add_argument('--repeat', type=int, default=3, help="times to run each benchmark at each size")
+    run_parser.set_defaults(action=run)
+    compare_parser = commands.add_parser('compare', help="compare two JSON result files")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.25,
+                                help="flag benchmarks whose best time grew by more than this ratio")
+    compare_parser.set_defaults(action=compare)
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("a command is required")
+    return args.action(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,11 @@ from mumblecode import (
     api,
     caching,
     collections,
+    contraction,
     context,
     decorate,
     graphs,
+    grids,
     iterables,
     multithreading,
     ratelimiting,
@@ -1,9 +1,12 @@
 # coding=utf-8
+from array import array
 from bisect import bisect_left, bisect_right
 from collections import namedtuple, defaultdict
 from datetime import datetime, timezone
 from functools import total_ordering
-from itertools import groupby, tee
+from heapq import heappop, heappush
+from itertools import accumulate, chain, groupby, islice, tee
+from math import inf, sqrt
 from operator import itemgetter
 import random
 
@@ -276,6 +279,182 @@ def merge_interval_overlaps(intervals, open_ended=()):
             yield Interval(begin=first, end=last, data=key)  # yield the last run
 
 
+def _aligned_segments(maps, missing):
+    """
+    Sweep along sequences of sorted, non-overlapping intervals together, yielding (begin, end, values) for each
+    stretch covered by at least one of them, over which none of them change. values holds the value of each
+    sequence over that stretch, or missing where it has none.
+    """
+    iterators = [iter(m) for m in maps]
+    current = [next(it, None) for it in iterators]
+    position = None
+    while True:
+        begin = None
+        for j, iv in enumerate(current):
+            while iv is not None and position is not None and iv.end <= position:
+                iv = current[j] = next(iterators[j], None)
+            if iv is not None and (begin is None or iv.begin < begin):
+                begin = iv.begin
+        if begin is None:
+            return
+        if position is not None and begin < position:
+            begin = position  # in the middle of some of the intervals
+        end = None
+        for iv in current:
+            if iv is not None:
+                edge = iv.begin if begin < iv.begin else iv.end
+                if end is None or edge < end:
+                    end = edge
+        yield begin, end, tuple(iv.data if iv is not None and iv.begin <= begin else missing for iv in current)
+        position = end
+
+
+def _paired_segments(a, b, missing):
+    """_aligned_segments() for exactly two sequences, yielding (begin, end, value from a, value from b)"""
+    iterator_a = iter(a)
+    iterator_b = iter(b)
+    x = next(iterator_a, None)
+    y = next(iterator_b, None)
+    position = None
+    while x is not None and y is not None:
+        # both x and y end after position
+        begin = x.begin if x.begin < y.begin else y.begin
+        if position is not None and begin < position:
+            begin = position
+        if begin < x.begin:  # only y, until x begins or y ends
+            end = x.begin if x.begin < y.end else y.end
+            yield begin, end, missing, y.data
+        elif begin < y.begin:  # only x, until y begins or x ends
+            end = y.begin if y.begin < x.end else x.end
+            yield begin, end, x.data, missing
+        else:
+            end = x.end if x.end < y.end else y.end
+            yield begin, end, x.data, y.data
+        position = end
+        if not end < x.end:
+            x = next(iterator_a, None)
+        if not end < y.end:
+            y = next(iterator_b, None)
+    # at most one of them is left
+    while x is not None:
+        yield (position if position is not None and x.begin < position else x.begin), x.end, x.data, missing
+        x = next(iterator_a, None)
+    while y is not None:
+        yield (position if position is not None and y.begin < position else y.begin), y.end, missing, y.data
+        y = next(iterator_b, None)
+
+
+def zip_mappings(*maps, missing=None):
+    """
+    Align several mappings, such as IntervalMappings or the intervals() of SampledValues, in one linear sweep.
+
+    :param maps: iterables of sorted, non-overlapping Intervals
+    :param missing: value for a mapping over a stretch that it does not cover
+    :return: Yields an Interval for each stretch covered by at least one of the mappings over which none of them
+        change, with a tuple of the value of each mapping as its data.
+
+    >>> a = [Interval(0, 10, 'a')]
+    >>> b = [Interval(5, 15, 'b')]
+    >>> list(zip_mappings(a, b))
+    [Interval(0, 5, ('a', None)), Interval(5, 10, ('a', 'b')), Interval(10, 15, (None, 'b'))]
+    """
+    for begin, end, values in _aligned_segments(maps, missing):
+        yield Interval(begin, end, values)
+
+
+def overlay(a, b, combine=None):
+    """
+    Lay mapping b over mapping a in one linear sweep.
+
+    :param a: iterable of sorted, non-overlapping Intervals, such as an IntervalMapping
+    :param b: iterable of sorted, non-overlapping Intervals
+    :param combine: function of (value from a, value from b) giving the value where both are mapped; by default
+        b's value wins
+    :return: Yields sorted Intervals covering everything covered by either a or b.
+
+    >>> list(overlay([Interval(0, 10, 1)], [Interval(5, 15, 2)], combine=lambda x, y: x + y))
+    [Interval(0, 5, 1), Interval(5, 10, 3), Interval(10, 15, 2)]
+    """
+    for begin, end, value_a, value_b in _paired_segments(a, b, _SENTINEL):
+        if value_b is _SENTINEL:
+            yield Interval(begin, end, value_a)
+        elif value_a is _SENTINEL or combine is None:
+            yield Interval(begin, end, value_b)
+        else:
+            yield Interval(begin, end, combine(value_a, value_b))
+
+
+def intersection(a, b, combine=None):
+    """
+    Find the stretches mapped by both a and b in one linear sweep.
+
+    :param a: iterable of sorted, non-overlapping Intervals, such as an IntervalMapping
+    :param b: iterable of sorted, non-overlapping Intervals
+    :param combine: function of (value from a, value from b) giving the value of the result; by default a's value
+    :return: Yields sorted Intervals covering everything covered by both a and b.
+
+    >>> list(intersection([Interval(0, 10, 'a')], [Interval(5, 15, 'b')], combine=lambda x, y: x + y))
+    [Interval(5, 10, 'ab')]
+    """
+    for begin, end, value_a, value_b in _paired_segments(a, b, _SENTINEL):
+        if value_a is not _SENTINEL and value_b is not _SENTINEL:
+            yield Interval(begin, end, value_a if combine is None else combine(value_a, value_b))
+
+
+def difference(a, b):
+    """
+    Find the stretches mapped by a and not by b in one linear sweep.
+
+    :param a: iterable of sorted, non-overlapping Intervals, such as an IntervalMapping
+    :param b: iterable of sorted, non-overlapping Intervals
+    :return: Yields sorted Intervals of a's values over everything covered by a and not by b.
+
+    >>> list(difference([Interval(0, 10, 'a')], [Interval(3, 5, 'b')]))
+    [Interval(0, 3, 'a'), Interval(5, 10, 'a')]
+    """
+    for begin, end, value_a, value_b in _paired_segments(a, b, _SENTINEL):
+        if value_b is _SENTINEL and value_a is not _SENTINEL:
+            yield Interval(begin, end, value_a)
+
+
+def _ascending(points, presorted):
+    """Return points as a list, and the indexes of the points from least to greatest"""
+    if type(points) is not list:
+        points = list(points)
+    if presorted:
+        return points, range(len(points))
+    return points, sorted(range(len(points)), key=points.__getitem__)
+
+
+def _numpy_lookup(begins, ends, values, points, default, indexes=None):
+    """
+    Look up each of a NumPy array of points with searchsorted, finding the value for the last beginning at or before
+    it, and return the results as a list.
+
+    :param begins: sorted array of beginnings
+    :param ends: array of where each entry ends, or None if every entry lasts until the next beginning
+    :param values: sequence of values
+    :param points: NumPy array of points
+    :param default: result for points before the first beginning or past the end of their entry
+    :param indexes: array of the index into values for each entry, if it is not the entry's own index
+    """
+    import numpy as np
+
+    if not len(begins):
+        return [default] * len(points)
+    found = np.searchsorted(begins, points, side='right') - 1
+    clipped = np.maximum(found, 0)
+    mapped = found >= 0
+    if ends is not None:
+        mapped &= points < ends[clipped]
+    # the last entry of the value table is the default, for unmapped points
+    table = np.empty(len(values) + 1, dtype=object)
+    for i, value in enumerate(values):
+        table[i] = value  # assigned one at a time so that sequence values are not unpacked
+    table[-1] = default
+    return table[np.where(mapped, clipped if indexes is None else indexes[clipped], -1)].tolist()
+
+
 class _ViewMixin(object):
     """Mixin for set operators on dictionary views"""
     __slots__ = ()
@@ -389,6 +568,39 @@ class SampledValue(object):
                 raise KeyError
             return self.history[index].value
 
+    def lookup_many(self, times, *, default=None, presorted=False):
+        """
+        Return a list of the values at each of the given times, like calling get() for each, with default for times
+        before the first sample. The times are sorted and answered in one sweep along the history, taking
+        O(n log n + m) rather than O(n log m) Python-level steps; NumPy arrays of times are answered with
+        searchsorted instead.
+
+        :param times: iterable of times, or a NumPy array
+        :param default: value for times before the first sample
+        :param presorted: True if times are already in order, which skips sorting them
+
+        >>> sv = SampledValue([Sample(1, 'a'), Sample(5, 'b')])
+        >>> sv.lookup_many([6, 0, 1, 4])
+        ['b', None, 'a', 'a']
+        """
+        history = self.history
+        if type(times).__module__ == 'numpy':
+            import numpy as np
+
+            return _numpy_lookup(np.array([s.point for s in history]), None, [s.value for s in history],
+                                 times, default)
+        times, order = _ascending(times, presorted)
+        result = [default] * len(times)
+        index = -1
+        last = len(history) - 1
+        for i in order:
+            time = times[i]
+            while index < last and history[index + 1].point <= time:
+                index += 1
+            if index >= 0:
+                result[i] = history[index].value
+        return result
+
     def set(self, value, *, time=None):
         if time is None:
             self.history.append(Sample(point=now(), value=value))
@@ -439,11 +651,89 @@ class SampledValue(object):
         return self.time_slice(self.begin(), end_time)
 
 
+def _resolve_intervals(starts):
+    """
+    Sweep over intervals that may overlap, where each point belongs to the highest priority interval covering it,
+    and return the resulting disjoint intervals in order with touching intervals of equal value joined.
+
+    :param starts: list of (begin, priority, end, value) sorted by begin, with unique priorities
+    """
+    begins, ends, values = [], [], []
+    active = []  # heap of (-priority, end, value) for intervals that have begun; expired ones are dropped lazily
+    n = len(starts)
+    i = 0
+    position = None
+    while i < n or active:
+        if not active:
+            position = starts[i][0]
+        while i < n and starts[i][0] <= position:
+            _, priority, end, value = starts[i]
+            heappush(active, (-priority, end, value))
+            i += 1
+        while active and active[0][1] <= position:
+            heappop(active)
+        if not active:
+            continue
+        _, end, value = active[0]
+        # the top interval owns everything until it ends or until another interval begins that might outrank it
+        if i < n and starts[i][0] < end:
+            end = starts[i][0]
+        if ends and ends[-1] == position and values[-1] == value:
+            ends[-1] = end
+        else:
+            begins.append(position)
+            ends.append(end)
+            values.append(value)
+        position = end
+    return [Interval(*iv) for iv in zip(begins, ends, values)]
+
+
 class IntervalMapping(object):
     __slots__ = ('ivs',)
+    # type of the sorted sequence of intervals underlying the mapping
+    _storage = list
 
     def __init__(self, intervals=()):
-        self.ivs = sorted(iv for iv in intervals if not iv.is_null())
+        self.ivs = self._storage(sorted(iv for iv in intervals if not iv.is_null()))
+
+    @classmethod
+    def from_intervals(cls, intervals, presorted=False):
+        """
+        Build a mapping from intervals that may overlap, with each later interval overwriting the earlier ones just
+        as if they were applied one at a time with apply(), in O(n log n) instead of O(n^2). Null intervals are
+        skipped, and touching intervals with equal values are joined into one.
+
+        :param intervals: iterable of Intervals, in the order they should be applied
+        :param presorted: True if intervals are already sorted by their beginnings, which skips sorting them
+        """
+        starts = [(iv.begin, i, iv.end, iv.data) for i, iv in enumerate(intervals) if iv.begin < iv.end]
+        if not presorted:
+            starts.sort()  # priorities are unique, so the values are never compared
+        result = cls()
+        result.ivs = result._rebuild(_resolve_intervals(starts))
+        return result
+
+    def apply_many(self, intervals):
+        """
+        Apply many intervals to the mapping, with the same result as calling apply() with each in turn except that
+        touching intervals with equal values are joined. This rebuilds the mapping in one pass, taking
+        O(m + n log n) for n intervals applied to a mapping of m intervals. If any interval is null, raises a
+        KeyError and leaves the mapping unchanged.
+        """
+        count = len(self.ivs)
+        starts = [(iv.begin, i, iv.end, iv.data) for i, iv in enumerate(self.ivs)]
+        for i, iv in enumerate(intervals, count):
+            if not iv.begin < iv.end:
+                raise KeyError("Invalid interval: {}".format((iv.begin, iv.end)))
+            starts.append((iv.begin, i, iv.end, iv.data))
+        if len(starts) == count:
+            return
+        starts.sort()  # the current intervals are already a sorted run
+        self.ivs = self._rebuild(_resolve_intervals(starts))
+
+    def _rebuild(self, intervals):
+        """Return new storage configured like this mapping's, holding the given sorted, disjoint intervals"""
+        return self._storage(intervals)
 
     def begin(self):
         return self.ivs[0].begin if self.ivs else 0
@@ -467,7 +757,7 @@ class IntervalMapping(object):
         self.ivs.clear()
 
     def copy(self):
-        result = IntervalMapping()
+        result = type(self)()
         result.ivs = self.ivs.copy()
         return result
 
@@ -644,6 +934,43 @@ class IntervalMapping(object):
         else:
             return self._value_at_position(key)
 
+    def lookup_many(self, points, *, default=None, presorted=False):
+        """
+        Return a list of the values at each of the points, with default for points that are not mapped instead of
+        raising KeyError. The points are sorted and answered in one sweep along the mapping, unless there are few
+        enough of them that looking each one up is quicker. ColumnarIntervalMapping, which keeps its positions in
+        arrays, also answers NumPy arrays of points with searchsorted.
+
+        :param points: iterable of positions
+        :param default: value for points that are not mapped
+        :param presorted: True if points are already in order, which skips sorting them
+
+        >>> im = IntervalMapping([Interval(0, 10, 'a'), Interval(20, 30, 'b')])
+        >>> im.lookup_many([25, 5, 15, 30], default='-')
+        ['b', 'a', '-', '-']
+        """
+        points, order = _ascending(points, presorted)
+        if len(points) * 16 < len(self.ivs):
+            # sweeping would visit far more intervals than there are points
+            result = []
+            for point in points:
+                index = self._position_index(point)
+                iv = self.ivs[index] if index >= 0 else None
+                result.append(iv.data if iv is not None and point < iv.end else default)
+            return result
+        result = [default] * len(points)
+        ivs = iter(self.ivs)
+        iv = next(ivs, None)
+        for i in order:
+            point = points[i]
+            while iv is not None and iv.end <= point:
+                iv = next(ivs, None)
+            if iv is None:
+                break
+            if iv.begin <= point:
+                result[i] = iv.data
+        return result
+
     def interval_at_position(self, position):
         """Return the interval that contains position, or None."""
         index = self._position_index(position)
@@ -712,9 +1039,390 @@ class IntervalMapping(object):
 
     def __repr__(self):
         if self.ivs:
-            return "IntervalMapping({})".format(self.ivs)
+            return "{}({})".format(type(self).__name__, list(self.ivs))
+        else:
+            return "{}()".format(type(self).__name__)
+
+
+class _IntervalBlocks(object):
+    """
+    A list of disjoint Intervals sorted by their beginnings, stored as a list of blocks of about `load` intervals
+    each, or of a size growing with the square root of the length if load is None. Indexing by position and
+    splicing slices work as they do for a list, but splicing only ever shifts the contents of the blocks it touches
+    plus the list of blocks itself, rather than every interval after it.
+
+    Alongside the intervals each block keeps a list of their beginnings, so that finding the interval at a position
+    is two bisections in C: one over the first beginning of every block and one within a block.
+    """
+    __slots__ = ('_blocks', '_begins', '_firsts', '_offsets', '_dirty', '_len', 'load')
+
+    def __init__(self, intervals=(), load=None):
+        if load is not None and load < 2:
+            raise ValueError("load must be at least 2")
+        self.load = load
+        self._blocks = []
+        self._begins = []
+        self._firsts = []
+        self._offsets = []
+        self._dirty = 0  # index of the first block whose entry in _offsets may be stale
+        self._len = 0
+        intervals = list(intervals)
+        if intervals:
+            self._splice(0, 0, intervals)
+
+    def _offset_table(self):
+        """Return the list of the index of the first interval in each block"""
+        blocks = self._blocks
+        d = self._dirty
+        if d < len(blocks):
+            base = self._offsets[d - 1] + len(blocks[d - 1]) if d else 0
+            self._offsets[d:] = accumulate(chain((base,), map(len, islice(blocks, d, len(blocks) - 1))))
+            self._dirty = len(blocks)
+        return self._offsets
+
+    def _locate(self, index):
+        """Return (block index, index within the block) for an index into the whole list"""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("index out of range")
+        offsets = self._offset_table()
+        k = bisect_right(offsets, index) - 1
+        return k, index - offsets[k]
+
+    def position_index(self, position):
+        """Return the index of the last interval with a beginning <= position"""
+        k = bisect_right(self._firsts, position) - 1
+        if k < 0:
+            return -1
+        return self._offset_table()[k] + bisect_right(self._begins[k], position) - 1
+
+    def end_position_index(self, position):
+        """Return the index of the last interval with a beginning < position"""
+        k = bisect_left(self._firsts, position) - 1
+        if k < 0:
+            return -1
+        return self._offset_table()[k] + bisect_left(self._begins[k], position) - 1
+
+    def _splice(self, start, stop, items):
+        """Replace the intervals from start to stop with the list items, like list slice assignment"""
+        blocks = self._blocks
+        begins = self._begins
+        item_begins = [iv.begin for iv in items]
+        load = self.load or max(1000, int(sqrt(self._len + len(items))) * 4)
+        if blocks:
+            offsets = self._offset_table()
+            k1 = bisect_right(offsets, start) - 1
+            k2 = bisect_right(offsets, stop) - 1
+            j1 = start - offsets[k1]
+            j2 = stop - offsets[k2]
+            if k1 == k2 and load // 2 <= len(blocks[k1]) + len(items) - (j2 - j1) <= 2 * load:
+                # the common case: change one block in place
+                blocks[k1][j1:j2] = items
+                begins[k1][j1:j2] = item_begins
+                self._firsts[k1] = begins[k1][0]
+                if len(items) != j2 - j1:
+                    self._dirty = min(self._dirty, k1 + 1)
+                    self._len += len(items) - (j2 - j1)
+                return
+            merged = blocks[k1][:j1] + items + blocks[k2][j2:]
+            merged_begins = begins[k1][:j1] + item_begins + begins[k2][j2:]
+            end = k2 + 1
+        else:
+            k1 = end = 0
+            merged = items
+            merged_begins = item_begins
+        if len(merged) < load // 2:  # too small to stand alone; absorb a neighboring block
+            if end < len(blocks):
+                merged += blocks[end]
+                merged_begins += begins[end]
+                end += 1
+            elif k1 > 0:
+                k1 -= 1
+                merged = blocks[k1] + merged
+                merged_begins = begins[k1] + merged_begins
+        if len(merged) <= 2 * load:
+            cuts = [0, len(merged)] if merged else [0]
+        else:
+            cuts = list(range(0, len(merged), load)) + [len(merged)]
+        new_blocks = [merged[a:b] for a, b in zip(cuts, cuts[1:])]
+        new_begins = [merged_begins[a:b] for a, b in zip(cuts, cuts[1:])]
+        blocks[k1:end] = new_blocks
+        begins[k1:end] = new_begins
+        self._firsts[k1:end] = [b[0] for b in new_begins]
+        self._dirty = min(self._dirty, k1)
+        self._len += len(items) - (stop - start)
+
+    def __getitem__(self, index):
+        if type(index) is slice:
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                raise ValueError("slices must be contiguous")
+            result = []
+            if start >= stop:
+                return result
+            k, j = self._locate(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = self._blocks[k][j:j + remaining]
+                result.extend(chunk)
+                remaining -= len(chunk)
+                k += 1
+                j = 0
+            return result
+        k, j = self._locate(index)
+        return self._blocks[k][j]
+
+    def __setitem__(self, index, value):
+        if type(index) is slice:
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                raise ValueError("slices must be contiguous")
+            self._splice(start, max(start, stop), list(value))
+            return
+        k, j = self._locate(index)
+        self._blocks[k][j] = value
+        self._begins[k][j] = value.begin
+        if j == 0:
+            self._firsts[k] = value.begin
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def __reversed__(self):
+        for block in reversed(self._blocks):
+            yield from reversed(block)
+
+    def clear(self):
+        self._blocks.clear()
+        self._begins.clear()
+        self._firsts.clear()
+        self._offsets.clear()
+        self._dirty = 0
+        self._len = 0
+
+    def copy(self):
+        result = _IntervalBlocks(load=self.load)
+        result._blocks = [block.copy() for block in self._blocks]
+        result._begins = [block.copy() for block in self._begins]
+        result._firsts = self._firsts.copy()
+        result._offsets = self._offsets.copy()
+        result._dirty = self._dirty
+        result._len = self._len
+        return result
+
+    def __repr__(self):
+        return "_IntervalBlocks({})".format(list(self))
+
+
+class BlockedIntervalMapping(IntervalMapping):
+    """
+    An IntervalMapping with the same interface, keeping its intervals in blocks rather than one flat list. Point
+    queries stay O(log n) and are somewhat faster, since they bisect in C, and modifying the mapping at a random
+    position costs O(sqrt n) with a small constant instead of O(n). Updates break even at around a hundred thousand
+    intervals and are over 20 times faster at ten million; below that the plain IntervalMapping updates faster.
+    benchmarks/bench_intervals.py measures the crossover.
+    """
+    __slots__ = ()
+    _storage = _IntervalBlocks
+
+    def __init__(self, intervals=(), load=None):
+        """
+        :param intervals: non-overlapping intervals to start with
+        :param load: number of intervals in each block, by default chosen from the size of the mapping
+        """
+        self.ivs = _IntervalBlocks(sorted(iv for iv in intervals if not iv.is_null()), load)
+
+    def _rebuild(self, intervals):
+        return _IntervalBlocks(intervals, self.ivs.load)
+
+    def _position_index(self, position):
+        return self.ivs.position_index(position)
+
+    def _end_position_index(self, position):
+        return self.ivs.end_position_index(position)
+
+
+class _IntervalColumns(object):
+    """
+    A list of disjoint Intervals sorted by their beginnings, stored as parallel arrays of beginnings, ends and
+    indexes into a list of distinct values. Intervals are built on the fly when they are read. Values that are no
+    longer referenced are dropped from the list once it grows to more than twice the number of intervals.
+    """
+    __slots__ = ('begins', 'ends', 'indexes', 'values', '_value_indexes', '_unbounded')
+
+    def __init__(self, intervals=(), typecode='d'):
+        self.begins = array(typecode)
+        self.ends = array(typecode)
+        self.indexes = array('q')
+        self.values = []
+        self._value_indexes = {}
+        if typecode in 'fd':
+            self._unbounded = (-inf, inf)
+        else:
+            bits = 8 * self.begins.itemsize
+            # unsigned typecodes are the upper case ones
+            self._unbounded = (0, (1 << bits) - 1) if typecode.isupper() else (-1 << bits - 1, (1 << bits - 1) - 1)
+        self[0:0] = intervals
+
+    def _intern(self, value):
+        try:
+            return self._value_indexes[type(value), value]
+        except KeyError:
+            # keyed on the type too, so that equal values like 1, 1.0 and True are each kept as they were given
+            index = self._value_indexes[type(value), value] = len(self.values)
+            self.values.append(value)
+            return index
+
+    def _number(self, position):
+        # unbounded slices of the mapping store LeastValue and GreatestValue
+        if position is LeastValue:
+            return self._unbounded[0]
+        if position is GreatestValue:
+            return self._unbounded[1]
+        return position
+
+    def check_positions(self, *positions):
+        """Raise the error that storing these positions would, without changing anything"""
+        array(self.begins.typecode, map(self._number, positions))
+
+    def _compact(self):
+        used = sorted(set(self.indexes))
+        remap = {old: new for new, old in enumerate(used)}
+        self.values = [self.values[i] for i in used]
+        self._value_indexes = {(type(value), value): i for i, value in enumerate(self.values)}
+        self.indexes = array('q', [remap[i] for i in self.indexes])
+
+    def __getitem__(self, index):
+        if type(index) is slice:
+            values = self.values
+            return [Interval(begin, end, values[i]) for begin, end, i in
+                    zip(self.begins[index], self.ends[index], self.indexes[index])]
+        return Interval(self.begins[index], self.ends[index], self.values[self.indexes[index]])
+
+    def __setitem__(self, index, value):
+        if type(index) is slice:
+            value = list(value)
+            typecode = self.begins.typecode
+            number = self._number
+            # build every column before assigning any, so a position that does not fit leaves them all unchanged
+            begins = array(typecode, [number(iv.begin) for iv in value])
+            ends = array(typecode, [number(iv.end) for iv in value])
+            indexes = array('q', [self._intern(iv.data) for iv in value])
+            self.begins[index] = begins
+            self.ends[index] = ends
+            self.indexes[index] = indexes
         else:
-            return "IntervalMapping()"
+            begin, end = array(self.begins.typecode, [self._number(value.begin), self._number(value.end)])
+            self.begins[index] = begin
+            self.ends[index] = end
+            self.indexes[index] = self._intern(value.data)
+        if len(self.values) > 2 * len(self.indexes) + 8:
+            self._compact()
+
+    def __len__(self):
+        return len(self.begins)
+
+    def __iter__(self):
+        values = self.values
+        for begin, end, i in zip(self.begins, self.ends, self.indexes):
+            yield Interval(begin, end, values[i])
+
+    def __reversed__(self):
+        values = self.values
+        for begin, end, i in zip(reversed(self.begins), reversed(self.ends), reversed(self.indexes)):
+            yield Interval(begin, end, values[i])
+
+    def clear(self):
+        del self.begins[:]
+        del self.ends[:]
+        del self.indexes[:]
+        self.values.clear()
+        self._value_indexes.clear()
+
+    def copy(self):
+        result = _IntervalColumns(typecode=self.begins.typecode)
+        result.begins = self.begins[:]
+        result.ends = self.ends[:]
+        result.indexes = self.indexes[:]
+        result.values = self.values.copy()
+        result._value_indexes = self._value_indexes.copy()
+        return result
+
+
+class ColumnarIntervalMapping(IntervalMapping):
+    """
+    An IntervalMapping with numeric positions, storing its intervals as arrays of beginnings, ends and value
+    indexes instead of Interval objects, which takes a third of the memory or less. Each distinct value is stored
+    once, so values must be hashable. Unbounded ends, as from im[:x] = value, are stored as infinities, or for
+    integer typecodes as the least and greatest numbers the typecode holds.
+
+    Lookups bisect the arrays in C, and lookup_many() answers many point queries at once, using NumPy when the
+    points are given as a NumPy array.
+    """
+    __slots__ = ()
+    _storage = _IntervalColumns
+
+    def __init__(self, intervals=(), typecode='d'):
+        """
+        :param intervals: non-overlapping intervals to start with
+        :param typecode: array typecode of the positions: 'd' for floats or 'q' for integers
+        """
+        self.ivs = _IntervalColumns(sorted(iv for iv in intervals if not iv.is_null()), typecode)
+
+    def _rebuild(self, intervals):
+        return _IntervalColumns(intervals, self.ivs.begins.typecode)
+
+    def _set_range(self, begin, end, wrapped_value):
+        # _set_range may write to the columns twice, so check that both ends fit before it writes either
+        self.ivs.check_positions(LeastValue if begin is None else begin, GreatestValue if end is None else end)
+        super()._set_range(begin, end, wrapped_value)
+
+    def _position_index(self, position):
+        return bisect_right(self.ivs.begins, position) - 1
+
+    def _end_position_index(self, position):
+        return bisect_left(self.ivs.begins, position) - 1
+
+    def _value_at_position(self, position):
+        columns = self.ivs
+        index = bisect_right(columns.begins, position) - 1
+        if index >= 0 and position < columns.ends[index]:
+            return columns.values[columns.indexes[index]]
+        raise KeyError
+
+    def lookup_many(self, points, *, default=None, presorted=False):
+        """
+        Return a list of the values at each of the points, with default for points that are not mapped. Points are
+        each found by bisecting the arrays in C, narrowing the search from the previous point when presorted is
+        True; NumPy arrays of points are answered with searchsorted.
+
+        >>> im = ColumnarIntervalMapping([Interval(0, 10, 'a'), Interval(20, 30, 'b')])
+        >>> im.lookup_many([5, 15, 25, 30])
+        ['a', None, 'b', None]
+        """
+        columns = self.ivs
+        if type(points).__module__ == 'numpy':
+            import numpy as np
+
+            return _numpy_lookup(np.frombuffer(columns.begins, dtype=columns.begins.typecode),
+                                 np.frombuffer(columns.ends, dtype=columns.ends.typecode),
+                                 columns.values, points, default, np.frombuffer(columns.indexes, dtype=np.int64))
+        begins = columns.begins
+        ends = columns.ends
+        indexes = columns.indexes
+        values = columns.values
+        result = []
+        lo = 0
+        for point in points:
+            index = bisect_right(begins, point, lo) - 1
+            if presorted and index > 0:
+                lo = index
+            result.append(values[indexes[index]] if index >= 0 and point < ends[index] else default)
+        return result
 
 
 class HistorySet(object):
@@ -0,0 +1,330 @@
+# coding=utf-8
+from array import array
+from heapq import heapify, heappush, heappop
+from math import inf
+import pickle
+
+from mumblecode.graphs import CompiledGraph, DistanceMatrix
+
+
+def _witness_distances(source, excluded, max_cost, wanted, out_edges, settle_limit):
+    """
+    Distances from source in the not yet contracted graph, avoiding the node being contracted, up to
+    max_cost or until every node in wanted is settled. Gives up after settling settle_limit nodes, which can
+    only cause unnecessary shortcuts.
+    """
+    dist = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    remaining = len(wanted)
+    while heap:
+        d, node = heappop(heap)
+        if d > dist[node]:
+            continue  # stale entry
+        if d > max_cost or settled >= settle_limit:
+            break
+        settled += 1
+        if node in wanted:
+            remaining -= 1
+            if not remaining:
+                break
+        for neighbor, (cost, _) in out_edges[node].items():
+            if neighbor == excluded:
+                continue
+            neighbor_dist = d + cost
+            if neighbor_dist < dist.get(neighbor, inf):
+                dist[neighbor] = neighbor_dist
+                heappush(heap, (neighbor_dist, neighbor))
+    return dist
+
+
+def _csr(adjacency, typecode):
+    """Pack a list of [(target, (cost, middle)), ...] lists into offset, target, cost, and middle arrays"""
+    offsets = array('q', [0])
+    targets = array('q')
+    costs = array(typecode)
+    middles = array('q')
+    for edges in adjacency:
+        for target, (cost, middle) in edges:
+            targets.append(target)
+            costs.append(cost)
+            middles.append(middle)
+        offsets.append(len(targets))
+    return offsets, targets, costs, middles
+
+
+class ContractionHierarchy(object):
+    """
+    Contraction hierarchy over a static CompiledGraph, for answering many point-to-point shortest path queries
+    on the same graph.
+
+    Preprocessing contracts nodes one at a time in order of importance, adding a shortcut edge u -> w whenever
+    contracting v removes the only shortest path u -> v -> w. Queries are then a bidirectional Dijkstra that
+    only ever moves upward in that order, which settles a tiny fraction of the nodes a plain search would.
+    Shortcuts remember the node they bypass, so query() unpacks them back into ordinary paths.
+
+    Only the upward edges of each node are kept, in compressed sparse row arrays, which pickle compactly; use
+    save() and load() to preprocess once and load the hierarchy in the query service at startup.
+    """
+    __slots__ = ('nodes', 'index', 'forward', 'backward')
+
+    _MAGIC = b'CHY1'
+
+    def __init__(self, nodes, forward, backward):
+        """
+        :param nodes: list of the original node objects, in interned order
+        :param forward: (offsets, targets, costs, middles) arrays of the edges from each node to higher ranked
+            nodes. middles holds the interned node a shortcut bypasses, or -1 for an original edge.
+        :param backward: the same for edges INTO each node from higher ranked nodes, with targets holding the
+            edges' sources
+        """
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.forward = forward
+        self.backward = backward
+
+    @classmethod
+    def build(cls, graph, settle_limit=500):
+        """
+        Preprocess a graph.
+
+        :param graph: a CompiledGraph with non-negative costs
+        :param settle_limit: how many nodes each witness search may settle while looking for a path that makes a
+            shortcut unnecessary. Lower is faster to build but may add shortcuts that are not needed.
+        """
+        if not isinstance(graph, CompiledGraph):
+            raise TypeError("ContractionHierarchy must be built from a CompiledGraph")
+        n = len(graph)
+        offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+        # remaining graph: node -> {neighbor: (cost, bypassed node or -1)}
+        out_edges = [{} for _ in range(n)]
+        in_edges = [{} for _ in range(n)]
+        for u in range(n):
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                cost = costs[e]
+                if u != v and cost < out_edges[u].get(v, (inf,))[0]:
+                    out_edges[u][v] = in_edges[v][u] = (cost, -1)
+
+        def shortcuts(v):
+            result = []
+            outs = out_edges[v]
+            if not outs:
+                return result
+            max_out = max(cost for cost, _ in outs.values())
+            for u, (cost_in, _) in in_edges[v].items():
+                dist = _witness_distances(u, v, cost_in + max_out, outs, out_edges, settle_limit)
+                for w, (cost_out, _) in outs.items():
+                    via = cost_in + cost_out
+                    if w != u and via < dist.get(w, inf):
+                        result.append((u, w, via))
+            return result
+
+        def priority(v, num_shortcuts):
+            # edge difference, plus how many neighbors are already gone and how deep the hierarchy below is
+            # already, both of which spread contraction out evenly and keep searches short
+            return num_shortcuts - len(in_edges[v]) - len(out_edges[v]) + contracted_neighbors[v] + level[v]
+
+        contracted_neighbors = [0] * n
+        level = [0] * n
+        heap = [(priority(v, len(shortcuts(v))), v) for v in range(n)]
+        heapify(heap)
+        upward = [None] * n
+        downward = [None] * n
+        while heap:
+            _, v = heappop(heap)
+            added = shortcuts(v)
+            current = priority(v, len(added))
+            if heap and current > heap[0][0]:
+                heappush(heap, (current, v))  # priority went stale; try again later
+                continue
+
+            # every remaining neighbor is ranked above v, so its edges are final
+            upward[v] = list(out_edges[v].items())
+            downward[v] = list(in_edges[v].items())
+            for w in out_edges[v]:
+                del in_edges[w][v]
+                contracted_neighbors[w] += 1
+                level[w] = max(level[w], level[v] + 1)
+            for u in in_edges[v]:
+                del out_edges[u][v]
+                contracted_neighbors[u] += 1
+                level[u] = max(level[u], level[v] + 1)
+            out_edges[v] = in_edges[v] = None
+            for u, w, cost in added:
+                if cost < out_edges[u].get(w, (inf,))[0]:
+                    out_edges[u][w] = in_edges[w][u] = (cost, v)
+
+        return cls(graph.nodes, _csr(upward, costs.typecode), _csr(downward, costs.typecode))
+
+    def _edge_middle(self, side, node, target):
+        """Return the middle of the edge stored under node on the given side that leads to target"""
+        offsets, targets, _, middles = side
+        for e in range(offsets[node], offsets[node + 1]):
+            if targets[e] == target:
+                return middles[e]
+        raise KeyError((node, target))
+
+    def _unpack(self, a, b, middle, steps):
+        """Append the interned nodes after a on the original path from a to b to steps"""
+        stack = [(a, b, middle)]
+        while stack:
+            a, b, middle = stack.pop()
+            if middle < 0:
+                steps.append(b)
+                continue
+            # a was contracted after middle, so the edge a -> middle is stored with middle's backward edges
+            # and middle -> b with its forward edges
+            stack.append((middle, b, self._edge_middle(self.forward, middle, b)))
+            stack.append((a, middle, self._edge_middle(self.backward, middle, a)))
+
+    def _search(self, s, t):
+        """
+        Bidirectional upward search between interned nodes s and t. Returns the distance, the meeting node, and
+        the parent (node, edge) maps of both searches.
+        """
+        forward = (self.forward, self.backward, {s: 0}, {s: None}, [(0, s)])
+        backward = (self.backward, self.forward, {t: 0}, {t: None}, [(0, t)])
+        forward_heap = forward[4]
+        backward_heap = backward[4]
+        best = inf
+        meeting = -1
+        while forward_heap or backward_heap:
+            if forward_heap and (not backward_heap or forward_heap[0][0] <= backward_heap[0][0]):
+                this, other = forward, backward
+            else:
+                this, other = backward, forward
+            (offsets, targets, costs, _), (down_offsets, down_targets, down_costs, _), dist, parents, heap = this
+            d, node = heappop(heap)
+            if d >= best:
+                break  # both searches only go up from here; nothing shorter can turn up
+            if d > dist[node]:
+                continue  # stale entry
+            other_dist = other[2].get(node)
+            if other_dist is not None and d + other_dist < best:
+                best = d + other_dist
+                meeting = node
+            # stall on demand: if a higher node we already reached leads here more cheaply, this node cannot be
+            # on a shortest path, and neither can anything only reached through it
+            for e in range(down_offsets[node], down_offsets[node + 1]):
+                if dist.get(down_targets[e], inf) + down_costs[e] < d:
+                    break
+            else:
+                for e in range(offsets[node], offsets[node + 1]):
+                    target = targets[e]
+                    target_dist = d + costs[e]
+                    if target_dist < dist.get(target, inf):
+                        dist[target] = target_dist
+                        parents[target] = (node, e)
+                        heappush(heap, (target_dist, target))
+        return best, meeting, forward[3], backward[3]
+
+    def distance(self, start, destination):
+        """Return the length of the shortest path from start to destination, or None if there is none"""
+        best, _, _, _ = self._search(self.index[start], self.index[destination])
+        return None if best == inf else best
+
+    def query(self, start, destination):
+        """
+        :param start: The start node
+        :param destination: The destination node
+        :return: Returns the shortest path from the start to the destination as (total cost, path), like
+            dijkstra_simple(), or (None, ()) if none exists.
+        """
+        best, meeting, forward_parents, backward_parents = self._search(
+            self.index[start], self.index[destination]
+        )
+        if best == inf:
+            return None, ()
+
+        # collect the hierarchy edges on either side of the meeting node, then unpack them in path order
+        forward_edges = []
+        node = meeting
+        while forward_parents[node] is not None:
+            prev, e = forward_parents[node]
+            forward_edges.append((prev, node, self.forward[3][e]))
+            node = prev
+        steps = [node]
+        for a, b, middle in reversed(forward_edges):
+            self._unpack(a, b, middle, steps)
+        node = meeting
+        while backward_parents[node] is not None:
+            following, e = backward_parents[node]
+            self._unpack(node, following, self.backward[3][e], steps)
+            node = following
+
+        path = ()
+        for i in steps:
+            path = (self.nodes[i], path)
+        return best, path
+
+    def _upward(self, source, side, other_side):
+        """Complete upward search from interned node source, returning {node: distance} for unstalled nodes"""
+        offsets, targets, costs, _ = side
+        down_offsets, down_targets, down_costs, _ = other_side
+        dist = {source: 0}
+        result = {}
+        heap = [(0, source)]
+        while heap:
+            d, node = heappop(heap)
+            if d > dist[node]:
+                continue  # stale entry
+            for e in range(down_offsets[node], down_offsets[node + 1]):
+                if dist.get(down_targets[e], inf) + down_costs[e] < d:
+                    break  # stalled, see _search()
+            else:
+                result[node] = d
+                for e in range(offsets[node], offsets[node + 1]):
+                    target = targets[e]
+                    target_dist = d + costs[e]
+                    if target_dist < dist.get(target, inf):
+                        dist[target] = target_dist
+                        heappush(heap, (target_dist, target))
+        return result
+
+    def distance_matrix(self, origins, destinations):
+        """
+        :param origins: iterable of origin nodes
+        :param destinations: iterable of destination nodes
+        :return: a DistanceMatrix of the shortest distance from every origin to every destination
+
+        Uses buckets: one backward upward search per destination leaves (destination, distance) entries at
+        every node it reaches, then one forward upward search per origin scans the buckets of the nodes it
+        reaches. That is len(origins) + len(destinations) small searches rather than one search per pair.
+        """
+        origins = list(origins)
+        destinations = list(destinations)
+        matrix = DistanceMatrix(origins, destinations)
+        values = matrix.values
+        width = len(destinations)
+        buckets = {}
+        for j, destination in enumerate(destinations):
+            for node, d in self._upward(self.index[destination], self.backward, self.forward).items():
+                buckets.setdefault(node, []).append((j, d))
+        for i, origin in enumerate(origins):
+            row = [inf] * width
+            for node, d in self._upward(self.index[origin], self.forward, self.backward).items():
+                for j, to_destination in buckets.get(node, ()):
+                    if d + to_destination < row[j]:
+                        row[j] = d + to_destination
+            values[i * width:(i + 1) * width] = array('d', row)
+        return matrix
+
+    def edge_count(self):
+        """Number of upward edges, original and shortcut, stored in the hierarchy"""
+        return len(self.forward[1]) + len(self.backward[1])
+
+    def save(self, path):
+        """Write the hierarchy to a file"""
+        with open(path, 'wb') as f:
+            f.write(self._MAGIC)
+            pickle.dump((self.nodes, self.forward, self.backward), f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Read a hierarchy written by save()"""
+        with open(path, 'rb') as f:
+            if f.read(len(cls._MAGIC)) != cls._MAGIC:
+                raise ValueError("{} is not a contraction hierarchy file".format(path))
+            nodes, forward, backward = pickle.load(f)
+        return cls(nodes, forward, backward)
@@ -1,11 +1,24 @@
 # coding=utf-8
-from collections import namedtuple
-from functools import total_ordering
-from heapq import heappush, heappop
-from itertools import count, zip_longest
+from array import array
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, total_ordering
+from heapq import heapify, heappush, heappop
+from itertools import chain, count, islice, repeat, zip_longest
+from math import inf
+import mmap as _mmap
+import pickle
+import random
+from threading import Lock
+from time import monotonic, perf_counter
 
 
 INITIAL_START = object()
+_NO_PARENT = object()
+
+
+def _always(_):
+    return True
 
 
 class SumTuple(tuple):
@@ -47,6 +60,84 @@ class MaxFirstSumTuple(tuple):
         yield from (x + y for x, y in it)
 
 
+def _vector_sum_source(width, max_first, left, right):
+    """Source of a tuple display adding two cost vectors, given functions naming their k-th elements"""
+    terms = ['{} + {}'.format(left(k), right(k)) for k in range(width)]
+    if max_first:
+        terms[0] = '{0} if {0} >= {1} else {1}'.format(left(0), right(0))
+    return '(' + ', '.join(terms) + ',)'
+
+
+def _coerce_cost(other, width):
+    """Pad a shorter tuple cost out to width, or return None if it is the 0 of an initial sum"""
+    if isinstance(other, tuple):
+        if len(other) > width:
+            raise TypeError("Cannot add a cost of width {} to one of width {}".format(len(other), width))
+        return tuple(other) + (0,) * (width - len(other))
+    if other == 0:
+        return None
+    raise TypeError("Cannot add '{0}' to a cost vector".format(other))
+
+
+def _make_cost_vector(width, max_first, values):
+    return cost_vector(width, max_first)(values)
+
+
+@lru_cache(maxsize=None)
+def cost_vector(width, max_first=False):
+    """
+    :param width: the number of elements in each cost
+    :param max_first: if true, the first element reduces with max instead of sum, like MaxFirstSumTuple
+    :return: a tuple subclass that adds like SumTuple (or MaxFirstSumTuple) for costs of exactly width elements.
+
+    Adding two costs of the same class unpacks both and builds the result directly, without the generators and
+    zip_longest that the open-ended tuple classes need; shorter plain tuples are padded with zeros. Costs still
+    order lexicographically like any tuple. The classes are cached, so each (width, max_first) pair always gives
+    the same class.
+    """
+    if width < 1:
+        raise ValueError("cost vectors need at least one element")
+    name = '{}SumVector{}'.format('MaxFirst' if max_first else '', width)
+
+    def __new__(cls, values=()):
+        values = tuple(values)
+        if len(values) != width:
+            values = _coerce_cost(values, width)
+        return tuple.__new__(cls, values)
+
+    def __reduce__(self):
+        return _make_cost_vector, (width, max_first, tuple(self))
+
+    cls = type(name, (tuple,), {
+        '__slots__': (),
+        '__doc__': "Fixed-width cost of {} elements; see cost_vector()".format(width),
+        '__module__': __name__,
+        '__new__': __new__,
+        '__reduce__': __reduce__,
+        'width': width,
+        'max_first': max_first,
+    })
+    namespace = {'cls': cls, '_coerce': _coerce_cost, '_new': tuple.__new__}
+    exec(
+        "def __add__(self, other):\n"
+        "    if other.__class__ is not cls:\n"
+        "        other = _coerce(other, {width})\n"
+        "        if other is None:\n"
+        "            return self\n"
+        "    {a}, = self\n"
+        "    {b}, = other\n"
+        "    return _new(cls, {total})\n".format(
+            width=width,
+            a=', '.join('a{}'.format(k) for k in range(width)),
+            b=', '.join('b{}'.format(k) for k in range(width)),
+            total=_vector_sum_source(width, max_first, 'a{}'.format, 'b{}'.format),
+        ),
+        namespace
+    )
+    cls.__add__ = cls.__radd__ = namespace['__add__']
+    return cls
+
+
 @total_ordering
 class Worker(object):
     """
@@ -131,14 +222,132 @@ def with_initial(initial):
     return dec
 
 
+class EdgeCacheInfo(namedtuple("EdgeCacheInfo", "hits misses evictions maxsize currsize")):
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CachedEdgefinder(object):
+    """
+    Wraps an expensive edgefinder, keeping the materialized neighbor tuples of the most recently used nodes.
+    Instances are edgefinders themselves, and can be shared by searches running in different threads.
+
+    Call invalidate(node) when the edges out of a node change, or clear() when everything may have. A lookup
+    that was already running when an invalidation happened is returned to its caller but not cached, so stale
+    edges never outlive the call that invalidated them.
+    """
+    __slots__ = ('edgefinder', 'maxsize', '_cache', '_lock', '_generation', '_hits', '_misses', '_evictions')
+
+    def __init__(self, edgefinder, maxsize=4096):
+        """
+        :param edgefinder: A function that returns an iterable of tuples
+            of (neighbor, distance) from the node it is passed
+        :param maxsize: the most nodes to keep edges for, or None for no limit
+        """
+        self.edgefinder = edgefinder
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = Lock()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __call__(self, node):
+        with self._lock:
+            try:
+                edges = self._cache[node]
+            except KeyError:
+                self._misses += 1
+                generation = self._generation
+            else:
+                self._cache.move_to_end(node)
+                self._hits += 1
+                return edges
+
+        # call the edgefinder without holding the lock so that slow lookups do not block other threads
+        edges = tuple(self.edgefinder(node))
+        with self._lock:
+            if generation == self._generation:
+                self._cache[node] = edges
+                if self.maxsize is not None and len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+                    self._evictions += 1
+        return edges
+
+    def invalidate(self, node):
+        """Forget the cached edges of node"""
+        with self._lock:
+            self._cache.pop(node, None)
+            self._generation += 1
+
+    def clear(self):
+        """Forget all cached edges, keeping the statistics"""
+        with self._lock:
+            self._cache.clear()
+            self._generation += 1
+
+    def cache_info(self):
+        """Return an EdgeCacheInfo of the hits, misses, and evictions so far and the current size"""
+        with self._lock:
+            return EdgeCacheInfo(self._hits, self._misses, self._evictions, self.maxsize, len(self._cache))
+
+    def __len__(self):
+        return len(self._cache)
+
+
+def cached_edgefinder(maxsize=4096):
+    """
+    :param maxsize: the most nodes to keep edges for, or None for no limit
+    :return: Decorate an edgefinder to cache its results in a CachedEdgefinder.
+    """
+    def dec(edgefinder):
+        return CachedEdgefinder(edgefinder, maxsize)
+
+    return dec
+
+
+class SearchAborted(Exception):
+    """Raised by a search that ran past one of its limits or was cancelled. reason names the limit."""
+
+    def __init__(self, reason):
+        super().__init__("search aborted: {}".format(reason))
+        self.reason = reason
+
+
+class SearchStats(object):
+    """
+    Counters that a search fills in as it runs, when passed as its stats parameter. Times are in seconds, and
+    edgefinder_time includes iterating over the edges it returns.
+    """
+    __slots__ = ('expansions', 'pushes', 'stale_pops', 'peak_frontier', 'edgefinder_time', 'heuristic_time')
+
+    def __init__(self):
+        self.expansions = 0
+        self.pushes = 0
+        self.stale_pops = 0
+        self.peak_frontier = 0
+        self.edgefinder_time = 0.0
+        self.heuristic_time = 0.0
+
+    def __repr__(self):
+        return "SearchStats({})".format(", ".join("{}={!r}".format(name, getattr(self, name))
+                                                  for name in self.__slots__))
+
+
 def astar(
         starts, valid_destination,
         edgefinder=lambda node: ((x, 1) for x in node),
         heuristic=None,
-        tol=None
+        tol=None,
+        max_expansions=None,
+        max_frontier=None,
+        deadline=None,
+        cancel=None,
+        stats=None
 ):
-    # TODO: flag to optionally exclude paths with cycles
-    # TODO: optimize multiple path iteration
     """
     :param starts: iterable of any type, only used as keys.
     :param valid_destination: a predicate function returning true for any node that is a suitable destination
@@ -147,26 +356,40 @@ def astar(
     :param heuristic: An optional function that returns an optimistic estimate of the distance from a node
         to the nearest valid destination
     :param tol: An optional value; all paths with a total distance less or equal to the best distance plus tol will
-        be yielded
+        be yielded. These may include paths with cycles; see paths_within() for an alternative that excludes them.
+    :param max_expansions: An optional limit on the number of nodes to expand
+    :param max_frontier: An optional limit on the number of entries in the search's priority queue
+    :param deadline: An optional time.monotonic() value to stop searching at
+    :param cancel: An optional object with an is_set() method, such as a threading.Event; the search stops once
+        it is set
+    :param stats: An optional SearchStats to record the search's work in
     :return: A generator of the paths from any starting node to any valid destination, shortest to longest.
         Results are yielded as a tuple of (total cost, path). 'path' here is a tuple-chain from the destination
         (path[0]) back to the starting point (path[1][1][1]...[0]). For a path that goes from 1 to 2 to 3, this
         path would be (3, (2, (1, ()))). See also: convert_path()
+
+        If the search runs past any of its limits or is cancelled, the generator raises SearchAborted.
     """
+    if stats is not None:
+        edgefinder = _timed_edgefinder(edgefinder, stats)
+        if heuristic is not None:
+            heuristic = _timed_heuristic(heuristic, stats)
+    limited = not (max_expansions is None and max_frontier is None and deadline is None and cancel is None)
+
+    # Without tol each node is settled once, so one parent per node is enough to rebuild any path, and paths are
+    # only built for destinations. With tol a node may be reached by several paths, each of which has to be kept.
     if tol is None:
-        visited = set()
+        parents = {}  # also serves as the set of visited nodes
+        chains = {}  # paths already built, by the node they end at
 
         def is_visited(node_, _):
-            return node_ in visited
+            return node_ in parents
 
         def visit(node_, _):
-            if node_ in visited:
-                return False
-            else:
-                visited.add(node_)
-                return True
+            return node_ not in parents
 
     else:
+        parents = None
         distances = {}
 
         def is_visited(node_, dist_):
@@ -179,15 +402,16 @@ def astar(
             else:
                 return dist_ <= distances[node_] + tol
 
+    origin = () if parents is None else _NO_PARENT
     index = count()
     heap = []
 
     def process():
         for seed in starts:
             if heuristic is None:
-                yield 0, 0, None, seed, ()
+                yield 0, 0, None, seed, origin
             else:
-                yield heuristic(seed), 0, None, seed, ()
+                yield heuristic(seed), 0, None, seed, origin
         while heap:
             yield heappop(heap)
 
@@ -196,13 +420,29 @@ def astar(
     #   distance value,
     #   a unique counter for sorting,
     #   the next place to go,
-    #   and the (path, (so, (far,)))
-    for _, dist, _, node, path in process():
+    #   and either the node we came from, or the (path, (so, (far,))) when using tol
+    expansions = 0
+    for _, dist, _, node, came_from in process():
         if visit(node, dist):
-            path = (node, path)
-            if valid_destination(node):
-                yield dist, path
+            if limited:
+                if max_expansions is not None and expansions >= max_expansions:
+                    raise SearchAborted('max_expansions')
+                if deadline is not None and monotonic() >= deadline:
+                    raise SearchAborted('deadline')
+                if cancel is not None and cancel.is_set():
+                    raise SearchAborted('cancelled')
+            expansions += 1
+            if parents is None:
+                came_from = (node, came_from)
+                if valid_destination(node):
+                    yield dist, came_from
+            else:
+                parents[node] = came_from
+                came_from = node
+                if valid_destination(node):
+                    yield dist, _parent_path(node, parents, chains)
 
+            frontier = len(heap)
             for neighbor, dist_to_neighbor in edgefinder(node):
                 neighbor_dist = dist + dist_to_neighbor
                 if is_visited(neighbor, neighbor_dist):
@@ -211,7 +451,52 @@ def astar(
                     h_dist = neighbor_dist
                 else:
                     h_dist = neighbor_dist + heuristic(neighbor)
-                heappush(heap, (h_dist, neighbor_dist, next(index), neighbor, path))
+                heappush(heap, (h_dist, neighbor_dist, next(index), neighbor, came_from))
+
+            if stats is not None:
+                stats.expansions = expansions
+                stats.pushes += len(heap) - frontier
+                if len(heap) > stats.peak_frontier:
+                    stats.peak_frontier = len(heap)
+            if max_frontier is not None and len(heap) > max_frontier:
+                raise SearchAborted('max_frontier')
+        elif stats is not None:
+            stats.stale_pops += 1
+
+
+def _parent_path(node, parents, chains):
+    """
+    Build the tuple-chain path ending at node by following a dict of parent nodes. Chains already built are kept
+    in the dict chains and shared, so that yielding many destinations costs O(1) amortized for each.
+    """
+    steps = []
+    while node is not _NO_PARENT and node not in chains:
+        steps.append(node)
+        node = parents[node]
+    path = () if node is _NO_PARENT else chains[node]
+    for node in reversed(steps):
+        path = chains[node] = (node, path)
+    return path
+
+
+def _timed_edgefinder(edgefinder, stats):
+    def timed(node):
+        start = perf_counter()
+        edges = list(edgefinder(node))
+        stats.edgefinder_time += perf_counter() - start
+        return edges
+
+    return timed
+
+
+def _timed_heuristic(heuristic, stats):
+    def timed(node):
+        start = perf_counter()
+        estimate = heuristic(node)
+        stats.heuristic_time += perf_counter() - start
+        return estimate
+
+    return timed
 
 
 def dijkstra(starts, valid_destination, edgefinder=lambda node: ((x, 1) for x in node)):
@@ -266,6 +551,620 @@ def dijkstra_multiple(starts, destinations, edgefinder=lambda node: ((x, 1) for
         yield result
 
 
+def bidirectional_astar(
+        start, destination,
+        edgefinder=lambda node: ((x, 1) for x in node),
+        reverse_edgefinder=lambda node: ((x, 1) for x in node),
+        heuristic=None,
+        reverse_heuristic=None
+):
+    """
+    :param start: The start node
+    :param destination: The destination node
+    :param edgefinder: A function that returns an iterable of tuples
+        of (neighbor, distance) from the node it is passed
+    :param reverse_edgefinder: A function that returns an iterable of tuples of (neighbor, distance) for
+        every edge leading INTO the node it is passed, from that neighbor
+    :param heuristic: An optional function that returns an optimistic estimate of the distance from a node
+        to the destination
+    :param reverse_heuristic: An optional function that returns an optimistic estimate of the distance from the
+        start to a node
+    :return: Returns the shortest path from the start to the destination as (total cost, path), like
+        dijkstra_simple(), or (None, ()) if none exists.
+
+    Searches forwards from the start and backwards from the destination at the same time, always expanding the
+    side whose frontier is nearer, until the two meet; this explores two small balls instead of one large one.
+
+    The heuristics must be consistent (never decreasing by more than the cost of an edge), and costs must be
+    numbers when they are used. They are combined into the average potential (heuristic - reverse_heuristic) / 2
+    for both directions, which keeps the two searches consistent with each other.
+    """
+    if start == destination:
+        return 0, (start, ())
+    if heuristic is None and reverse_heuristic is None:
+        def potential(_):
+            return 0
+    else:
+        forward_h = heuristic or (lambda _: 0)
+        backward_h = reverse_heuristic or (lambda _: 0)
+
+        def potential(node_):
+            return (forward_h(node_) - backward_h(node_)) / 2
+
+    # per side: tentative distances, parents, settled nodes, heap, edgefinder, and sign of the potential
+    forward = ({start: 0}, {start: _NO_PARENT}, set(), [(potential(start), 0, start)], edgefinder, 1)
+    backward = ({destination: 0}, {destination: _NO_PARENT}, set(), [(-potential(destination), 1, destination)],
+                reverse_edgefinder, -1)
+    index = count(2)
+    best = None
+    meeting = None
+
+    while forward[3] and backward[3]:
+        if best is not None and not forward[3][0][0] + backward[3][0][0] < best:
+            break  # neither frontier can lead to anything shorter
+        side, other = (forward, backward) if forward[3][0][0] <= backward[3][0][0] else (backward, forward)
+        dist, parents, settled, heap, find_edges, sign = side
+        other_dist = other[0]
+
+        _, _, node = heappop(heap)
+        if node in settled:
+            continue  # stale entry
+        settled.add(node)
+        node_dist = dist[node]
+
+        for neighbor, dist_to_neighbor in find_edges(node):
+            if neighbor in settled:
+                continue
+            neighbor_dist = node_dist + dist_to_neighbor
+            if neighbor in dist and not neighbor_dist < dist[neighbor]:
+                continue
+            dist[neighbor] = neighbor_dist
+            parents[neighbor] = node
+            heappush(heap, (neighbor_dist + sign * potential(neighbor), next(index), neighbor))
+            if neighbor in other_dist:
+                total = neighbor_dist + other_dist[neighbor]
+                if best is None or total < best:
+                    best = total
+                    meeting = neighbor
+
+    if best is None:
+        return None, ()
+    steps = []
+    node = meeting
+    while node is not _NO_PARENT:
+        steps.append(node)
+        node = forward[1][node]
+    steps.reverse()
+    node = backward[1][meeting]
+    while node is not _NO_PARENT:
+        steps.append(node)
+        node = backward[1][node]
+    path = ()
+    for node in steps:
+        path = (node, path)
+    return best, path
+
+
+def bidirectional_dijkstra(
+        start, destination,
+        edgefinder=lambda node: ((x, 1) for x in node),
+        reverse_edgefinder=lambda node: ((x, 1) for x in node)
+):
+    """
+    :param start: The start node
+    :param destination: The destination node
+    :param edgefinder: A function that returns an iterable of tuples
+        of (neighbor, distance) from the node it is passed
+    :param reverse_edgefinder: A function that returns an iterable of tuples of (neighbor, distance) for
+        every edge leading INTO the node it is passed, from that neighbor
+    :return: Returns the shortest path from the start to the destination as (total cost, path), like
+        dijkstra_simple(), or (None, ()) if none exists. See bidirectional_astar().
+    """
+    return bidirectional_astar(start, destination, edgefinder, reverse_edgefinder)
+
+
+def _spur_path(spur, sink, edgefinder, blocked_nodes, blocked_edges):
+    """
+    Shortest path from spur to sink that avoids blocked_nodes and the (node, neighbor) edges in blocked_edges.
+    Returns the list of nodes on the path and the list of their distances from spur, or None.
+    """
+    dist = {spur: 0}
+    parents = {spur: _NO_PARENT}
+    settled = set()
+    index = count(1)
+    heap = [(0, 0, spur)]
+    while heap:
+        node_dist, _, node = heappop(heap)
+        if node in settled:
+            continue  # stale entry
+        if node is sink:
+            steps = []
+            while node is not _NO_PARENT:
+                steps.append(node)
+                node = parents[node]
+            steps.reverse()
+            return steps, [dist[step] for step in steps]
+        settled.add(node)
+        for neighbor, dist_to_neighbor in edgefinder(node):
+            if neighbor in settled or neighbor in blocked_nodes or (node, neighbor) in blocked_edges:
+                continue
+            neighbor_dist = node_dist + dist_to_neighbor
+            if neighbor in dist and not neighbor_dist < dist[neighbor]:
+                continue
+            dist[neighbor] = neighbor_dist
+            parents[neighbor] = node
+            heappush(heap, (neighbor_dist, next(index), neighbor))
+    return None
+
+
+def k_shortest_paths(starts, valid_destination, edgefinder=lambda node: ((x, 1) for x in node), k=None):
+    """
+    :param starts: iterable of any type, only used as keys.
+    :param valid_destination: a predicate function returning true for any node that is a suitable destination
+    :param edgefinder: A function that returns an iterable of tuples
+        of (neighbor, distance) from the node it is passed
+    :param k: An optional maximum number of paths to yield
+    :return: A generator of the k shortest paths without cycles from any starting node to any valid destination,
+        shortest to longest, as (total cost, path) like astar().
+
+    This is Yen's algorithm: each path found is a candidate generator, branching off ("spurring") at each of its
+    nodes onto the shortest path that avoids the nodes before the spur and every edge already used by a known
+    path with the same prefix. Spurs are only taken at or after the point where a path deviated from the path it
+    was derived from, since the branches before that were already tried by its parent. Each node's edges are
+    only found once, and when k is given only the best k remaining candidates are kept.
+    """
+    return _yen(starts, valid_destination, edgefinder, k, None)
+
+
+def _yen(starts, valid_destination, edgefinder, k, tol):
+    """
+    Generator behind k_shortest_paths() and paths_within(). Candidates beyond the k still wanted, or costing more
+    than tol over the shortest path when tol is not None, can never be yielded and are not kept.
+    """
+    source = object()
+    sink = object()
+    starts = list(dict.fromkeys(starts))
+    edge_cache = {}
+
+    def find_edges(node):
+        try:
+            return edge_cache[node]
+        except KeyError:
+            pass
+        if node is source:
+            result = [(seed, 0) for seed in starts]
+        elif node is sink:
+            result = []
+        else:
+            result = list(edgefinder(node))
+            if valid_destination(node):
+                result.append((sink, 0))
+        edge_cache[node] = result
+        return result
+
+    first = _spur_path(source, sink, find_edges, (), ())
+    if first is None:
+        return
+    max_cost = inf if tol is None else first[1][-1] + tol
+    index = count(1)
+    # heap of (cost, counter, nodes, distances, index of the node the path deviated from its parent at)
+    candidates = [(first[1][-1], 0, tuple(first[0]), first[1], 0)]
+    queued = {candidates[0][2]}
+    found = []
+    while candidates and (k is None or len(found) < k):
+        cost, _, nodes, distances, deviation = heappop(candidates)
+        queued.discard(nodes)
+        found.append(nodes)
+        path = ()
+        for node in nodes[1:-1]:
+            path = (node, path)
+        yield cost, path
+        if k is not None and len(found) == k:
+            return
+
+        # the last node is the sink, which there is no branching from
+        for i in range(deviation, len(nodes) - 1):
+            root = nodes[:i + 1]
+            spur = nodes[i]
+            blocked_edges = {(spur, known[i + 1]) for known in found if known[:i + 1] == root}
+            spur_result = _spur_path(spur, sink, find_edges, set(root[:-1]), blocked_edges)
+            if spur_result is None:
+                continue
+            new_nodes = root + tuple(spur_result[0][1:])
+            if new_nodes in queued:
+                continue
+            root_dist = distances[i]
+            new_distances = distances[:i + 1] + [root_dist + d for d in spur_result[1][1:]]
+            if new_distances[-1] > max_cost:
+                continue
+            heappush(candidates, (new_distances[-1], next(index), new_nodes, new_distances, i))
+            queued.add(new_nodes)
+
+        if k is not None and len(candidates) > k - len(found):
+            # candidates past the number of paths still wanted can never be yielded
+            keep = k - len(found)
+            candidates.sort()
+            for dropped in candidates[keep:]:
+                queued.discard(dropped[2])
+            del candidates[keep:]
+
+
+def paths_within(starts, valid_destination, edgefinder=lambda node: ((x, 1) for x in node), tol=0):
+    """
+    :param starts: iterable of any type, only used as keys.
+    :param valid_destination: a predicate function returning true for any node that is a suitable destination
+    :param edgefinder: A function that returns an iterable of tuples
+        of (neighbor, distance) from the node it is passed
+    :param tol: all paths with a total distance less or equal to the best distance plus tol will be yielded
+    :return: A generator of the paths without cycles from any starting node to any valid destination whose cost
+        is within tol of the shortest, shortest to longest, as (total cost, path) like astar().
+
+    Unlike astar() with tol, this never yields paths that loop back on themselves, and each path is only
+    produced once, lazily, so stopping early does not pay for the rest. Candidate paths costing more than that
+    are dropped as soon as they are found. See k_shortest_paths().
+    """
+    return _yen(starts, valid_destination, edgefinder, None, tol)
+
+
+class DistanceMatrix(object):
+    """
+    Table of shortest distances from each of a list of origins to each of a list of destinations, stored row-major
+    in a single array of doubles. Unreachable pairs are inf.
+
+    Index it with matrix[origin, destination], or get a whole row with matrix.row(origin).
+    """
+    __slots__ = ('origins', 'destinations', 'values', '_origin_index', '_destination_index')
+
+    def __init__(self, origins, destinations, values=None):
+        """
+        :param origins: list of origin nodes
+        :param destinations: list of destination nodes
+        :param values: optional array('d') of len(origins) * len(destinations) distances; defaults to all inf
+        """
+        self.origins = origins
+        self.destinations = destinations
+        if values is None:
+            values = array('d', [inf]) * (len(origins) * len(destinations))
+        self.values = values
+        self._origin_index = {}
+        for i, origin in enumerate(origins):
+            self._origin_index.setdefault(origin, i)
+        self._destination_index = {}
+        for j, destination in enumerate(destinations):
+            self._destination_index.setdefault(destination, j)
+
+    def __getitem__(self, key):
+        origin, destination = key
+        return self.values[self._origin_index[origin] * len(self.destinations) + self._destination_index[destination]]
+
+    def row(self, origin):
+        """Return an array of the distances from origin to each destination, in order"""
+        width = len(self.destinations)
+        i = self._origin_index[origin]
+        return self.values[i * width:(i + 1) * width]
+
+    def __len__(self):
+        return len(self.origins)
+
+    def __repr__(self):
+        return "DistanceMatrix({} origins x {} destinations)".format(len(self.origins), len(self.destinations))
+
+
+def _distance_row(origin, destinations, edgefinder):
+    """
+    Distances from origin to every node in destinations as an array('d'), searching only until all of them
+    are settled.
+    """
+    positions = {}
+    for j, destination in enumerate(destinations):
+        positions.setdefault(destination, []).append(j)
+    row = array('d', [inf]) * len(destinations)
+    remaining = len(positions)
+    dist = {origin: 0}
+    settled = set()
+    heap = [(0, 0, origin)]
+    index = count(1)
+    while heap and remaining:
+        node_dist, _, node = heappop(heap)
+        if node in settled:
+            continue  # stale entry
+        settled.add(node)
+        if node in positions:
+            for j in positions[node]:
+                row[j] = node_dist
+            remaining -= 1
+        for neighbor, dist_to_neighbor in edgefinder(node):
+            if neighbor in settled:
+                continue
+            neighbor_dist = node_dist + dist_to_neighbor
+            if neighbor in dist and not neighbor_dist < dist[neighbor]:
+                continue
+            dist[neighbor] = neighbor_dist
+            heappush(heap, (neighbor_dist, next(index), neighbor))
+    return row
+
+
+# the destinations and edgefinder each distance_matrix() worker process searches with
+_distance_job = None
+
+
+def _load_distance_job(destinations, edgefinder):
+    global _distance_job
+    _distance_job = destinations, edgefinder
+
+
+def _distance_rows(origins):
+    """Process pool task: the concatenated distance rows of several origins"""
+    destinations, edgefinder = _distance_job
+    result = array('d')
+    for origin in origins:
+        result.extend(_distance_row(origin, destinations, edgefinder))
+    return result
+
+
+def distance_matrix(
+        origins, destinations,
+        edgefinder=lambda node: ((x, 1) for x in node),
+        workers=None,
+        chunksize=16
+):
+    """
+    :param origins: iterable of origin nodes
+    :param destinations: iterable of destination nodes
+    :param edgefinder: A function that returns an iterable of tuples
+        of (neighbor, distance) from the node it is passed. Distances must be numbers.
+    :param workers: if more than 1, the number of processes to spread the origins over. edgefinder, the nodes,
+        and the distances must then be picklable; the edgefinder of a CompiledGraph is. The edgefinder and the
+        destinations are sent to each worker process once, when it starts.
+    :param chunksize: how many origins each process pool task covers
+    :return: a DistanceMatrix of the shortest distance from every origin to every destination
+
+    Runs one Dijkstra search per origin, each stopping as soon as every destination is settled. For large tables
+    on a static graph, ContractionHierarchy.distance_matrix() is much faster.
+    """
+    origins = list(origins)
+    destinations = list(destinations)
+    matrix = DistanceMatrix(origins, destinations)
+    width = len(destinations)
+    if not width:
+        return matrix
+    if workers is None or workers <= 1:
+        for i, origin in enumerate(origins):
+            matrix.values[i * width:(i + 1) * width] = _distance_row(origin, destinations, edgefinder)
+        return matrix
+
+    chunks = [origins[i:i + chunksize] for i in range(0, len(origins), chunksize)]
+    with ProcessPoolExecutor(workers, initializer=_load_distance_job, initargs=(destinations, edgefinder)) as pool:
+        for i, rows in zip(range(0, len(origins), chunksize), pool.map(_distance_rows, chunks)):
+            matrix.values[i * width:i * width + len(rows)] = rows
+    return matrix
+
+
+# the graph each batch_paths() worker process answers queries on
+_batch_graph = None
+
+
+def _load_batch_graph(graph):
+    global _batch_graph
+    _batch_graph = graph() if callable(graph) else graph
+
+
+def _answer_query(graph, start, destination, costs_only):
+    """(cost, path) for one query on a compiled graph or contraction hierarchy; path is None if costs_only"""
+    if costs_only and hasattr(graph, 'distance'):
+        return graph.distance(start, destination), None
+    find = graph.query if hasattr(graph, 'query') else graph.dijkstra_simple
+    cost, path = find(start, destination)
+    return cost, (None if costs_only else path)
+
+
+def _batch_task(queries, costs_only):
+    """Process pool task: answer a chunk of queries, with paths flattened into lists for transfer"""
+    results = []
+    for query_id, start, destination in queries:
+        cost, path = _answer_query(_batch_graph, start, destination, costs_only)
+        results.append((query_id, cost, None if path is None else convert_path(path)))
+    return results
+
+
+def batch_paths(queries, graph, workers=None, costs_only=False, chunksize=256):
+    """
+    :param queries: iterable of (query id, start, destination) tuples
+    :param graph: a CompiledGraph, MultiCostGraph, or ContractionHierarchy to search, or a picklable function
+        that returns one, such as functools.partial(ContractionHierarchy.load, path), to load it in each worker
+        instead of sending it
+    :param workers: if more than 1, the number of processes to answer queries in
+    :param costs_only: if true, paths are not built or sent back, and None is yielded in their place
+    :param chunksize: how many queries each process pool task covers
+    :return: A generator of (query id, cost, path) for each query, in order, where path is a tuple-chain like
+        dijkstra_simple() returns; or (query id, None, ()) when there is no path.
+
+    The graph is sent to each worker process once, when it starts. Paths travel back as flat lists, and results
+    are the same as answering the queries one at a time with the graph's own search.
+    """
+    if workers is None or workers <= 1:
+        graph = graph() if callable(graph) else graph
+        for query_id, start, destination in queries:
+            cost, path = _answer_query(graph, start, destination, costs_only)
+            yield query_id, cost, path
+        return
+
+    queries = iter(queries)
+    pool = ProcessPoolExecutor(workers, initializer=_load_batch_graph, initargs=(graph,))
+    # only a few chunks are in flight at a time, so that queries are read and results arrive as they go
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(islice(queries, chunksize))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_batch_task, chunk, costs_only))
+            if not pending:
+                break
+            for query_id, cost, steps in pending.popleft().result():
+                if steps is None:
+                    yield query_id, cost, None
+                else:
+                    path = ()
+                    for node in steps:
+                        path = (node, path)
+                    yield query_id, cost, path
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown()
+
+
+class IncrementalPlanner(object):
+    """
+    Shortest path planner between a fixed start and destination that keeps its search state between plans, so
+    that after some edge costs change, replan() only repairs the part of the search those changes affect
+    instead of starting over. This is Lifelong Planning A* (LPA*).
+
+    Tell the planner about changes with update_edge() or invalidate() after they are visible through the
+    edgefinders; they are applied on the next replan(). Costs must be positive numbers, unlike in the other
+    searches here: a cycle of zero-cost edges would let its nodes keep each other's distances from rising, so
+    replan() raises ValueError when it finds an edge costing zero or less. The heuristic, if any, must be
+    consistent.
+    """
+    __slots__ = (
+        'start', 'destination', 'edgefinder', 'reverse_edgefinder', 'heuristic', 'expansions',
+        '_g', '_rhs', '_queue', '_keys', '_index', '_dependents', '_changed', '_invalidated',
+    )
+
+    def __init__(
+            self, start, destination,
+            edgefinder=lambda node: ((x, 1) for x in node),
+            reverse_edgefinder=lambda node: ((x, 1) for x in node),
+            heuristic=None
+    ):
+        """
+        :param start: The start node
+        :param destination: The destination node
+        :param edgefinder: A function that returns an iterable of tuples
+            of (neighbor, distance) from the node it is passed
+        :param reverse_edgefinder: A function that returns an iterable of tuples of (neighbor, distance) for
+            every edge leading INTO the node it is passed, from that neighbor
+        :param heuristic: An optional function that returns an optimistic estimate of the distance from a node
+            to the destination
+        """
+        self.start = start
+        self.destination = destination
+        self.edgefinder = edgefinder
+        self.reverse_edgefinder = reverse_edgefinder
+        self.heuristic = heuristic
+        self.expansions = 0  # total nodes expanded by all plans so far
+        # g is the distance found when a node was last expanded, rhs the best distance through its predecessors'
+        # g; nodes where they differ are queued. Missing entries are inf.
+        self._g = {}
+        self._rhs = {start: 0}
+        self._queue = []
+        self._keys = {}  # node -> the key it is currently queued with
+        self._index = count()
+        self._dependents = {}  # node -> the nodes whose rhs was computed from its g
+        self._changed = set()
+        self._invalidated = set()
+        self._enqueue(start)
+
+    def _enqueue(self, node):
+        best = min(self._g.get(node, inf), self._rhs.get(node, inf))
+        key = (best if self.heuristic is None else best + self.heuristic(node), best)
+        self._keys[node] = key
+        heappush(self._queue, (key, next(self._index), node))
+
+    def _update(self, node):
+        """Recompute the rhs of node and queue or dequeue it accordingly"""
+        g = self._g
+        if node != self.start:
+            rhs = inf
+            dependents = self._dependents
+            for predecessor, cost in self.reverse_edgefinder(node):
+                if cost <= 0:
+                    raise ValueError("IncrementalPlanner needs positive edge costs, not {!r}".format(cost))
+                dependents.setdefault(predecessor, set()).add(node)
+                through = g.get(predecessor, inf) + cost
+                if through < rhs:
+                    rhs = through
+            if rhs == inf:
+                self._rhs.pop(node, None)
+            else:
+                self._rhs[node] = rhs
+        if g.get(node, inf) != self._rhs.get(node, inf):
+            self._enqueue(node)
+        else:
+            self._keys.pop(node, None)  # any entry left in the queue is now stale
+
+    def update_edge(self, u, v):
+        """Note that the edge from u to v has changed cost, appeared, or disappeared"""
+        self._changed.add(v)
+
+    def invalidate(self, node):
+        """Note that any of the edges into or out of node may have changed"""
+        self._invalidated.add(node)
+
+    def replan(self):
+        """
+        :return: Returns the shortest path from the start to the destination given the current edges as
+            (total cost, path), like dijkstra_simple(), or (None, ()) if none exists.
+        """
+        changed = self._changed
+        for node in self._invalidated:
+            changed.add(node)
+            # both the nodes that used to depend on this one, and any it has new edges to
+            changed.update(self._dependents.get(node, ()))
+            if node in self._g:
+                changed.update(neighbor for neighbor, _ in self.edgefinder(node))
+        for node in changed:
+            self._update(node)
+        changed.clear()
+        self._invalidated.clear()
+
+        g, rhs, queue, keys = self._g, self._rhs, self._queue, self._keys
+        destination = self.destination
+        while queue:
+            key, _, node = queue[0]
+            if keys.get(node) != key:
+                heappop(queue)  # stale entry
+                continue
+            best = min(g.get(destination, inf), rhs.get(destination, inf))
+            destination_key = (best if self.heuristic is None else best + self.heuristic(destination), best)
+            if not key < destination_key and g.get(destination, inf) == rhs.get(destination, inf):
+                break
+            heappop(queue)
+            del keys[node]
+            self.expansions += 1
+            successors = [neighbor for neighbor, _ in self.edgefinder(node)]
+            if g.get(node, inf) > rhs.get(node, inf):
+                g[node] = rhs[node]
+            else:
+                # node got more expensive: forget it and let it and everything that relied on it find new routes
+                g.pop(node, None)
+                self._update(node)
+            for neighbor in successors:
+                self._update(neighbor)
+
+        if destination not in g:
+            return None, ()
+        steps = [destination]
+        seen = {destination}
+        node = destination
+        while node != self.start:
+            best, node = min(
+                ((g.get(predecessor, inf) + cost, predecessor)
+                 for predecessor, cost in self.reverse_edgefinder(node) if predecessor not in seen),
+                key=lambda x: x[0], default=(inf, None)
+            )
+            if best == inf:
+                return None, ()  # the edgefinders disagree with the changes the planner was told about
+            steps.append(node)
+            seen.add(node)
+        path = ()
+        for node in reversed(steps):
+            path = (node, path)
+        return g[destination], path
+
+
 def convert_path(path):
     """Convert a reverse linked tuple path (3, (2, (1, ()))) to a forwards list [1, 2, 3]."""
     result = []
@@ -276,4 +1175,912 @@ def convert_path(path):
     return result
 
 
-# TODO: spanning tree algorithms: Prim, Wilson
+def _unwind(i, parent, nodes, chains):
+    """
+    Build a reverse linked tuple path ending at interned node i by following parent indices. Paths already built
+    are kept in the list chains by interned node and shared, so that yielding many destinations costs O(1)
+    amortized for each.
+    """
+    steps = []
+    while i >= 0 and chains[i] is None:
+        steps.append(i)
+        i = parent[i]
+    path = () if i < 0 else chains[i]
+    for i in reversed(steps):
+        path = chains[i] = (nodes[i], path)
+    return path
+
+
+class CompiledGraph(object):
+    """
+    A static graph with its nodes interned to consecutive ints and its edges stored in compressed sparse row
+    arrays: the edges leaving node i are targets[offsets[i]:offsets[i + 1]], with matching costs. Searches over
+    a CompiledGraph work on flat per-node lists instead of hashing node objects, do not call any edgefinder, and
+    keep one parent pointer per node instead of a tuple-chain per heap entry.
+
+    Costs must be plain numbers; they are stored in an array of the given typecode, which by default is 'q' if
+    every cost is an int and 'd' otherwise.
+
+    The astar(), dijkstra() and dijkstra_*() methods take and yield the original node objects, in the same
+    (cost, path) tuple-chain format as the module-level functions, so switching over is a matter of replacing
+    astar(starts, valid_destination, edgefinder) with graph.astar(starts, valid_destination). They always find
+    one best path per destination; for enumerating near-optimal paths with tol, use astar() itself.
+    """
+    __slots__ = ('nodes', 'index', 'offsets', 'targets', 'costs')
+
+    def __init__(self, nodes, offsets, targets, costs):
+        """
+        :param nodes: list of the original node objects, in interned order
+        :param offsets: array of len(nodes) + 1 offsets into targets and costs
+        :param targets: array of interned neighbor indices for each edge
+        :param costs: array of the cost of each edge
+        """
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+
+    @staticmethod
+    def _cost_typecode(costs):
+        return 'q' if all(type(c) is int for c in costs) else 'd'
+
+    @classmethod
+    def from_edges(cls, edges, nodes=(), typecode=None):
+        """
+        Compile a graph from an iterable of (node, neighbor, cost) edges. Nodes that have no edges can be included
+        by listing them in nodes.
+        """
+        index = {}
+        node_list = []
+
+        def intern(node):
+            i = index.get(node)
+            if i is None:
+                i = index[node] = len(node_list)
+                node_list.append(node)
+            return i
+
+        for node in nodes:
+            intern(node)
+        sources = array('q')
+        targets = array('q')
+        edge_costs = []
+        for node, neighbor, cost in edges:
+            sources.append(intern(node))
+            targets.append(intern(neighbor))
+            edge_costs.append(cost)
+
+        # counting sort of the edges by source node
+        n = len(node_list)
+        offsets = array('q', [0]) * (n + 1)
+        for i in sources:
+            offsets[i + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        position = offsets[:-1]
+        sorted_targets = array('q', [0]) * len(targets)
+        costs = array(typecode or cls._cost_typecode(edge_costs), [0]) * len(targets)
+        for i, target, cost in zip(sources, targets, edge_costs):
+            e = position[i]
+            sorted_targets[e] = target
+            costs[e] = cost
+            position[i] = e + 1
+
+        graph = cls.__new__(cls)
+        graph.nodes = node_list
+        graph.index = index
+        graph.offsets = offsets
+        graph.targets = sorted_targets
+        graph.costs = costs
+        return graph
+
+    @classmethod
+    def from_edgefinder(cls, starts, edgefinder, typecode=None):
+        """Compile every node reachable from starts by exploring the graph described by edgefinder"""
+        index = {}
+        node_list = []
+        for start in starts:
+            if start not in index:
+                index[start] = len(node_list)
+                node_list.append(start)
+        offsets = array('q', [0])
+        targets = array('q')
+        edge_costs = []
+        i = 0
+        while i < len(node_list):  # node_list doubles as the breadth-first queue
+            for neighbor, cost in edgefinder(node_list[i]):
+                j = index.get(neighbor)
+                if j is None:
+                    j = index[neighbor] = len(node_list)
+                    node_list.append(neighbor)
+                targets.append(j)
+                edge_costs.append(cost)
+            offsets.append(len(targets))
+            i += 1
+
+        graph = cls.__new__(cls)
+        graph.nodes = node_list
+        graph.index = index
+        graph.offsets = offsets
+        graph.targets = targets
+        graph.costs = array(typecode or cls._cost_typecode(edge_costs), edge_costs)
+        return graph
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def edge_count(self):
+        return len(self.targets)
+
+    def edges(self):
+        """Iterate over every (node, neighbor, cost) edge in the graph"""
+        nodes, offsets, targets, costs = self.nodes, self.offsets, self.targets, self.costs
+        for i, node in enumerate(nodes):
+            for e in range(offsets[i], offsets[i + 1]):
+                yield node, nodes[targets[e]], costs[e]
+
+    def edgefinder(self, node):
+        """An edgefinder for the compiled graph, for use with the module-level search functions"""
+        i = self.index[node]
+        nodes, targets, costs = self.nodes, self.targets, self.costs
+        for e in range(self.offsets[i], self.offsets[i + 1]):
+            yield nodes[targets[e]], costs[e]
+
+    def reversed(self):
+        """Return a CompiledGraph with every edge reversed, sharing this graph's node numbering"""
+        n = len(self.nodes)
+        offsets, targets, costs = self.offsets, self.targets, self.costs
+        reverse_offsets = array('q', [0]) * (n + 1)
+        for j in targets:
+            reverse_offsets[j + 1] += 1
+        for j in range(n):
+            reverse_offsets[j + 1] += reverse_offsets[j]
+        position = reverse_offsets[:-1]
+        reverse_targets = array('q', [0]) * len(targets)
+        reverse_costs = array(costs.typecode, [0]) * len(costs)
+        for i in range(n):
+            for e in range(offsets[i], offsets[i + 1]):
+                j = targets[e]
+                r = position[j]
+                reverse_targets[r] = i
+                reverse_costs[r] = costs[e]
+                position[j] = r + 1
+
+        graph = CompiledGraph.__new__(CompiledGraph)
+        graph.nodes = self.nodes
+        graph.index = self.index
+        graph.offsets = reverse_offsets
+        graph.targets = reverse_targets
+        graph.costs = reverse_costs
+        return graph
+
+    def astar(self, starts, valid_destination, heuristic=None):
+        """
+        :param starts: iterable of nodes in the graph
+        :param valid_destination: a predicate function returning true for any node that is a suitable destination
+        :param heuristic: An optional function that returns an optimistic estimate of the distance from a node
+            to the nearest valid destination. It is called at most once per node.
+        :return: A generator of the paths from any starting node to any valid destination, shortest to longest,
+            as (total cost, path) with the same tuple-chain paths as astar().
+        """
+        nodes, offsets, targets, costs = self.nodes, self.offsets, self.targets, self.costs
+        n = len(nodes)
+        dist = [None] * n
+        parent = [-1] * n
+        chains = [None] * n  # paths already built, by interned node
+        settled = bytearray(n)
+        estimate = None if heuristic is None else [None] * n
+        heap = []
+        for start in starts:
+            i = self.index[start]
+            if dist[i] is None:
+                dist[i] = 0
+                if heuristic is None:
+                    heap.append((0, i))
+                else:
+                    h = estimate[i] = heuristic(start)
+                    heap.append((h, i))
+        heapify(heap)
+
+        # Heap values are:
+        #   distance + heuristic,
+        #   and the interned node index, which also breaks ties
+        while heap:
+            _, i = heappop(heap)
+            if settled[i]:
+                continue  # stale entry; node was already reached more cheaply
+            settled[i] = 1
+            d = dist[i]
+            if valid_destination(nodes[i]):
+                yield d, _unwind(i, parent, nodes, chains)
+
+            for e in range(offsets[i], offsets[i + 1]):
+                j = targets[e]
+                if settled[j]:
+                    continue
+                neighbor_dist = d + costs[e]
+                old = dist[j]
+                if old is not None and old <= neighbor_dist:
+                    continue
+                dist[j] = neighbor_dist
+                parent[j] = i
+                if heuristic is None:
+                    heappush(heap, (neighbor_dist, j))
+                else:
+                    h = estimate[j]
+                    if h is None:
+                        h = estimate[j] = heuristic(nodes[j])
+                    heappush(heap, (neighbor_dist + h, j))
+
+    def dijkstra(self, starts, valid_destination):
+        """Like dijkstra(), over the compiled graph"""
+        return self.astar(starts, valid_destination)
+
+    def dijkstra_first(self, starts, valid_destination):
+        """Like dijkstra_first(), over the compiled graph"""
+        return next(self.astar(starts, valid_destination), (None, ()))
+
+    def dijkstra_simple(self, start, destination):
+        """Like dijkstra_simple(), over the compiled graph"""
+        return self.dijkstra_first((start,), (lambda node: node == destination))
+
+
+@lru_cache(maxsize=None)
+def _vector_extender(width, max_first):
+    """
+    Returns a function that takes parallel cost arrays and returns a function (dist, e) -> dist plus the cost of
+    edge e, as a plain tuple
+    """
+    namespace = {}
+    exec(
+        "def bind({arrays}):\n"
+        "    def extend(dist, e):\n"
+        "        {a}, = dist\n"
+        "        return {total}\n"
+        "    return extend\n".format(
+            arrays=', '.join('c{}'.format(k) for k in range(width)),
+            a=', '.join('a{}'.format(k) for k in range(width)),
+            total=_vector_sum_source(width, max_first, 'a{}'.format, 'c{}[e]'.format),
+        ),
+        namespace
+    )
+    return namespace['bind']
+
+
+class MultiCostGraph(object):
+    """
+    A CompiledGraph for multi-criteria costs: each edge's cost is a fixed-width vector, stored as one array per
+    element (costs[k][e] is element k of the cost of edge e). Costs add like SumTuple, or like MaxFirstSumTuple if
+    max_first is set, and order lexicographically.
+
+    Searches add each edge's cost elements straight out of the arrays into the plain tuple that goes on the heap,
+    so no cost objects are built along the way; results are yielded as cost_vector(width, max_first) instances.
+    """
+    __slots__ = ('nodes', 'index', 'offsets', 'targets', 'costs', 'max_first')
+
+    def __init__(self, nodes, offsets, targets, costs, max_first=False):
+        """
+        :param nodes: list of the original node objects, in interned order
+        :param offsets: array of len(nodes) + 1 offsets into targets and costs
+        :param targets: array of interned neighbor indices for each edge
+        :param costs: list of arrays, one per cost element, each with an entry for every edge
+        :param max_first: whether the first cost element reduces with max instead of sum
+        """
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+        self.max_first = max_first
+
+    @classmethod
+    def _from_compiled(cls, graph, edge_costs, max_first, typecode):
+        """
+        Build from a CompiledGraph whose edge costs are indices into edge_costs, a list of the real cost tuples
+        """
+        width = max(map(len, edge_costs), default=1)
+        columns = [[0] * len(graph.targets) for _ in range(width)]
+        for e, which in enumerate(graph.costs):
+            for k, element in enumerate(edge_costs[which]):
+                columns[k][e] = element
+        result = cls.__new__(cls)
+        result.nodes = graph.nodes
+        result.index = graph.index
+        result.offsets = graph.offsets
+        result.targets = graph.targets
+        result.costs = [array(typecode or CompiledGraph._cost_typecode(column), column) for column in columns]
+        result.max_first = max_first
+        return result
+
+    @classmethod
+    def from_edges(cls, edges, nodes=(), max_first=False, typecode=None):
+        """
+        Compile a graph from an iterable of (node, neighbor, cost) edges, where each cost is a tuple. Shorter
+        costs are padded with zeros to the width of the longest.
+        """
+        edge_costs = []
+
+        def numbered():
+            for node, neighbor, cost in edges:
+                yield node, neighbor, len(edge_costs)
+                edge_costs.append(cost)
+
+        return cls._from_compiled(CompiledGraph.from_edges(numbered(), nodes, 'q'), edge_costs, max_first, typecode)
+
+    @classmethod
+    def from_edgefinder(cls, starts, edgefinder, max_first=False, typecode=None):
+        """Compile every node reachable from starts by exploring the graph described by edgefinder"""
+        edge_costs = []
+
+        def numbered(node):
+            for neighbor, cost in edgefinder(node):
+                yield neighbor, len(edge_costs)
+                edge_costs.append(cost)
+
+        return cls._from_compiled(CompiledGraph.from_edgefinder(starts, numbered, 'q'), edge_costs, max_first,
+                                  typecode)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    @property
+    def width(self):
+        return len(self.costs)
+
+    def edge_count(self):
+        return len(self.targets)
+
+    def edgefinder(self, node):
+        """An edgefinder for the compiled graph with cost_vector costs, for use with the module-level functions"""
+        i = self.index[node]
+        vector = cost_vector(len(self.costs), self.max_first)
+        nodes, targets, costs = self.nodes, self.targets, self.costs
+        for e in range(self.offsets[i], self.offsets[i + 1]):
+            yield nodes[targets[e]], vector(column[e] for column in costs)
+
+    def dijkstra(self, starts, valid_destination):
+        """
+        :param starts: iterable of nodes in the graph
+        :param valid_destination: a predicate function returning true for any node that is a suitable destination
+        :return: A generator of the paths from any starting node to any valid destination, shortest to longest,
+            as (total cost, path) with the same tuple-chain paths as astar().
+        """
+        nodes, offsets, targets = self.nodes, self.offsets, self.targets
+        width = len(self.costs)
+        vector = cost_vector(width, self.max_first)
+        extend = _vector_extender(width, self.max_first)(*self.costs)
+        n = len(nodes)
+        dist = [None] * n
+        parent = [-1] * n
+        chains = [None] * n  # paths already built, by interned node
+        settled = bytearray(n)
+        zero = (0,) * width
+        heap = []
+        for start in starts:
+            i = self.index[start]
+            if dist[i] is None:
+                dist[i] = zero
+                heap.append((zero, i))
+        heapify(heap)
+
+        while heap:
+            d, i = heappop(heap)
+            if settled[i]:
+                continue  # stale entry; node was already reached more cheaply
+            settled[i] = 1
+            if valid_destination(nodes[i]):
+                yield vector(d), _unwind(i, parent, nodes, chains)
+
+            for e in range(offsets[i], offsets[i + 1]):
+                j = targets[e]
+                if settled[j]:
+                    continue
+                neighbor_dist = extend(d, e)
+                old = dist[j]
+                if old is not None and old <= neighbor_dist:
+                    continue
+                dist[j] = neighbor_dist
+                parent[j] = i
+                heappush(heap, (neighbor_dist, j))
+
+    def dijkstra_first(self, starts, valid_destination):
+        """Like dijkstra_first(), over the compiled graph"""
+        return next(self.dijkstra(starts, valid_destination), (None, ()))
+
+    def dijkstra_simple(self, start, destination):
+        """Like dijkstra_simple(), over the compiled graph"""
+        return self.dijkstra_first((start,), (lambda node: node == destination))
+
+
+class Landmarks(object):
+    """
+    Precomputed distances to and from a handful of landmark nodes, which give admissible heuristics for astar()
+    on any graph (ALT: A*, landmarks, and the triangle inequality). For a destination t and any landmark L, the
+    distance from a node v to t is at least d(L, t) - d(L, v) and at least d(v, L) - d(t, L); the heuristic is
+    the largest of these bounds.
+
+    Build with Landmarks.build(), then pass landmarks.heuristic(destination) to astar() as its heuristic.
+    Distances are kept as one array of doubles per landmark, indexed by the same interned node numbering as
+    CompiledGraph, with unreachable nodes at infinity. save() writes them to a file which load() can read back
+    or memory-map.
+    """
+    __slots__ = ('nodes', 'index', 'landmarks', 'forward', 'backward')
+
+    _MAGIC = b'ALT1'
+
+    def __init__(self, nodes, index, landmarks, forward, backward):
+        """
+        :param nodes: list of nodes in interned order
+        :param index: dict mapping each node to its interned number
+        :param landmarks: list of the landmark nodes
+        :param forward: for each landmark, a sequence of distances from the landmark to each node
+        :param backward: for each landmark, a sequence of distances from each node to the landmark. For
+            undirected graphs this is the same as forward.
+        """
+        self.nodes = nodes
+        self.index = index
+        self.landmarks = landmarks
+        self.forward = forward
+        self.backward = backward
+
+    @classmethod
+    def build(cls, graph, edgefinder=None, reverse_edgefinder=None, num_landmarks=8, strategy='farthest', rng=None):
+        """
+        Choose landmarks and compute their distance tables.
+
+        :param graph: a CompiledGraph, or an iterable of every node in the graph
+        :param edgefinder: A function that returns an iterable of tuples of (neighbor, distance) from the node it
+            is passed. Not needed for a CompiledGraph.
+        :param reverse_edgefinder: A function that returns an iterable of tuples of (neighbor, distance) for every
+            edge leading INTO the node it is passed. If omitted for a graph that is not compiled, the graph is
+            assumed to be undirected.
+        :param num_landmarks: number of landmarks to choose
+        :param strategy: 'farthest' repeatedly picks the node farthest from the landmarks chosen so far. 'avoid'
+            grows a shortest path tree from a random node and descends into the part of it that the current
+            landmarks cover worst; it is slower to build but usually gives tighter bounds.
+        :param rng: random.Random instance used to pick starting nodes
+        """
+        if isinstance(graph, CompiledGraph):
+            nodes, index = graph.nodes, graph.index
+            reverse_graph = graph.reversed()
+
+            def search(starts, backwards=False):
+                return (reverse_graph if backwards else graph).dijkstra(starts, _always)
+
+            directed = True
+        else:
+            if edgefinder is None:
+                raise TypeError("An edgefinder is required for graphs that are not compiled")
+            nodes = list(graph)
+            index = {node: i for i, node in enumerate(nodes)}
+
+            def search(starts, backwards=False):
+                return dijkstra(starts, _always, reverse_edgefinder if backwards else edgefinder)
+
+            directed = reverse_edgefinder is not None
+        if strategy not in ('farthest', 'avoid'):
+            raise ValueError("Unknown landmark strategy {!r}".format(strategy))
+        rng = rng or random.Random()
+
+        def distances(landmark, backwards=False):
+            table = array('d', [inf]) * len(nodes)
+            for dist, path in search((landmark,), backwards):
+                i = index.get(path[0])
+                if i is not None:
+                    table[i] = dist
+            return table
+
+        result = cls(nodes, index, [], [], [])
+        while len(result.landmarks) < min(num_landmarks, len(nodes)):
+            if strategy == 'farthest':
+                landmark = result._farthest(rng, search)
+            else:
+                landmark = result._avoid(rng, search)
+            if landmark is None:
+                break  # every node is already a landmark
+            result.landmarks.append(landmark)
+            result.forward.append(distances(landmark))
+            if directed:
+                result.backward.append(distances(landmark, backwards=True))
+        if not directed:
+            result.backward = result.forward
+        return result
+
+    def _farthest(self, rng, search):
+        """Return the node with the greatest finite distance from its nearest landmark so far"""
+        chosen = set(self.landmarks)
+        if not chosen:
+            # start with whatever is farthest away from a random node
+            farthest = rng.choice(self.nodes)
+            for _, path in search((farthest,)):
+                farthest = path[0]
+            return farthest
+        best = None
+        best_dist = -1
+        for i, node in enumerate(self.nodes):
+            nearest = min(table[i] for table in self.forward)
+            if best_dist < nearest < inf and node not in chosen:
+                best, best_dist = node, nearest
+        if best is None:
+            # nothing more is reachable from the landmarks so far; pick a node they cannot reach
+            unreached = [node for node in self.nodes if node not in chosen]
+            return rng.choice(unreached) if unreached else None
+        return best
+
+    def _avoid(self, rng, search):
+        """Return a landmark chosen by the avoid heuristic"""
+        chosen = set(self.landmarks)
+        if not chosen:
+            return self._farthest(rng, search)
+        root = rng.choice(self.nodes)
+        bound = self.heuristic_from(root)
+        # shortest path tree from the root, in order of distance
+        order = []
+        parent = {}
+        size = {}
+        for dist, path in search((root,)):
+            node = path[0]
+            order.append(node)
+            parent[node] = path[1][0] if path[1] else None
+            # how badly the current landmarks underestimate this distance
+            size[node] = dist - bound(node)
+        # sum up the sizes of subtrees, except that subtrees containing a landmark are already covered
+        covered = set()
+        for node in reversed(order):  # children before parents
+            if node in chosen:
+                covered.add(node)
+            up = parent[node]
+            if node in covered:
+                size[node] = 0
+                if up is not None:
+                    covered.add(up)
+            elif up is not None:
+                size[up] += size[node]
+        children = {}
+        for node in order:
+            if parent[node] is not None:
+                children.setdefault(parent[node], []).append(node)
+        # descend from the largest subtree to a leaf, always into the largest child
+        node = max(order, key=size.get)
+        if not size[node] > 0:
+            return self._farthest(rng, search)
+        while node in children:
+            child = max(children[node], key=size.get)
+            if not size[child] > 0:
+                break
+            node = child
+        return None if node in chosen else node
+
+    def heuristic_from(self, start):
+        """Return a function estimating the distance from start to any node, for use in reverse searches"""
+        s = self.index.get(start)
+        if s is None:
+            return lambda node: 0
+        # d(s, v) >= d(s, L) - d(v, L) and d(s, v) >= d(L, v) - d(L, s)
+        to_landmark = [(table, table[s]) for table in self.backward if table[s] < inf]
+        from_landmark = [(table, table[s]) for table in self.forward]
+        index = self.index
+
+        def estimate(node):
+            i = index.get(node)
+            if i is None:
+                return 0
+            best = 0
+            for table, sl in to_landmark:
+                vl = table[i]
+                if vl < inf:
+                    bound = sl - vl
+                    if bound > best:
+                        best = bound
+            for table, ls in from_landmark:
+                bound = table[i] - ls
+                if bound > best:
+                    best = bound
+            return best
+
+        return estimate
+
+    def heuristic(self, destination):
+        """Return a function estimating the distance from any node to destination, for astar()"""
+        t = self.index.get(destination)
+        if t is None:
+            return lambda node: 0
+        # d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L)
+        from_landmark = [(table, table[t]) for table in self.forward]
+        to_landmark = [(table, table[t]) for table in self.backward if table[t] < inf]
+        index = self.index
+
+        def estimate(node):
+            i = index.get(node)
+            if i is None:
+                return 0
+            best = 0
+            for table, lt in from_landmark:
+                lv = table[i]
+                if lv < inf:
+                    bound = lt - lv
+                    if bound > best:
+                        best = bound
+            for table, tl in to_landmark:
+                bound = table[i] - tl
+                if bound > best:
+                    best = bound
+            return best
+
+        return estimate
+
+    def save(self, path):
+        """Write the landmarks and their distance tables to a file"""
+        directed = self.backward is not self.forward
+        header = pickle.dumps({
+            'nodes': self.nodes,
+            'landmarks': self.landmarks,
+            'directed': directed,
+        }, pickle.HIGHEST_PROTOCOL)
+        # pad the header so the tables start 8-byte aligned for memory-mapping
+        padding = -(len(self._MAGIC) + 8 + len(header)) % 8
+        with open(path, 'wb') as f:
+            f.write(self._MAGIC)
+            f.write((len(header) + padding).to_bytes(8, 'little'))
+            f.write(header)
+            f.write(bytes(padding))
+            for table in self.forward + (self.backward if directed else []):
+                f.write(array('d', table).tobytes())
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """
+        Read landmarks written by save(). With mmap=True, the distance tables are memory-mapped from the file
+        instead of read into memory, so that several processes can share them.
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(cls._MAGIC)) != cls._MAGIC:
+                raise ValueError("{} is not a landmarks file".format(path))
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = pickle.loads(f.read(header_length))
+            nodes = header['nodes']
+            num_tables = len(header['landmarks']) * (2 if header['directed'] else 1)
+            if mmap:
+                mapped = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+                view = memoryview(mapped)[len(cls._MAGIC) + 8 + header_length:].cast('d')
+                tables = [view[k * len(nodes):(k + 1) * len(nodes)] for k in range(num_tables)]
+            else:
+                tables = []
+                for _ in range(num_tables):
+                    table = array('d')
+                    table.fromfile(f, len(nodes))
+                    tables.append(table)
+        forward = tables[:len(header['landmarks'])]
+        backward = tables[len(header['landmarks']):] if header['directed'] else forward
+        index = {node: i for i, node in enumerate(nodes)}
+        return cls(nodes, index, header['landmarks'], forward, backward)
+
+
+class SpanningTree(object):
+    """
+    A spanning tree, or forest, as parent pointers over interned nodes: parents[i] is the index in nodes of the
+    parent of nodes[i], or -1 for a root, and costs[i] is the cost of the edge between them (0 for roots).
+    """
+    __slots__ = ('nodes', 'index', 'parents', 'costs')
+
+    def __init__(self, nodes, parents, costs, index=None):
+        """
+        :param nodes: list of the node objects, in interned order
+        :param parents: array of the interned index of each node's parent, or -1
+        :param costs: array of the cost of the edge from each node's parent
+        :param index: optional dict mapping each node to its position in nodes
+        """
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)} if index is None else index
+        self.parents = parents
+        self.costs = costs
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def parent(self, node):
+        """Return the parent of node in the tree, or None if it is a root"""
+        p = self.parents[self.index[node]]
+        return None if p < 0 else self.nodes[p]
+
+    def roots(self):
+        """Return the root node of each tree in the forest"""
+        return [node for node, p in zip(self.nodes, self.parents) if p < 0]
+
+    def edges(self):
+        """Iterate over every (parent, node, cost) edge in the tree"""
+        nodes = self.nodes
+        for node, p, cost in zip(nodes, self.parents, self.costs):
+            if p >= 0:
+                yield nodes[p], node, cost
+
+    def total_cost(self):
+        return sum(self.costs)
+
+
+def _spanning_costs(costs):
+    return array(CompiledGraph._cost_typecode(costs), costs)
+
+
+def prim(starts, edgefinder=lambda node: ((x, 1) for x in node)):
+    """
+    :param starts: iterable of nodes to grow trees from. Each one not already reached from an earlier start becomes
+        the root of another tree in the forest.
+    :param edgefinder: A function that returns an iterable of tuples
+        of (neighbor, distance) from the node it is passed. Edges are treated as undirected, so every edge should
+        be reported from both ends.
+    :return: a minimum SpanningTree of everything reachable from starts, with nodes interned in the order they
+        joined the tree
+
+    Prim's algorithm with a lazy heap of candidate edges, so edgefinder is called exactly once for each node and
+    implicit graphs are only explored as far as they are reachable.
+    """
+    index = {}
+    nodes = []
+    parents = array('q')
+    costs = []
+    heap = []
+    counter = count()
+
+    def add(node, parent, cost):
+        i = index[node] = len(nodes)
+        nodes.append(node)
+        parents.append(parent)
+        costs.append(cost)
+        for neighbor, edge_cost in edgefinder(node):
+            if neighbor not in index:
+                heappush(heap, (edge_cost, next(counter), i, neighbor))
+
+    for start in starts:
+        if start in index:
+            continue
+        add(start, -1, 0)
+        while heap:
+            cost, _, parent, node = heappop(heap)
+            if node not in index:
+                add(node, parent, cost)
+
+    return SpanningTree(nodes, parents, _spanning_costs(costs), index)
+
+
+def _orient(graph, chosen):
+    """
+    Build a SpanningTree over graph's nodes from chosen, a list of [(neighbor, cost), ...] tree edges for each
+    interned node, rooting each tree at its lowest numbered node
+    """
+    n = len(graph)
+    parents = array('q', [-1]) * n
+    costs = [0] * n
+    seen = bytearray(n)
+    for root in range(n):
+        if seen[root]:
+            continue
+        seen[root] = 1
+        stack = [root]
+        while stack:
+            i = stack.pop()
+            for j, cost in chosen[i]:
+                if not seen[j]:
+                    seen[j] = 1
+                    parents[j] = i
+                    costs[j] = cost
+                    stack.append(j)
+    return SpanningTree(graph.nodes, parents, _spanning_costs(costs), graph.index)
+
+
+def kruskal(edges, nodes=()):
+    """
+    :param edges: an iterable of (node, neighbor, cost) edges, or a CompiledGraph. Edges are treated as
+        undirected, and need only be given once.
+    :param nodes: optional nodes to include even if they have no edges
+    :return: a minimum SpanningTree (a forest, if the graph is not connected) with the same node numbering as
+        CompiledGraph.from_edges(edges, nodes) or the CompiledGraph given, each tree rooted at its lowest
+        numbered node
+
+    Kruskal's algorithm: sort the edges by cost and keep each one that joins two different trees, tracked with a
+    union-find over the interned node numbers.
+    """
+    graph = edges if isinstance(edges, CompiledGraph) else CompiledGraph.from_edges(edges, nodes)
+    n = len(graph)
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+    sources = array('q')
+    for i in range(n):
+        sources.extend(repeat(i, offsets[i + 1] - offsets[i]))
+
+    leader = array('q', range(n))
+    size = array('q', [1]) * n
+
+    def find(i):
+        while leader[i] != i:
+            leader[i] = i = leader[leader[i]]  # path halving
+        return i
+
+    chosen = [[] for _ in range(n)]
+    joined = 0
+    for e in sorted(range(len(targets)), key=costs.__getitem__):
+        a = find(sources[e])
+        b = find(targets[e])
+        if a == b:
+            continue
+        if size[a] < size[b]:
+            a, b = b, a
+        leader[b] = a
+        size[a] += size[b]
+        u, v, cost = sources[e], targets[e], costs[e]
+        chosen[u].append((v, cost))
+        chosen[v].append((u, cost))
+        joined += 1
+        if joined == n - 1:
+            break  # the tree is complete
+    return _orient(graph, chosen)
+
+
+def wilson(graph, edgefinder=None, root=None, rng=None):
+    """
+    :param graph: a CompiledGraph, or an iterable of nodes to explore with edgefinder
+    :param edgefinder: A function that returns an iterable of tuples
+        of (neighbor, distance) from the node it is passed, used when graph is not a CompiledGraph. Edges must be
+        undirected: reported from both ends.
+    :param root: optional node to root its tree at; other trees are rooted at their lowest numbered node in the
+        graph's interned order
+    :param rng: random.Random instance to draw from
+    :return: a SpanningTree chosen uniformly at random from all the spanning trees of the graph (a forest with
+        one uniformly random tree per connected part, if it is not connected), ignoring edge costs except to
+        report them
+
+    Wilson's algorithm: random walks from each node not yet in the tree until they hit it, erasing any loops
+    they make along the way, and adding what is left to the tree.
+    """
+    if not isinstance(graph, CompiledGraph):
+        graph = CompiledGraph.from_edgefinder(graph, edgefinder)
+    rng = rng or random.Random()
+    n = len(graph)
+    offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+
+    # every connected part needs a root for its walks to end at
+    in_tree = bytearray(n)
+    order = range(n)
+    if root is not None:
+        r = graph.index[root]
+        order = chain((r,), range(r), range(r + 1, n))
+    seen = bytearray(n)
+    for start in order:
+        if seen[start]:
+            continue
+        seen[start] = in_tree[start] = 1
+        stack = [start]
+        while stack:
+            i = stack.pop()
+            for e in range(offsets[i], offsets[i + 1]):
+                j = targets[e]
+                if not seen[j]:
+                    seen[j] = 1
+                    stack.append(j)
+
+    parents = array('q', [-1]) * n
+    tree_costs = [0] * n
+    step = array('q', [-1]) * n  # the edge the current walk last left each node by
+    randrange = rng.randrange
+    for start in range(n):
+        i = start
+        while not in_tree[i]:
+            e = step[i] = randrange(offsets[i], offsets[i + 1])
+            i = targets[e]
+        i = start
+        while not in_tree[i]:
+            in_tree[i] = 1
+            e = step[i]
+            parents[i] = targets[e]
+            tree_costs[i] = costs[e]
+            i = targets[e]
+    return SpanningTree(graph.nodes, parents, _spanning_costs(tree_costs), graph.index)
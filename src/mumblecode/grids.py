@@ -0,0 +1,303 @@
+# coding=utf-8
+from array import array
+from heapq import heappush, heappop
+from math import inf, sqrt
+
+
+SQRT2 = sqrt(2)
+
+# translation table from obstacle bytes (nonzero is blocked) to open flags
+_OPEN = bytes([1]) + bytes(255)
+
+
+class Grid(object):
+    """
+    A rectangular grid map, with nodes as (x, y) tuples, stored as a flat bitmap of open cells instead of being
+    described by an edgefinder.
+
+    Cells are connected to their 4 orthogonal neighbors, or to all 8 with diagonal=True; diagonal moves may not
+    cut the corner of a blocked cell. Each cell may have a cost to enter it, with diagonal moves costing sqrt(2)
+    times as much; without costs every move into a cell costs 1 (or sqrt(2) diagonally).
+
+    find_path() uses Jump Point Search on 8-connected grids without per-cell costs, and A* over the bitmap
+    otherwise. Both return (total cost, path) like dijkstra_simple() in graphs, with the path as a tuple-chain of
+    every cell stepped through. edgefinder() adapts the grid for the general search functions.
+    """
+    __slots__ = ('width', 'height', 'diagonal', '_stride', '_open', '_costs', '_min_cost')
+
+    def __init__(self, width, height, blocked=None, costs=None, diagonal=False):
+        """
+        :param width: number of columns
+        :param height: number of rows
+        :param blocked: optional row-major buffer of width * height bytes, nonzero where a cell is an obstacle,
+            such as a bytearray or a NumPy uint8 or bool array
+        :param costs: optional row-major sequence of width * height costs to enter each cell
+        :param diagonal: whether cells also connect to their diagonal neighbors
+        """
+        self.width = width
+        self.height = height
+        self.diagonal = diagonal
+        # pad with a border of blocked cells so that neighbors never need bounds checks
+        stride = self._stride = width + 2
+        self._open = bytearray((height + 2) * stride)
+        if blocked is None:
+            row = bytes([1]) * width
+            for y in range(height):
+                start = (y + 1) * stride + 1
+                self._open[start:start + width] = row
+        else:
+            blocked = memoryview(blocked).cast('B')
+            if len(blocked) != width * height:
+                raise ValueError("blocked must have width * height entries")
+            for y in range(height):
+                start = (y + 1) * stride + 1
+                self._open[start:start + width] = blocked[y * width:(y + 1) * width].tobytes().translate(_OPEN)
+        if costs is None:
+            self._costs = None
+            self._min_cost = 1
+        else:
+            if len(costs) != width * height:
+                raise ValueError("costs must have width * height entries")
+            self._costs = array('d', bytes(8 * len(self._open)))
+            for y in range(height):
+                start = (y + 1) * stride + 1
+                self._costs[start:start + width] = array('d', costs[y * width:(y + 1) * width])
+            self._min_cost = min(costs, default=1)
+
+    @classmethod
+    def from_rows(cls, rows, obstacle='#', diagonal=False):
+        """Build a grid from equal length strings, with obstacle marking blocked cells"""
+        rows = list(rows)
+        width = len(rows[0]) if rows else 0
+        blocked = bytearray(char == obstacle for row in rows for char in row)
+        return cls(width, len(rows), blocked, diagonal=diagonal)
+
+    def _cell(self, node):
+        x, y = node
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise KeyError(node)
+        return (y + 1) * self._stride + x + 1
+
+    def _node(self, i):
+        y, x = divmod(i, self._stride)
+        return x - 1, y - 1
+
+    def is_open(self, node):
+        """Whether node is inside the grid and not blocked"""
+        x, y = node
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self._open[(y + 1) * self._stride + x + 1])
+
+    def _moves(self):
+        """(index delta, cost factor, orthogonal deltas that must be open) for each move"""
+        stride = self._stride
+        moves = [(1, 1, ()), (-1, 1, ()), (stride, 1, ()), (-stride, 1, ())]
+        if self.diagonal:
+            for dx in (1, -1):
+                for dy in (stride, -stride):
+                    moves.append((dx + dy, SQRT2, (dx, dy)))
+        return moves
+
+    def _estimate(self, i, target):
+        """Heuristic distance between two cells: manhattan or octile distance times the cheapest cell cost"""
+        y, x = divmod(i, self._stride)
+        ty, tx = divmod(target, self._stride)
+        ax = abs(x - tx)
+        ay = abs(y - ty)
+        if self.diagonal:
+            return (max(ax, ay) + (SQRT2 - 1) * min(ax, ay)) * self._min_cost
+        return (ax + ay) * self._min_cost
+
+    def _path(self, steps):
+        path = ()
+        for i in steps:
+            path = (self._node(i), path)
+        return path
+
+    def edgefinder(self, node):
+        """An edgefinder over the grid, for use with the search functions in graphs"""
+        i = self._cell(node)
+        is_open = self._open
+        costs = self._costs
+        for delta, factor, corners in self._moves():
+            j = i + delta
+            if is_open[j] and all(is_open[i + c] for c in corners):
+                yield self._node(j), factor if costs is None else factor * costs[j]
+
+    def heuristic(self, destination):
+        """Return a heuristic function for destination, for use with astar() in graphs"""
+        target = self._cell(destination)
+        return lambda node: self._estimate(self._cell(node), target)
+
+    def astar(self, start, destination):
+        """
+        :param start: The start cell
+        :param destination: The destination cell
+        :return: Returns the shortest path from the start to the destination as (total cost, path), or
+            (None, ()) if none exists.
+        """
+        s = self._cell(start)
+        t = self._cell(destination)
+        is_open = self._open
+        if not (is_open[s] and is_open[t]):
+            return None, ()
+        costs = self._costs
+        moves = self._moves()
+        n = len(is_open)
+        dist = array('d', [inf]) * n
+        parent = array('q', [-1]) * n
+        closed = bytearray(n)
+        dist[s] = 0
+        heap = [(self._estimate(s, t), s)]
+        while heap:
+            _, i = heappop(heap)
+            if closed[i]:
+                continue  # stale entry
+            if i == t:
+                steps = []
+                while i >= 0:
+                    steps.append(i)
+                    i = parent[i]
+                return dist[t], self._path(reversed(steps))
+            closed[i] = 1
+            d = dist[i]
+            for delta, factor, corners in moves:
+                j = i + delta
+                if closed[j] or not is_open[j]:
+                    continue
+                if corners and not (is_open[i + corners[0]] and is_open[i + corners[1]]):
+                    continue
+                neighbor_dist = d + (factor if costs is None else factor * costs[j])
+                if neighbor_dist < dist[j]:
+                    dist[j] = neighbor_dist
+                    parent[j] = i
+                    heappush(heap, (neighbor_dist + self._estimate(j, t), j))
+        return None, ()
+
+    def _scan(self, i, step, side, target):
+        """Follow a straight line from i until the next jump point, returning it or None at a dead end"""
+        is_open = self._open
+        while True:
+            i += step
+            if not is_open[i]:
+                return None
+            if i == target:
+                return i
+            # a side cell is open but the one behind it is not: a path may need to turn here
+            if (is_open[i + side] and not is_open[i - step + side]) or \
+                    (is_open[i - side] and not is_open[i - step - side]):
+                return i
+
+    def _jump(self, i, dx, dy, target):
+        """Find the next jump point from i in direction (dx, dy), where dy is already scaled by the stride"""
+        if not dy:
+            return self._scan(i, dx, self._stride, target)
+        if not dx:
+            return self._scan(i, dy, 1, target)
+        is_open = self._open
+        while True:
+            if not (is_open[i + dx] and is_open[i + dy]):
+                return None  # diagonal moves may not cut corners
+            i += dx + dy
+            if not is_open[i]:
+                return None
+            if i == target:
+                return i
+            if self._scan(i, dx, self._stride, target) is not None or self._scan(i, dy, 1, target) is not None:
+                return i
+
+    def _directions(self, i, parent):
+        """The directions to search from jump point i, having arrived from parent"""
+        stride = self._stride
+        is_open = self._open
+        if parent < 0:
+            return [(dx, dy) for dx in (1, 0, -1) for dy in (stride, 0, -stride) if dx or dy]
+        py, px = divmod(parent, stride)
+        y, x = divmod(i, stride)
+        dx = (x > px) - (x < px)
+        dy = ((y > py) - (y < py)) * stride
+        result = []
+        if dx and dy:
+            vertical = is_open[i + dy]
+            horizontal = is_open[i + dx]
+            if vertical:
+                result.append((0, dy))
+            if horizontal:
+                result.append((dx, 0))
+            if vertical and horizontal:
+                result.append((dx, dy))
+            return result
+        step, side = (dx, stride) if dx else (dy, 1)
+        ahead = is_open[i + step]
+        for s in (side, -side):
+            if is_open[i + s]:
+                result.append((0, s) if dx else (s, 0))
+                if ahead:
+                    result.append((dx, s) if dx else (s, dy))
+        if ahead:
+            result.append((dx, dy))
+        return result
+
+    def jump_point_search(self, start, destination):
+        """
+        Jump Point Search, for 8-connected grids where every move costs 1 or sqrt(2). Rather than adding every
+        neighbor of every cell to the open list, it scans ahead along straight lines and diagonals and only stops
+        at cells where the best path might turn, so wide open areas cost almost nothing.
+
+        :param start: The start cell
+        :param destination: The destination cell
+        :return: Returns the shortest path from the start to the destination as (total cost, path), or
+            (None, ()) if none exists.
+        """
+        if not self.diagonal or self._costs is not None:
+            raise ValueError("jump point search needs a diagonal grid without per-cell costs")
+        s = self._cell(start)
+        t = self._cell(destination)
+        is_open = self._open
+        if not (is_open[s] and is_open[t]):
+            return None, ()
+        dist = {s: 0}
+        parent = {s: -1}
+        closed = set()
+        heap = [(self._estimate(s, t), s)]
+        while heap:
+            _, i = heappop(heap)
+            if i in closed:
+                continue  # stale entry
+            if i == t:
+                return dist[t], self._path(self._fill(t, parent))
+            closed.add(i)
+            d = dist[i]
+            for dx, dy in self._directions(i, parent[i]):
+                j = self._jump(i, dx, dy, t)
+                if j is None or j in closed:
+                    continue
+                neighbor_dist = d + self._estimate(i, j)  # jump points lie on a straight line or diagonal
+                if neighbor_dist < dist.get(j, inf):
+                    dist[j] = neighbor_dist
+                    parent[j] = i
+                    heappush(heap, (neighbor_dist + self._estimate(j, t), j))
+        return None, ()
+
+    def _fill(self, i, parent):
+        """Every cell on the path to i through the jump points in parent, from the start"""
+        stride = self._stride
+        jump_points = []
+        while i >= 0:
+            jump_points.append(i)
+            i = parent[i]
+        jump_points.reverse()
+        steps = jump_points[:1]
+        for a, b in zip(jump_points, jump_points[1:]):
+            ay, ax = divmod(a, stride)
+            by, bx = divmod(b, stride)
+            delta = (bx > ax) - (bx < ax) + ((by > ay) - (by < ay)) * stride
+            while a != b:
+                a += delta
+                steps.append(a)
+        return steps
+
+    def find_path(self, start, destination):
+        """Shortest path by jump_point_search() where it applies and astar() otherwise"""
+        if self.diagonal and self._costs is None:
+            return self.jump_point_search(start, destination)
+        return self.astar(start, destination)
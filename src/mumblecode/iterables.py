@@ -1,9 +1,17 @@
 # coding=utf-8
-from collections import namedtuple
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import io
-from heapq import heapify, heappush, heappop
-from itertools import chain, count, islice
+from itertools import chain, islice, repeat
+import pickle
+from queue import Empty
 import sys
+import tempfile
+from threading import Thread
+from time import monotonic
+
+from mumblecode.multithreading import CloseableQueue
 
 
 def grouper_it(n, iterable):
@@ -18,12 +26,168 @@ def grouper_it(n, iterable):
         yield chain((first_el,), chunk_it)
 
 
-class _MaxHeapItem(namedtuple("MaxHeapItemTuple", "item")):
-    def __lt__(self, other):
-        return other.item < self.item
+_NO_FILL = object()
+
+
+def grouper(n, iterable, *, factory=list, fillvalue=_NO_FILL, drop_last=False):
+    """
+    Unflatten an iterable into materialized groups of n elements.
+
+    Each group is built by calling factory on an iterator of up to n items, so
+    list, tuple, or something like partial(array, 'd') all work. If fillvalue
+    is given the final group is padded out to n elements with it; if drop_last
+    is true a short final group is discarded instead.
+
+    >>> list(grouper(3, range(8)))
+    [[0, 1, 2], [3, 4, 5], [6, 7]]
+    >>> list(grouper(3, range(8), factory=tuple, fillvalue=None))
+    [(0, 1, 2), (3, 4, 5), (6, 7, None)]
+    >>> list(grouper(3, range(8), drop_last=True))
+    [[0, 1, 2], [3, 4, 5]]
+    >>> list(grouper(3, []))
+    []
+    """
+    if n < 1:
+        raise ValueError("Group size must be at least 1")
+    if drop_last and fillvalue is not _NO_FILL:
+        raise ValueError("Cannot both pad and drop the last group")
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, n))
+        if len(chunk) < n:
+            if not chunk or drop_last:
+                return
+            if fillvalue is not _NO_FILL:
+                chunk.extend(repeat(fillvalue, n - len(chunk)))
+            yield chunk if factory is list else factory(chunk)
+            return
+        yield chunk if factory is list else factory(chunk)
+
+
+def array_grouper(n, iterable, typecode, *, fillvalue=_NO_FILL, drop_last=False):
+    """
+    Unflatten an iterable into array.array groups of n elements with the given
+    typecode. Arrays are filled directly from the iterator, without building an
+    intermediate list, and can be handed to anything accepting the buffer
+    protocol.
+
+    >>> [a.tolist() for a in array_grouper(2, range(5), 'i', fillvalue=-1)]
+    [[0, 1], [2, 3], [4, -1]]
+    """
+    if n < 1:
+        raise ValueError("Group size must be at least 1")
+    if drop_last and fillvalue is not _NO_FILL:
+        raise ValueError("Cannot both pad and drop the last group")
+    it = iter(iterable)
+    while True:
+        chunk = array(typecode, islice(it, n))
+        if len(chunk) < n:
+            if not chunk or drop_last:
+                return
+            if fillvalue is not _NO_FILL:
+                chunk.extend(repeat(fillvalue, n - len(chunk)))
+            yield chunk
+            return
+        yield chunk
+
+
+def buffer_grouper(n, buffer, *, drop_last=False):
+    """
+    Split any object supporting the buffer protocol (bytes, bytearray,
+    array.array, mmap, numpy arrays...) into memoryview slices of n elements.
+    No data is copied; every slice refers to the original buffer.
+
+    >>> [bytes(m) for m in buffer_grouper(3, b'abcdefgh')]
+    [b'abc', b'def', b'gh']
+    >>> [m.tolist() for m in buffer_grouper(2, array('d', [1, 2, 3]), drop_last=True)]
+    [[1.0, 2.0]]
+    """
+    if n < 1:
+        raise ValueError("Group size must be at least 1")
+    view = memoryview(buffer)
+    length = len(view)
+    stop = length - length % n if drop_last else length
+    for i in range(0, stop, n):
+        yield view[i:i + n]
 
 
-def collate(iterables, *, reverse=False):
+def _fill_queue(iterable, queue, failure, batch=1):
+    """
+    Put every item of iterable (or lists of up to batch items) into queue, then
+    close it. An exception from the iterable is appended to failure. If the
+    queue is closed by its consumer, the iterator is closed as well, so that
+    generators upstream can clean up.
+    """
+    try:
+        it = iter(iterable)
+        for item in it if batch == 1 else grouper(batch, it):
+            try:
+                queue.put(item)
+            except ValueError:
+                # consumer went away
+                close = getattr(it, 'close', None)
+                if close is not None:
+                    close()
+                return
+    except BaseException as e:
+        failure.append(e)
+    finally:
+        queue.close()
+
+
+def timed_grouper(n, timeout, iterable, *, factory=list):
+    """
+    Unflatten an iterable into groups of at most n elements, also ending a group
+    early once timeout seconds have passed since its first item arrived. This
+    keeps batches flowing from a slow or bursty stream.
+
+    The iterable is consumed from a separate thread. Closing the returned
+    generator stops that thread, and exceptions raised by the iterable are
+    re-raised here after the items that preceded them have been yielded.
+
+    >>> list(timed_grouper(3, 10, range(7)))
+    [[0, 1, 2], [3, 4, 5], [6]]
+    """
+    if n < 1:
+        raise ValueError("Group size must be at least 1")
+    queue = CloseableQueue(maxsize=n)
+    failure = []
+    Thread(target=_fill_queue, args=(iterable, queue, failure), daemon=True).start()
+    try:
+        group = []
+        deadline = None
+        while True:
+            try:
+                if deadline is None:
+                    item = queue.get()
+                else:
+                    item = queue.get(timeout=max(0, deadline - monotonic()))
+            except Empty:
+                yield group if factory is list else factory(group)
+                group = []
+                deadline = None
+                continue
+            except StopIteration:
+                break
+            if not group:
+                deadline = monotonic() + timeout
+            group.append(item)
+            if len(group) >= n:
+                yield group if factory is list else factory(group)
+                group = []
+                deadline = None
+        if group:
+            yield group if factory is list else factory(group)
+        if failure:
+            raise failure[0]
+    finally:
+        queue.close()
+
+
+_EXHAUSTED = object()
+
+
+def collate(iterables, *, key=None, reverse=False):
     """
     Accepts multiple iterables and yields items from them in a roughly sorted
     order.
@@ -34,6 +198,13 @@ def collate(iterables, *, reverse=False):
 
     Identical values are taken first from the earliest ordered iterator.
 
+    If key is given, items are ordered by key(item), which is computed once per
+    item.
+
+    Heads of the iterators are kept in a loser tree (tournament tree), so each
+    item costs ceil(log2(k)) comparisons for k iterators and no per-item
+    allocation, which matters with many iterators or costly comparisons.
+
     >>> list(collate([[1, 2, 11, 12], [4, 5, 6]]))
     [1, 2, 4, 5, 6, 11, 12]
     >>> list(collate([
@@ -50,45 +221,117 @@ def collate(iterables, *, reverse=False):
     ...     [13, 11, 9, 8],
     ... ], reverse=True))
     [13, 12, 11, 10, 9, 8, 8, 6, 5, 4, 7, 6, 5, 3, 2, 1, 6]
+    >>> list(collate([['b', 'C'], ['A', 'c']], key=str.lower))
+    ['A', 'b', 'C', 'c']
     """
-    wrap = _MaxHeapItem if reverse else lambda x: x
-    # populate the heap with each iterator's first item, if present
-    heap = []
-    c = count()
+    # populate the leaves with each iterator's first item, if present
+    feeds = []
+    heads = []
     for feed in iterables:
         it = iter(feed)
-        try:
-            item = next(it)
-        except StopIteration:
-            continue
+        for item in it:
+            feeds.append(it)
+            heads.append(item)
+            break
+    k = len(feeds)
+    if not k:
+        return
+    keys = heads if key is None else [key(item) for item in heads]
+    exhausted = [False] * k
+
+    # Leaf i sits at position k + i of an implicit binary tree whose node n has
+    # children 2n and 2n + 1. losers[n] holds the leaf that lost the match
+    # played at node n; the overall winner is kept separately. A leaf beats
+    # another when its key is lower (higher if reverse), or equal with a lower
+    # leaf index, which is what keeps the merge stable.
+    losers = [0] * k
+    winners = [0] * k + list(range(k))
+    for node in range(k - 1, 0, -1):
+        a, b = winners[2 * node], winners[2 * node + 1]
+        ka, kb = keys[a], keys[b]
+        if reverse:
+            a_wins = (not ka < kb) if a < b else kb < ka
         else:
-            heap.append((wrap(item), next(c), item, it))
-    heapify(heap)
+            a_wins = (not kb < ka) if a < b else ka < kb
+        winners[node], losers[node] = (a, b) if a_wins else (b, a)
+    winner = winners[1] if k > 1 else 0
+    live = k
 
-    while heap:
-        _wrapped_item, iter_index, item, top_iter = heappop(heap)
-        # advance only the feed we just took the item from
-        yield item
-        try:
-            new_item = next(top_iter)
-            heappush(heap, (wrap(new_item), iter_index, new_item, top_iter))
-        except StopIteration:
-            pass  # iterator was exhausted
+    while True:
+        yield heads[winner]
+        # advance only the feed we just took the item from, then replay its
+        # path to the root
+        item = next(feeds[winner], _EXHAUSTED)
+        node = (winner + k) >> 1
+        if item is _EXHAUSTED:
+            exhausted[winner] = True
+            live -= 1
+            if not live:
+                return
+            # anything live beats an exhausted feed
+            while node:
+                other = losers[node]
+                if not exhausted[other]:
+                    if exhausted[winner]:
+                        swap = True
+                    elif reverse:
+                        swap = (not keys[other] < keys[winner]) if other < winner else keys[winner] < keys[other]
+                    else:
+                        swap = (not keys[winner] < keys[other]) if other < winner else keys[other] < keys[winner]
+                    if swap:
+                        losers[node], winner = winner, other
+                node >>= 1
+            if live == 1:
+                yield heads[winner]
+                yield from feeds[winner]
+                return
+            continue
+
+        heads[winner] = item
+        if key is None:
+            kw = item
+        else:
+            kw = keys[winner] = key(item)
+        # exactly one key comparison per level
+        if reverse:
+            while node:
+                other = losers[node]
+                if not exhausted[other]:
+                    ko = keys[other]
+                    if (not ko < kw) if other < winner else kw < ko:
+                        losers[node], winner, kw = winner, other, ko
+                node >>= 1
+        else:
+            while node:
+                other = losers[node]
+                if not exhausted[other]:
+                    ko = keys[other]
+                    if (not kw < ko) if other < winner else ko < kw:
+                        losers[node], winner, kw = winner, other, ko
+                node >>= 1
 
 
-def remove_repeats(iterable):
+def remove_repeats(iterable, key=None):
     """
     Returns an iterable that yields the items from the given iterable with
-    successive equal items removed.
+    successive equal items removed. If key is given, items are equal when their
+    keys are.
     """
     last_item = object()
-    for item in iterable:
-        if item != last_item:
-            yield item
-        last_item = item
+    if key is None:
+        for item in iterable:
+            if item != last_item:
+                yield item
+            last_item = item
+    else:
+        for item in iterable:
+            item_key = key(item)
+            if item_key != last_item:
+                yield item
+            last_item = item_key
 
 
-def merge(iterables, *, reverse=False):
+def merge(iterables, *, key=None, reverse=False):
     """
     Merges multiple possibly incomplete iterators that may include selections
     or stretches of identical content into a single feed that includes every
@@ -105,6 +348,9 @@ def merge(iterables, *, reverse=False):
     Likewise: merge(sorted_iterables) is equivalent to
     iter(sorted(set(chain.from_iterable(sorted_iterables))))
 
+    If key is given, the iterables should be sorted by it, and items whose keys
+    are equal count as repeats; the first of them is kept.
+
     >>> from random import sample, randint
     >>> original = list(range(1000))
     >>> small_lists = [[] for _ in range(10)]
@@ -124,35 +370,345 @@ def merge(iterables, *, reverse=False):
     True
 
     """
-    return remove_repeats(collate(iterables, reverse=reverse))
+    return remove_repeats(collate(iterables, key=key, reverse=reverse), key=key)
+
+
+_SPILL_BATCH = 1024
+
+
+def _spill(items, directory):
+    """Write items to an anonymous temporary file as pickled batches and rewind it"""
+    f = tempfile.TemporaryFile(dir=directory)
+    try:
+        for batch in grouper(_SPILL_BATCH, items):
+            pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+        f.seek(0)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _unspill(f):
+    """Stream items back out of a file written by _spill, one batch in memory at a time"""
+    while True:
+        try:
+            batch = pickle.load(f)
+        except EOFError:
+            return
+        yield from batch
+
+
+def external_sort(iterable, *, key=None, reverse=False, unique=False,
+                  max_memory=64 * 2 ** 20, max_files=64, directory=None):
+    """
+    Sort an iterable that may not fit in memory, yielding the items in order.
+
+    Items are read into memory until their estimated size (sys.getsizeof of
+    each item, plus a pointer) reaches max_memory bytes. Each such run is
+    sorted and spilled to a temporary file in directory as pickled batches,
+    then the runs are streamed back through collate(). When there are more
+    than max_files runs, groups of them are first merged into longer runs on
+    disk, so no more than max_files files are ever read at once and memory use
+    during merging stays around max_files * 1024 items. If everything fits in a
+    single run, nothing is written to disk.
+
+    The sort is stable. If unique is true, items with equal keys are only
+    yielded once, as with merge(); duplicates are also dropped before runs are
+    written, which can shrink the spilled data considerably.
+
+    >>> list(external_sort([5, 3, 1, 4, 2]))
+    [1, 2, 3, 4, 5]
+    >>> list(external_sort([5, 3, 1, 3, 5, 2], max_memory=1, max_files=2, unique=True))
+    [1, 2, 3, 5]
+    >>> list(external_sort(['b', 'C', 'a'], key=str.lower, reverse=True))
+    ['C', 'b', 'a']
+    """
+    if max_files < 2:
+        raise ValueError("max_files must be at least 2")
+    combine = merge if unique else collate
+    runs = []
+    opened = []
+    try:
+        it = iter(iterable)
+        while True:
+            buffer = []
+            used = 0
+            for item in it:
+                buffer.append(item)
+                used += sys.getsizeof(item) + 8
+                if used >= max_memory:
+                    break
+            else:
+                used = None  # input is exhausted
+            buffer.sort(key=key, reverse=reverse)
+            sorted_run = remove_repeats(buffer, key=key) if unique else buffer
+            if used is None and not runs:
+                yield from sorted_run  # it all fit in memory
+                return
+            if buffer:
+                f = _spill(sorted_run, directory)
+                opened.append(f)
+                runs.append(f)
+            if used is None:
+                break
+        del buffer, sorted_run
+
+        while len(runs) > max_files:
+            merged_runs = []
+            for group in grouper(max_files, runs):
+                if len(group) == 1:
+                    merged_runs.append(group[0])
+                    continue
+                f = _spill(combine([_unspill(run) for run in group], key=key, reverse=reverse), directory)
+                opened.append(f)
+                merged_runs.append(f)
+                for run in group:
+                    run.close()
+            runs = merged_runs
+
+        yield from combine([_unspill(run) for run in runs], key=key, reverse=reverse)
+    finally:
+        for f in opened:
+            f.close()
 
 
 class IteratorFile(io.TextIOBase):
     """ given an iterator which yields strings,
     return a file like object for reading those strings.
-    From github/jsheedy """
+    From github/jsheedy
+
+    Strings are joined straight from the iterator; a string that is only partly
+    consumed by a read is kept along with an offset into it, so each character
+    is copied once no matter how reads and strings line up. For bytes, see
+    BytesIteratorFile.
+
+    >>> f = IteratorFile(['ab', 'cde\\n', 'f\\n'])
+    >>> f.read(3), f.readline(), f.read()
+    ('abc', 'de\\n', 'f\\n')
+    >>> f.read()
+    ''
+    """
 
     def __init__(self, it):
         super().__init__()
         self._it = iter(it)
-        self._f = io.StringIO()
+        self._leftover = ''
+        self._offset = 0
 
-    def read(self, length=sys.maxsize):
+    def readable(self):
+        return True
 
-        try:
-            while self._f.tell() < length:
-                self._f.write(next(self._it))
-
-        finally:
-            self._f.seek(0)
-            data = self._f.read(length)
-
-            # save the remainder for next read
-            remainder = self._f.read()
-            self._f.seek(0)
-            self._f.truncate(0)
-            self._f.write(remainder)
-            return data
-
-    def readline(self):
-        return next(self._it)
+    def read(self, length=-1):
+        if length is None or length < 0:
+            length = sys.maxsize
+        pieces = []
+        if self._offset < len(self._leftover):
+            piece = self._leftover[self._offset:self._offset + length]
+            self._offset += len(piece)
+            pieces.append(piece)
+            length -= len(piece)
+        while length > 0:
+            chunk = next(self._it, None)
+            if chunk is None:
+                break
+            if len(chunk) > length:
+                # save the remainder for next read
+                pieces.append(chunk[:length])
+                self._leftover = chunk
+                self._offset = length
+                break
+            pieces.append(chunk)
+            length -= len(chunk)
+        return ''.join(pieces)
+
+    def readline(self, size=-1):
+        if size is None or size < 0:
+            size = sys.maxsize
+        pieces = []
+        while size > 0:
+            if self._offset >= len(self._leftover):
+                chunk = next(self._it, None)
+                if chunk is None:
+                    break
+                self._leftover = chunk
+                self._offset = 0
+            end = self._leftover.find('\n', self._offset, self._offset + size)
+            stop = min(len(self._leftover), self._offset + size) if end < 0 else end + 1
+            pieces.append(self._leftover[self._offset:stop])
+            size -= stop - self._offset
+            self._offset = stop
+            if end >= 0:
+                break
+        return ''.join(pieces)
+
+
+class BytesIteratorFile(io.RawIOBase):
+    """
+    Given an iterator which yields bytes-like objects, return a raw binary file
+    for reading them.
+
+    readinto() copies straight from the iterator's chunks into the caller's
+    buffer; a chunk that is only partly consumed is kept as a memoryview of
+    what remains, so nothing is copied more than once. Wrap it in
+    io.BufferedReader for efficient small reads and readline(), and in
+    io.TextIOWrapper on top of that to read it as text.
+
+    >>> f = BytesIteratorFile([b'ab', b'cde', bytearray(b'f')])
+    >>> f.read(3), f.read(), f.read()
+    (b'abc', b'def', b'')
+    >>> io.TextIOWrapper(io.BufferedReader(BytesIteratorFile([b'1,2\\n3', b',4\\n']))).readlines()
+    ['1,2\\n', '3,4\\n']
+    """
+
+    def __init__(self, it):
+        super().__init__()
+        self._it = iter(it)
+        self._leftover = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        target = memoryview(b).cast('B')
+        size = len(target)
+        leftover = self._leftover
+        filled = min(size, len(leftover))
+        target[:filled] = leftover[:filled]
+        self._leftover = leftover[filled:]
+        if filled == size:
+            return filled
+        for chunk in self._it:
+            if type(chunk) is not bytes:
+                chunk = memoryview(chunk).cast('B')
+            end = filled + len(chunk)
+            if end < size:
+                target[filled:end] = chunk
+                filled = end
+            else:
+                # save the remainder for next read
+                chunk = memoryview(chunk)
+                target[filled:] = chunk[:size - filled]
+                self._leftover = chunk[size - filled:]
+                return size
+        return filled
+
+    def readall(self):
+        pieces = [self._leftover]
+        pieces.extend(self._it)
+        self._leftover = memoryview(b'')
+        return b''.join(pieces)
+
+
+def prefetch(iterable, depth=16, batch=1):
+    """
+    Iterate over iterable from a background thread, which reads ahead by up to
+    depth items so that a slow producer and a slow consumer can overlap. If
+    batch is more than 1, items are handed over in lists of that many to cut
+    down on queue overhead, and depth counts batches.
+
+    The thread starts when iteration does. Exceptions from the iterable are
+    re-raised in the consumer after the items that preceded them, and closing
+    the returned generator stops the thread and closes the iterable if it is a
+    generator.
+
+    >>> list(prefetch(range(5), depth=2, batch=2))
+    [0, 1, 2, 3, 4]
+    """
+    if depth < 1 or batch < 1:
+        raise ValueError("depth and batch must be at least 1")
+    queue = CloseableQueue(maxsize=depth)
+    failure = []
+    Thread(target=_fill_queue, args=(iterable, queue, failure, batch), daemon=True).start()
+    try:
+        while True:
+            try:
+                item = queue.get()
+            except StopIteration:
+                break
+            if batch == 1:
+                yield item
+            else:
+                yield from item
+        if failure:
+            raise failure[0]
+    finally:
+        queue.close()
+
+
+def _parallel_map(function, iterable, workers):
+    """Like map(), but calls function from a pool of threads while keeping the order of the results"""
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for item in iterable:
+            pending.append(executor.submit(function, item))
+            # keep every worker busy while waiting on the oldest item
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+class Pipeline(object):
+    """
+    A chain of iterator stages, each of which runs in its own thread and hands
+    its results to the next through a bounded queue of up to depth items. A
+    multi-stage job then runs at the speed of its slowest stage instead of the
+    sum of all of them.
+
+    Every stage method returns a new Pipeline consuming this one, so a pipeline
+    should only be extended or iterated once. Exceptions raised in any stage
+    propagate to whoever iterates the last stage, and closing (or discarding)
+    the last stage's iterator shuts down all of the stages' threads.
+
+    >>> squares = pipeline(range(10)).map(lambda x: x * x, workers=3)
+    >>> list(squares.filter(lambda x: x % 2).batch(2))
+    [[1, 9], [25, 49], [81]]
+    """
+
+    def __init__(self, source, *, depth=16):
+        self.depth = depth
+        self._it = prefetch(source, depth)
+
+    def _then(self, iterable):
+        """Start a new stage that runs iterable, which consumes this stage"""
+        upstream = self._it
+
+        def stage():
+            try:
+                yield from iterable
+            finally:
+                upstream.close()
+
+        return Pipeline(stage(), depth=self.depth)
+
+    def map(self, function, *, workers=1):
+        """Apply function to every item, from a pool of threads if workers is more than 1; order is kept"""
+        if workers > 1:
+            return self._then(_parallel_map(function, self._it, workers))
+        return self._then(map(function, self._it))
+
+    def filter(self, predicate):
+        """Keep only the items for which predicate returns true"""
+        return self._then(filter(predicate, self._it))
+
+    def batch(self, n):
+        """Group items into lists of n; the last one may be shorter"""
+        return self._then(grouper(n, self._it))
+
+    def flatten(self):
+        """Yield the items of each iterable item in turn"""
+        return self._then(chain.from_iterable(self._it))
+
+    def __iter__(self):
+        return self._it
+
+
+def pipeline(source, *, depth=16):
+    """Start a Pipeline reading from source in its own thread"""
+    return Pipeline(source, depth=depth)
@@ -27,6 +27,8 @@ class CloseableQueue(Queue):
             elif timeout is None:
                 while not self._qsize():
                     self.not_empty.wait()
+                    if not self._qsize() and self._closed:
+                        raise StopIteration
             elif timeout < 0:
                 raise ValueError("'timeout' must be a non-negative number")
             else:
@@ -36,6 +38,8 @@ class CloseableQueue(Queue):
                     if remaining <= 0.0:
                         raise Empty
                     self.not_empty.wait(remaining)
+                    if not self._qsize() and self._closed:
+                        raise StopIteration
             item = self._get()
             self.not_full.notify()
             return item
@@ -53,6 +57,8 @@ class CloseableQueue(Queue):
                 elif timeout is None:
                     while self._qsize() >= self.maxsize:
                         self.not_full.wait()
+                        if self._closed:
+                            raise ValueError("Queue is closed!")
                 elif timeout < 0:
                     raise ValueError("'timeout' must be a non-negative number")
                 else:
@@ -62,6 +68,8 @@ class CloseableQueue(Queue):
                         if remaining <= 0.0:
                             raise Full
                         self.not_full.wait(remaining)
+                        if self._closed:
+                            raise ValueError("Queue is closed!")
             self._put(item)
             self.unfinished_tasks += 1
             self.not_empty.notify()
@@ -1,14 +1,17 @@
 # coding=utf-8
-from mumblecode.collections import IntervalMapping, WeightedSet
+from mumblecode.collections import BlockedIntervalMapping, ColumnarIntervalMapping, IntervalMapping, WeightedSet
 from itertools import chain
 
+import pytest
+
 
 def simplify(x):
     return list(chain.from_iterable(x))
 
 
-def test_intervalmapping():
-    im = IntervalMapping()
+@pytest.mark.parametrize('mapping', [IntervalMapping, lambda: BlockedIntervalMapping(load=2), ColumnarIntervalMapping])
+def test_intervalmapping(mapping):
+    im = mapping()
     assert simplify(im) == []
     im[1:2] = 'a'
     assert simplify(im) == [1, 2, 'a']
@@ -61,3 +64,264 @@ def test_weighted_set():
         return len(set(w.choose(i) for i in range(length)))
 
     assert all(test_ws(n) == n for n in range(1, 50))
+
+
+def join_touching(ivs):
+    result = []
+    for iv in ivs:
+        if result and result[-1][1] == iv.begin and result[-1][2] == iv.data:
+            result[-1][1] = iv.end
+        else:
+            result.append([iv.begin, iv.end, iv.data])
+    return result
+
+
+def test_intervalmapping_from_intervals():
+    from random import Random
+    from intervaltree import Interval
+
+    rng = Random(0)
+    for _ in range(200):
+        intervals = []
+        for _ in range(rng.randrange(30)):
+            begin = rng.randrange(50)
+            intervals.append(Interval(begin, begin + rng.randint(0, 15), rng.choice('abc')))
+        expected = IntervalMapping()
+        for iv in intervals:
+            if not iv.is_null():
+                expected.apply(iv)
+        result = IntervalMapping.from_intervals(intervals)
+        assert [list(iv) for iv in result] == join_touching(expected)
+        presorted = sorted(intervals, key=lambda iv: iv.begin)
+        assert list(IntervalMapping.from_intervals(presorted, presorted=True)) == \
+            list(IntervalMapping.from_intervals(presorted))
+
+        split = rng.randrange(len(intervals) + 1)
+        im = IntervalMapping.from_intervals(intervals[:split])
+        im.apply_many(iv for iv in intervals[split:] if not iv.is_null())
+        assert list(im) == list(result)
+
+
+def test_intervalmapping_apply_many_rejects_null():
+    from intervaltree import Interval
+
+    im = IntervalMapping.from_intervals([Interval(0, 10, 'a'), Interval(10, 20, 'a'), Interval(5, 6, 'b')])
+    assert simplify(im) == [0, 5, 'a', 5, 6, 'b', 6, 20, 'a']
+    with pytest.raises(KeyError):
+        im.apply_many([Interval(1, 2, 'c'), Interval(3, 3, 'c')])
+    assert simplify(im) == [0, 5, 'a', 5, 6, 'b', 6, 20, 'a']
+    im.apply_many([Interval(5, 6, 'a')])
+    assert simplify(im) == [0, 20, 'a']
+
+
+def test_blocked_intervalmapping_matches_list():
+    from random import Random
+    from intervaltree import Interval
+
+    rng = Random(0)
+    plain = IntervalMapping()
+    blocked = BlockedIntervalMapping(load=4)
+    for step in range(3000):
+        begin = rng.randrange(1000)
+        end = begin + rng.randint(1, 30)
+        if rng.random() < 0.2:
+            del plain[begin:end]
+            del blocked[begin:end]
+        else:
+            value = rng.choice('abcd')
+            plain[begin:end] = value
+            blocked[begin:end] = value
+        if step % 100 == 0:
+            assert list(blocked) == list(plain)
+            assert list(reversed(blocked)) == list(reversed(plain))
+        point = rng.randrange(-10, 1040)
+        assert blocked.interval_at_position(point) == plain.interval_at_position(point)
+        assert blocked.interval_at_or_after(point) == plain.interval_at_or_after(point)
+        assert blocked.interval_at_or_before(point) == plain.interval_at_or_before(point)
+        assert blocked.next_interval_after(point) == plain.next_interval_after(point)
+        assert list(blocked[point:point + 50]) == list(plain[point:point + 50])
+        iv = Interval(point, point + 3)
+        assert (iv in blocked) == (iv in plain)
+        assert blocked.envelops(iv) == plain.envelops(iv)
+    assert len(blocked) == len(plain)
+    copy = blocked.copy()
+    assert type(copy) is BlockedIntervalMapping and list(copy) == list(plain)
+    im = BlockedIntervalMapping.from_intervals(list(plain))
+    im.apply_many([Interval(0, 2000, 'z')])
+    assert list(im) == [Interval(0, 2000, 'z')] and list(copy) == list(plain)
+    plain.apply_many([Interval(5000, 5001, 'z')])
+    blocked.apply_many([Interval(5000, 5001, 'z')])
+    assert blocked.ivs.load == 4 and max(len(block) for block in blocked.ivs._blocks) <= 8
+    assert list(blocked) == list(plain)
+
+
+def test_columnar_intervalmapping():
+    from random import Random
+    from intervaltree import Interval
+
+    rng = Random(0)
+    intervals = []
+    for _ in range(500):
+        begin = rng.randrange(1000)
+        intervals.append(Interval(begin, begin + rng.randint(1, 30), rng.choice('abcd')))
+    plain = IntervalMapping.from_intervals(intervals)
+    columnar = ColumnarIntervalMapping.from_intervals(intervals)
+    assert list(columnar) == list(plain)
+    points = [rng.uniform(-10, 1040) for _ in range(1000)]
+    assert columnar.lookup_many(points, default='-') == [plain[p] if p in plain else '-' for p in points]
+    for point in points[:100]:
+        assert columnar.interval_at_or_after(point) == plain.interval_at_or_after(point)
+        assert list(columnar[point:point + 20]) == list(plain[point:point + 20])
+    columnar[:100] = 'low'
+    del columnar[900:]
+    assert columnar[-1e9] == 'low' and 950 not in columnar
+    assert sorted(columnar.ivs.values) == ['a', 'b', 'c', 'd', 'low']
+
+    ints = ColumnarIntervalMapping([Interval(0, 5, 'x')], typecode='q')
+    ints[5:10] = 'y'
+    assert ints.lookup_many(range(-1, 12)) == [None] + ['x'] * 5 + ['y'] * 5 + [None, None]
+    assert type(ints.copy()) is ColumnarIntervalMapping and ints.copy().ivs.begins.typecode == 'q'
+    ints.apply_many([Interval(20, 25, 'z')])
+    assert ints.ivs.begins.typecode == 'q' and ints[22] == 'z'
+    ints[:0] = 'low'
+    ints[30:] = 'high'
+    assert ints[-2 ** 63] == 'low' and ints[2 ** 63 - 2] == 'high' and 12 not in ints
+    before = list(ints)
+    for begin, end in ((2, 2.5), (-2 ** 70, 3), (3, 2 ** 70)):
+        with pytest.raises((TypeError, OverflowError)):
+            ints[begin:end] = 'bad'
+        assert list(ints) == before
+    with pytest.raises(TypeError):
+        ints.ivs[0:0] = [Interval(-5, -4, 'a'), Interval(-4, -3.5, 'b')]
+    assert list(ints) == before
+
+
+def test_columnar_intervalmapping_drops_unused_values():
+    from intervaltree import Interval
+
+    im = ColumnarIntervalMapping([Interval(0, 10, 'keep')])
+    for i in range(1000):
+        im[10:20] = i
+    assert len(im.ivs.values) <= 12 and im[5] == 'keep' and im[15] == 999
+    assert list(im) == [Interval(0, 10, 'keep'), Interval(10, 20, 999)]
+
+
+def test_columnar_intervalmapping_keeps_equal_values_apart():
+    im = ColumnarIntervalMapping()
+    im[0:1] = 1
+    im[2:3] = True
+    im[4:5] = 1.0
+    assert [type(im[p]) for p in (0, 2, 4)] == [int, bool, float]
+
+
+def test_columnar_lookup_many_numpy():
+    np = pytest.importorskip('numpy')
+    from intervaltree import Interval
+
+    im = ColumnarIntervalMapping([Interval(0, 10, (1, 2)), Interval(20, 30, 'b')])
+    assert im.lookup_many(np.array([5, 15, 25, 30]), default=0) == [(1, 2), 0, 'b', 0]
+    assert ColumnarIntervalMapping().lookup_many(np.arange(3)) == [None] * 3
+
+
+@pytest.mark.parametrize('mapping', [IntervalMapping, BlockedIntervalMapping, ColumnarIntervalMapping])
+def test_intervalmapping_lookup_many(mapping):
+    from random import Random
+    from intervaltree import Interval
+
+    rng = Random(1)
+    intervals = []
+    for _ in range(300):
+        begin = rng.randrange(1000)
+        intervals.append(Interval(begin, begin + rng.randint(1, 10), rng.randrange(20)))
+    im = mapping.from_intervals(intervals)
+    for count in (5, 1000):
+        points = [rng.randrange(-10, 1020) for _ in range(count)]
+        expected = [im[p] if p in im else 'missing' for p in points]
+        assert im.lookup_many(points, default='missing') == expected
+        assert im.lookup_many(iter(points), default='missing') == expected
+        points.sort()
+        assert im.lookup_many(points, default='missing', presorted=True) == \
+            [im[p] if p in im else 'missing' for p in points]
+    assert mapping().lookup_many([1, 2]) == [None, None]
+    with pytest.raises(TypeError):
+        mapping().lookup_many([1, 2], 'missing')
+
+
+def test_sampled_value_lookup_many():
+    from random import Random
+    from mumblecode.collections import Sample, SampledValue
+
+    rng = Random(2)
+    sv = SampledValue(Sample(t, rng.randrange(5)) for t in rng.sample(range(1000), 100))
+    times = [rng.randrange(-10, 1010) for _ in range(500)]
+    expected = [sv.get(time=t, default='before') for t in times]
+    assert sv.lookup_many(times, default='before') == expected
+    assert sv.lookup_many(sorted(times), default='before', presorted=True) == \
+        [sv.get(time=t, default='before') for t in sorted(times)]
+    assert SampledValue().lookup_many([1]) == [None]
+
+
+def test_lookup_many_numpy():
+    np = pytest.importorskip('numpy')
+    from intervaltree import Interval
+    from mumblecode.collections import Sample, SampledValue
+
+    im = IntervalMapping([Interval(0, 10, 'a'), Interval(20, 30, 'b')])
+    assert im.lookup_many(np.array([5, 15, 25, 30, -1])) == ['a', None, 'b', None, None]
+    sv = SampledValue([Sample(1, 'a'), Sample(5, 'b')])
+    assert sv.lookup_many(np.array([0, 1, 4, 5, 9]), default='-') == ['-', 'a', 'a', 'b', 'b']
+
+
+def test_interval_set_algebra():
+    from random import Random
+    from intervaltree import Interval
+    from mumblecode.collections import difference, intersection, overlay, zip_mappings
+
+    def at(intervals, point):
+        for iv in intervals:
+            if iv.begin <= point < iv.end:
+                return iv.data
+        return None
+
+    rng = Random(3)
+    for _ in range(50):
+        maps = []
+        for _ in range(3):
+            intervals = []
+            for _ in range(rng.randrange(8)):
+                begin = rng.randrange(60)
+                intervals.append(Interval(begin, begin + rng.randint(1, 12), rng.randrange(1, 4)))
+            maps.append(IntervalMapping.from_intervals(intervals))
+        a, b, c = maps
+        results = {
+            'overlay': list(overlay(a, b, combine=lambda x, y: x * 10 + y)),
+            'intersection': list(intersection(a, b)),
+            'difference': list(difference(a, b)),
+            'zip': list(zip_mappings(a, b, c)),
+        }
+        for ivs in results.values():
+            assert all(x.end <= y.begin for x, y in zip(ivs, ivs[1:]))
+            assert all(iv.begin < iv.end for iv in ivs)
+        for point in range(-1, 75):
+            va, vb, vc = (at(m, point) for m in maps)
+            assert at(results['overlay'], point) == (va * 10 + vb if va and vb else va or vb)
+            assert at(results['intersection'], point) == (va if va and vb else None)
+            assert at(results['difference'], point) == (None if vb else va)
+            assert at(results['zip'], point) == ((va, vb, vc) if va or vb or vc else None)
+
+
+def test_set_algebra_on_sampled_values():
+    from intervaltree import Interval
+    from mumblecode.collections import GreatestValue, Sample, SampledValue, intersection, zip_mappings
+
+    temperature = SampledValue([Sample(0, 'cold'), Sample(10, 'warm'), Sample(20, 'hot')])
+    door = SampledValue([Sample(5, 'open'), Sample(15, 'closed')])
+    assert list(zip_mappings(temperature.intervals(), door.intervals())) == [
+        Interval(0, 5, ('cold', None)),
+        Interval(5, 10, ('cold', 'open')),
+        Interval(10, 15, ('warm', 'open')),
+        Interval(15, 20, ('warm', 'closed')),
+        Interval(20, GreatestValue, ('hot', 'closed')),
+    ]
+    assert list(intersection(temperature.intervals(12), door.intervals(), combine=lambda t, d: t + '/' + d)) == [
+        Interval(5, 10, 'cold/open'), Interval(10, 12, 'warm/open')]
@@ -0,0 +1,51 @@
+# coding=utf-8
+from random import Random
+
+import pytest
+
+
+def random_edges(seed, size=150, degree=3):
+    rng = Random(seed)
+    return [(node, rng.randrange(size), rng.randint(0, 20)) for node in range(size) for _ in range(degree)]
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_hierarchy_matches_dijkstra(seed, tmp_path):
+    from mumblecode.contraction import ContractionHierarchy
+    from mumblecode.graphs import CompiledGraph, convert_path
+
+    edges = random_edges(seed)
+    graph = CompiledGraph.from_edges(edges)
+    hierarchy = ContractionHierarchy.build(graph)
+    path = str(tmp_path / 'graph.ch')
+    hierarchy.save(path)
+    loaded = ContractionHierarchy.load(path)
+
+    cheapest = {}
+    for a, b, cost in edges:
+        cheapest[a, b] = min(cost, cheapest.get((a, b), cost))
+    rng = Random(seed)
+    for _ in range(100):
+        start, destination = rng.choice(graph.nodes), rng.choice(graph.nodes)
+        expected, _ = graph.dijkstra_simple(start, destination)
+        for ch in (hierarchy, loaded):
+            cost, found = ch.query(start, destination)
+            assert cost == expected
+            assert ch.distance(start, destination) == expected
+            if cost is not None:
+                steps = convert_path(found)
+                assert steps[0] == start and steps[-1] == destination
+                assert sum(cheapest[a, b] for a, b in zip(steps, steps[1:])) == cost
+
+
+def test_hierarchy_distance_matrix():
+    from mumblecode.contraction import ContractionHierarchy
+    from mumblecode.graphs import CompiledGraph, distance_matrix
+
+    graph = CompiledGraph.from_edges(random_edges(7))
+    hierarchy = ContractionHierarchy.build(graph)
+    rng = Random(7)
+    origins = [rng.choice(graph.nodes) for _ in range(20)]
+    destinations = [rng.choice(graph.nodes) for _ in range(30)]
+    expected = distance_matrix(origins, destinations, graph.edgefinder)
+    assert hierarchy.distance_matrix(origins, destinations).values == expected.values
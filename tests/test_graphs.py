@@ -70,3 +70,671 @@ def test_multiple_path_tolerance(tolerance, expected):
         count += 1
 
     assert count == expected
+
+
+def test_paths_within_3x3():
+    from mumblecode.graphs import convert_path, paths_within
+
+    def edgefinder(node):
+        for nb in directional_neighbors(node):
+            if min(*nb) >= 0 and max(*nb) < 3:
+                yield nb, 1
+
+    paths = [convert_path(path) for _, path in paths_within([(0, 0)], lambda n: n == (2, 2), edgefinder, tol=0)]
+    assert len(paths) == 6
+    assert len(set(map(tuple, paths))) == 6
+    # with slack for one detour, the longer paths come after all the shortest ones and never revisit a node
+    results = list(paths_within([(0, 0)], lambda n: n == (2, 2), edgefinder, tol=2))
+    assert [cost for cost, _ in results] == sorted(cost for cost, _ in results)
+    assert {cost for cost, _ in results} == {4, 6}
+    for _, path in results:
+        nodes = convert_path(path)
+        assert len(set(nodes)) == len(nodes)
+
+
+@pytest.mark.parametrize('tolerance,expected', MULTIPLE_PATHS[1:])
+def test_paths_within_tolerance(tolerance, expected):
+    from mumblecode.graphs import paths_within
+
+    edges = {
+        'start': [(0, 1), (1, 1), (2, 2)],
+        0: [('end', 1)],
+        1: [('end', 1)],
+        2: [('end', 1)],
+        'end': [],
+    }
+    assert len(list(paths_within(['start'], lambda n: n == 'end', lambda n: edges[n], tol=tolerance))) == expected
+
+
+def random_graph(seed, size=200, degree=4):
+    from random import Random
+    rng = Random(seed)
+    edges = {}
+    for node in range(size):
+        edges[node] = [(rng.randrange(size), rng.randint(1, 20)) for _ in range(rng.randint(0, degree))]
+    return edges
+
+
+def path_cost(path, edges):
+    """Cost of a tuple-chain path, taking the cheapest edge between each pair of nodes"""
+    from mumblecode.graphs import convert_path
+    nodes = convert_path(path)
+    return sum(min(c for nb, c in edges[a] if nb == b) for a, b in zip(nodes, nodes[1:]))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_compiled_graph_matches_dijkstra(seed):
+    from mumblecode.graphs import CompiledGraph, dijkstra
+
+    edges = random_graph(seed)
+    destinations = {7, 42, 99, 150}
+    expected = list(dijkstra([0, 1], lambda n: n in destinations, lambda n: edges[n]))
+
+    for graph in (
+        CompiledGraph.from_edgefinder([0, 1], lambda n: edges[n]),
+        CompiledGraph.from_edges(((n, nb, c) for n in edges for nb, c in edges[n]), nodes=edges),
+    ):
+        result = list(graph.dijkstra([0, 1], lambda n: n in destinations))
+        assert [cost for cost, _ in result] == [cost for cost, _ in expected]
+        for cost, path in result:
+            assert path_cost(path, edges) == cost
+
+
+def test_compiled_graph_grid_astar():
+    from mumblecode.graphs import CompiledGraph, astar, convert_path
+
+    def edgefinder(node):
+        for nb in directional_neighbors(node):
+            if min(nb) >= 0 and max(nb) < 30 and nb[0] != 15 or nb == (15, 29):
+                yield nb, 1
+
+    def manhattan(node):
+        return abs(node[0] - 29) + abs(node[1])
+
+    graph = CompiledGraph.from_edgefinder([(0, 0)], edgefinder)
+    expected_cost, _ = next(astar([(0, 0)], lambda n: n == (29, 0), edgefinder, manhattan))
+    cost, path = next(graph.astar([(0, 0)], lambda n: n == (29, 0), manhattan))
+    assert cost == expected_cost
+    assert (15, 29) in convert_path(path)
+
+    backwards = graph.reversed()
+    assert sorted(backwards.edges()) == sorted((b, a, c) for a, b, c in graph.edges())
+
+
+def reverse_edges(edges):
+    result = {node: [] for node in edges}
+    for node, neighbors in edges.items():
+        for neighbor, cost in neighbors:
+            result[neighbor].append((node, cost))
+    return result
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_bidirectional_dijkstra_matches_astar(seed):
+    from mumblecode.graphs import astar, bidirectional_dijkstra, convert_path
+
+    edges = random_graph(seed)
+    backwards = reverse_edges(edges)
+    for destination in (0, 3, 42, 99, 150, 199):
+        expected, _ = next(astar([3], lambda n: n == destination, lambda n: edges[n]), (None, ()))
+        cost, path = bidirectional_dijkstra(3, destination, lambda n: edges[n], lambda n: backwards[n])
+        assert cost == expected
+        if cost is not None:
+            assert path_cost(path, edges) == cost
+            assert convert_path(path)[0] == 3 and path[0] == destination
+
+
+def test_bidirectional_astar_on_grid():
+    from mumblecode.graphs import astar, bidirectional_astar, convert_path
+
+    size = 20
+    walls = {(x, 10) for x in range(1, size)} | {(7, y) for y in range(0, 15)}
+
+    def open_neighbors(node):
+        return [nb for nb in directional_neighbors(node) if min(nb) >= 0 and max(nb) < size and nb not in walls]
+
+    def entry_cost(node):
+        return 1 + (node[0] * 7 + node[1] * 3) % 4
+
+    def edgefinder(node):
+        return [(nb, entry_cost(nb)) for nb in open_neighbors(node)]
+
+    def reverse_edgefinder(node):
+        return [(nb, entry_cost(node)) for nb in open_neighbors(node)]
+
+    def estimate(a, b):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    start, goal = (0, 0), (15, 18)
+    expected, _ = next(astar([start], lambda n: n == goal, edgefinder))
+    cost, path = bidirectional_astar(
+        start, goal, edgefinder, reverse_edgefinder,
+        heuristic=lambda n: estimate(n, goal),
+        reverse_heuristic=lambda n: estimate(start, n),
+    )
+    assert cost == expected
+    steps = convert_path(path)
+    assert steps[0] == start and steps[-1] == goal
+    assert all(estimate(a, b) == 1 for a, b in zip(steps, steps[1:]))
+
+
+@pytest.mark.parametrize('strategy', ['farthest', 'avoid'])
+def test_landmarks_heuristic_is_admissible(strategy, tmp_path):
+    from random import Random
+    from mumblecode.graphs import CompiledGraph, Landmarks, astar, dijkstra
+
+    edges = random_graph(1)
+    backwards = reverse_edges(edges)
+    landmarks = Landmarks.build(
+        edges, lambda n: edges[n], lambda n: backwards[n], num_landmarks=4, strategy=strategy, rng=Random(1)
+    )
+    assert len(landmarks.landmarks) == 4
+    compiled = Landmarks.build(
+        CompiledGraph.from_edges((n, nb, c) for n in edges for nb, c in edges[n]),
+        num_landmarks=4, strategy=strategy, rng=Random(1)
+    )
+
+    path = str(tmp_path / 'landmarks.alt')
+    landmarks.save(path)
+    loaded = Landmarks.load(path)
+    mapped = Landmarks.load(path, mmap=True)
+
+    for destination in (5, 50, 150):
+        # distances to the destination, found by searching backwards from it
+        true_distance = {
+            path[0]: cost for cost, path in dijkstra([destination], lambda n: True, lambda n: backwards[n])
+        }
+        for alt in (landmarks, compiled, loaded, mapped):
+            estimate = alt.heuristic(destination)
+            for node in edges:
+                if node in true_distance:
+                    assert estimate(node) <= true_distance[node]
+        assert [mapped.heuristic(destination)(n) for n in edges] == [landmarks.heuristic(destination)(n) for n in edges]
+
+        expected = next(astar([0], lambda n: n == destination, lambda n: edges[n]), (None, ()))[0]
+        found = next(astar([0], lambda n: n == destination, lambda n: edges[n], landmarks.heuristic(destination)),
+                     (None, ()))[0]
+        assert found == expected
+
+
+def simple_path_costs(starts, destinations, edges):
+    """Costs of every path without cycles from any start to any destination, by brute force"""
+    costs = []
+
+    def walk(node, cost, seen):
+        if node in destinations:
+            costs.append(cost)
+        for nb in {nb for nb, _ in edges[node]}:
+            if nb not in seen:
+                walk(nb, cost + min(c for n, c in edges[node] if n == nb), seen | {nb})
+
+    for start in starts:
+        walk(start, 0, {start})
+    return sorted(costs)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_k_shortest_paths_matches_brute_force(seed):
+    from mumblecode.graphs import convert_path, k_shortest_paths
+
+    edges = random_graph(seed, size=10, degree=8)
+    destinations = {5, 8}
+    expected = simple_path_costs([0, 1], destinations, edges)
+    for k in (None, 1, 10):
+        result = list(k_shortest_paths([0, 1], lambda n: n in destinations, lambda n: edges[n], k=k))
+        assert [cost for cost, _ in result] == expected[:k]
+        assert len({path for _, path in result}) == len(result)
+        for cost, path in result:
+            nodes = convert_path(path)
+            assert len(set(nodes)) == len(nodes)
+            assert path_cost(path, edges) == cost
+
+
+def test_k_shortest_paths_stops_early(monkeypatch):
+    from mumblecode import graphs
+
+    edges = random_graph(0, size=10, degree=8)
+    spurs = []
+    spur_path = graphs._spur_path
+    monkeypatch.setattr(graphs, '_spur_path', lambda *args: spurs.append(args) or spur_path(*args))
+    pushed = []
+    heappush = graphs.heappush
+    monkeypatch.setattr(graphs, 'heappush', lambda heap, item: pushed.append(item) or heappush(heap, item))
+
+    assert len(list(graphs.k_shortest_paths([0], lambda n: n == 5, lambda n: edges[n], k=1))) == 1
+    assert len(spurs) == 1  # only the search for the first path
+    results = list(graphs.paths_within([0], lambda n: n == 5, lambda n: edges[n], tol=3))
+    best = results[0][0]
+    assert [cost for cost, _ in results] == [c for c in simple_path_costs([0], {5}, edges) if c <= best + 3]
+    # candidate paths that cost too much to ever be yielded are never queued
+    assert all(item[0] <= best + 3 for item in pushed if len(item) == 5)
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_distance_matrix(workers):
+    from math import inf
+    from mumblecode.graphs import CompiledGraph, distance_matrix
+
+    edges = random_graph(3)
+    graph = CompiledGraph.from_edgefinder(range(200), lambda n: edges[n])
+    origins = [0, 5, 17, 5, 123]
+    destinations = [9, 0, 44, 150, 9, 199]
+    matrix = distance_matrix(origins, destinations, graph.edgefinder, workers=workers, chunksize=2)
+    assert len(matrix.values) == len(origins) * len(destinations)
+    for origin in origins:
+        row = matrix.row(origin)
+        for j, destination in enumerate(destinations):
+            expected, _ = graph.dijkstra_simple(origin, destination)
+            assert matrix[origin, destination] == row[j] == (inf if expected is None else expected)
+
+
+def test_cached_edgefinder():
+    from mumblecode.graphs import astar, cached_edgefinder
+
+    edges = random_graph(4, size=50)
+    calls = []
+
+    @cached_edgefinder(maxsize=10)
+    def edgefinder(node):
+        calls.append(node)
+        return iter(edges[node])
+
+    assert edgefinder(3) == tuple(edges[3])
+    assert edgefinder(3) == tuple(edges[3])
+    assert calls == [3]
+    for node in range(20):
+        edgefinder(node)
+    info = edgefinder.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (2, 20, 10, 10)
+    assert info.hit_rate == 2 / 22
+
+    edges[19] = [(0, 1)]
+    assert edgefinder(19) != ((0, 1),)
+    edgefinder.invalidate(19)
+    assert edgefinder(19) == ((0, 1),)
+    edgefinder.clear()
+    assert len(edgefinder) == 0
+
+    expected = list(astar([0], lambda n: n in (7, 8), lambda n: edges[n]))
+    assert list(astar([0], lambda n: n in (7, 8), edgefinder)) == expected
+
+
+def test_cached_edgefinder_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    from mumblecode.graphs import CachedEdgefinder, dijkstra_first
+
+    edges = random_graph(5)
+    edgefinder = CachedEdgefinder(lambda n: edges[n], maxsize=64)
+    expected = [dijkstra_first([n], lambda x: x == 0, lambda x: edges[x]) for n in range(200)]
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(lambda n: dijkstra_first([n], lambda x: x == 0, edgefinder), range(200))) == expected
+    info = edgefinder.cache_info()
+    assert info.currsize <= 64 and info.hits > 0
+
+
+def test_incremental_planner_replans_after_changes():
+    from random import Random
+    from mumblecode.graphs import IncrementalPlanner, convert_path, dijkstra_simple
+
+    rng = Random(0)
+    size = 30
+    costs = {}
+    for x in range(size):
+        for y in range(size):
+            for nb in directional_neighbors((x, y)):
+                if min(*nb) >= 0 and max(*nb) < size:
+                    costs[(x, y), nb] = rng.randint(1, 9)
+    blocked = set()
+
+    def edgefinder(node):
+        return [(nb, costs[node, nb]) for nb in directional_neighbors(node)
+                if (node, nb) in costs and node not in blocked and nb not in blocked]
+
+    def reverse_edgefinder(node):
+        return [(nb, costs[nb, node]) for nb in directional_neighbors(node)
+                if (nb, node) in costs and node not in blocked and nb not in blocked]
+
+    start, goal = (0, 0), (size - 1, size - 1)
+    planner = IncrementalPlanner(start, goal, edgefinder, reverse_edgefinder,
+                                 lambda n: goal[0] - n[0] + goal[1] - n[1])
+    cost, path = planner.replan()
+    assert cost == dijkstra_simple(start, goal, edgefinder)[0]
+    first_expansions = planner.expansions
+
+    for _ in range(10):
+        for _ in range(3):
+            edge = rng.choice(list(costs))
+            costs[edge] = rng.randint(1, 9)
+            planner.update_edge(*edge)
+        # block a node on the current path
+        steps = convert_path(path)
+        node = steps[len(steps) * 3 // 4]
+        blocked.add(node)
+        planner.invalidate(node)
+        before = planner.expansions
+        cost, path = planner.replan()
+        assert cost == dijkstra_simple(start, goal, edgefinder)[0]
+        steps = convert_path(path)
+        assert steps[0] == start and steps[-1] == goal
+        assert sum(dict(edgefinder(a))[b] for a, b in zip(steps, steps[1:])) == cost
+        # repairing the search is much cheaper than planning from scratch
+        assert planner.expansions - before < first_expansions / 2
+
+
+def check_incremental_planner_changes(seed):
+    from random import Random
+    from mumblecode.graphs import IncrementalPlanner, convert_path, dijkstra_simple
+
+    rng = Random(seed)
+    size = 8
+    edges = {}
+    for _ in range(20):
+        edges[rng.randrange(size), rng.randrange(size)] = rng.randint(1, 5)
+
+    def edgefinder(node):
+        return [(b, cost) for (a, b), cost in edges.items() if a == node]
+
+    def reverse_edgefinder(node):
+        return [(a, cost) for (a, b), cost in edges.items() if b == node]
+
+    planner = IncrementalPlanner(0, size - 1, edgefinder, reverse_edgefinder)
+    for _ in range(15):
+        cost, path = planner.replan()
+        assert cost == dijkstra_simple(0, size - 1, edgefinder)[0]
+        if cost is not None:
+            steps = convert_path(path)
+            assert steps[0] == 0 and steps[-1] == size - 1
+            assert sum(edges[a, b] for a, b in zip(steps, steps[1:])) == cost
+        for _ in range(rng.randint(1, 3)):
+            u, v = rng.randrange(size), rng.randrange(size)
+            if (u, v) in edges and rng.random() < 0.5:
+                del edges[u, v]
+            else:
+                edges[u, v] = rng.randint(1, 5)
+            # report the change through either end, or as an edge
+            how = rng.randrange(3)
+            if how == 0:
+                planner.invalidate(u)
+            elif how == 1:
+                planner.invalidate(v)
+            else:
+                planner.update_edge(u, v)
+
+
+def test_incremental_planner_fuzz_invalidate():
+    for seed in range(300):
+        check_incremental_planner_changes(seed)
+
+
+def test_incremental_planner_rejects_zero_costs():
+    from mumblecode.graphs import IncrementalPlanner
+
+    # b and a form a zero-cost cycle, which would keep each other's distances from rising
+    edges = {('s', 'x'): 4, ('x', 'b'): 1, ('b', 'a'): 0, ('a', 'b'): 0, ('b', 'd'): 0}
+
+    def edgefinder(node):
+        return [(b, cost) for (a, b), cost in edges.items() if a == node]
+
+    def reverse_edgefinder(node):
+        return sorted((a, cost) for (a, b), cost in edges.items() if b == node)
+
+    planner = IncrementalPlanner('s', 'd', edgefinder, reverse_edgefinder)
+    with pytest.raises(ValueError):
+        planner.replan()
+
+
+@pytest.mark.parametrize('limit', [
+    {'max_expansions': 500},
+    {'max_frontier': 100},
+    {'deadline': 0},
+    {'cancel': 'set'},
+])
+def test_astar_limits_on_infinite_grid(limit):
+    from threading import Event
+    from mumblecode.graphs import SearchAborted, SearchStats, astar
+
+    if limit.get('cancel'):
+        limit = {'cancel': Event()}
+        limit['cancel'].set()
+    stats = SearchStats()
+    # the grid is infinite and the destination unreachable, so only the limit ends the search
+    with pytest.raises(SearchAborted) as raised:
+        next(astar([(0, 0)], lambda n: False, lambda n: ((nb, 1) for nb in directional_neighbors(n)),
+                   stats=stats, **limit))
+    assert raised.value.reason == {'max_expansions': 'max_expansions', 'max_frontier': 'max_frontier',
+                                   'deadline': 'deadline', 'cancel': 'cancelled'}[next(iter(limit))]
+    if 'max_expansions' in limit:
+        assert stats.expansions == 500
+    if 'max_frontier' in limit:
+        assert stats.peak_frontier > 100
+
+
+def test_astar_stats():
+    from mumblecode.graphs import SearchStats, astar
+
+    def edgefinder(node):
+        for nb in directional_neighbors(node):
+            if min(*nb) >= 0 and max(*nb) < 10:
+                yield nb, 1
+
+    stats = SearchStats()
+    cost, _ = next(astar([(0, 0)], lambda n: n == (9, 9), edgefinder, lambda n: 18 - n[0] - n[1], stats=stats))
+    assert cost == 18
+    assert 0 < stats.expansions <= 100
+    assert stats.pushes >= stats.expansions - 1
+    assert stats.stale_pops >= 0 and stats.peak_frontier > 0
+    assert stats.edgefinder_time > 0 and stats.heuristic_time > 0
+    assert list(astar([(0, 0)], lambda n: n == (9, 9), edgefinder, max_expansions=100))[0][0] == 18
+
+
+def test_cost_vector_matches_sum_tuples():
+    import pickle
+    from random import Random
+    from mumblecode.graphs import MaxFirstSumTuple, SumTuple, cost_vector
+
+    rng = Random(0)
+    for max_first, reference in ((False, SumTuple), (True, MaxFirstSumTuple)):
+        vector = cost_vector(3, max_first)
+        assert vector is cost_vector(3, max_first)
+        for _ in range(100):
+            a, b = (tuple(rng.randint(-5, 5) for _ in range(3)) for _ in range(2))
+            assert vector(a) + vector(b) == reference(a) + reference(b)
+            assert type(vector(a) + vector(b)) is vector
+            assert (vector(a) < vector(b)) == (a < b)
+        assert vector((1, 2)) == (1, 2, 0)
+        assert vector((4, 5, 6)) + 0 == 0 + vector((4, 5, 6)) == (4, 5, 6)
+        assert vector((4, 5, 6)) + (1,) == reference((4, 5, 6)) + (1,)
+        assert pickle.loads(pickle.dumps(vector((1, 2, 3)))) == (1, 2, 3)
+        with pytest.raises(TypeError):
+            vector((1, 2, 3)) + (1, 2, 3, 4)
+
+
+@pytest.mark.parametrize('max_first', [False, True])
+def test_multi_cost_graph_matches_astar(max_first):
+    from random import Random
+    from mumblecode.graphs import MaxFirstSumTuple, MultiCostGraph, SumTuple, astar, cost_vector
+
+    rng = Random(1)
+    reference = MaxFirstSumTuple if max_first else SumTuple
+    edges = {
+        node: [(rng.randrange(200), reference((rng.randint(0, 3), rng.randint(1, 9), rng.randint(0, 2))))
+               for _ in range(rng.randint(0, 4))]
+        for node in range(200)
+    }
+    graph = MultiCostGraph.from_edges(((n, nb, c) for n in edges for nb, c in edges[n]), nodes=edges,
+                                      max_first=max_first)
+    assert graph.width == 3
+    destinations = {7, 42, 99, 150}
+    expected = [cost for cost, _ in astar([0, 1], lambda n: n in destinations, lambda n: edges[n])]
+    result = list(graph.dijkstra([0, 1], lambda n: n in destinations))
+    assert [cost for cost, _ in result] == expected
+    assert all(type(cost) is cost_vector(3, max_first) for cost, _ in result)
+    compiled = MultiCostGraph.from_edgefinder([0, 1], lambda n: edges[n], max_first=max_first)
+    assert [cost for cost, _ in compiled.dijkstra([0, 1], lambda n: n in destinations)] == expected
+    assert [cost for cost, _ in astar([0, 1], lambda n: n in destinations, graph.edgefinder)] == expected
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_batch_paths(workers, tmp_path):
+    from functools import partial
+    from random import Random
+    from mumblecode.contraction import ContractionHierarchy
+    from mumblecode.graphs import CompiledGraph, batch_paths, dijkstra_simple
+
+    edges = random_graph(6)
+    graph = CompiledGraph.from_edgefinder(range(200), lambda n: edges[n])
+    rng = Random(6)
+    queries = [('q{}'.format(i), rng.randrange(200), rng.randrange(200)) for i in range(300)]
+    serial = [(query_id, *graph.dijkstra_simple(start, destination)) for query_id, start, destination in queries]
+
+    assert list(batch_paths(queries, graph, workers=workers, chunksize=32)) == serial
+    for (query_id, start, destination), (_, cost, path) in zip(queries, serial):
+        assert cost == dijkstra_simple(start, destination, lambda n: edges[n])[0]
+    assert list(batch_paths(iter(queries), graph, workers=workers, costs_only=True)) == \
+        [(query_id, cost, None) for query_id, cost, _ in serial]
+
+    hierarchy_file = str(tmp_path / 'graph.ch')
+    ContractionHierarchy.build(graph).save(hierarchy_file)
+    loader = partial(ContractionHierarchy.load, hierarchy_file)
+    assert [cost for _, cost, _ in batch_paths(queries, loader, workers=workers)] == [cost for _, cost, _ in serial]
+
+
+def test_batch_paths_streams_queries():
+    from itertools import count, islice
+    from mumblecode.graphs import CompiledGraph, batch_paths
+
+    graph = CompiledGraph.from_edgefinder(range(10), lambda n: [((n + 1) % 10, 1)])
+    read = []
+
+    def queries():
+        for i in count():
+            read.append(i)
+            yield i, i % 10, (i + 3) % 10
+
+    results = batch_paths(queries(), graph, workers=2, costs_only=True, chunksize=8)
+    assert list(islice(results, 20)) == [(i, 3, None) for i in range(20)]
+    results.close()
+    # only a bounded window of chunks was read ahead of the results
+    assert len(read) <= 20 + 8 * 4 + 8
+
+
+def undirected_graph(seed, size=300, edges_per_node=3):
+    from random import Random
+    rng = Random(seed)
+    edges = []
+    for node in range(size):
+        for _ in range(edges_per_node):
+            other = rng.randrange(size)
+            if other != node:
+                edges.append((node, other, rng.randint(1, 50)))
+    adjacency = {node: [] for node in range(size)}
+    for a, b, cost in edges:
+        adjacency[a].append((b, cost))
+        adjacency[b].append((a, cost))
+    return edges, adjacency
+
+
+def check_spanning_forest(tree, adjacency):
+    """Every node reaches a root, and every tree edge is an edge of the graph"""
+    for node in adjacency:
+        seen = set()
+        while tree.parent(node) is not None:
+            assert node not in seen
+            seen.add(node)
+            parent = tree.parent(node)
+            assert (node, tree.costs[tree.index[node]]) in adjacency[parent]
+            node = parent
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_prim_and_kruskal_agree(seed):
+    from mumblecode.graphs import CompiledGraph, kruskal, prim
+
+    edges, adjacency = undirected_graph(seed)
+    # some isolated nodes make it a forest
+    for node in range(300, 305):
+        adjacency[node] = []
+    by_prim = prim(adjacency, lambda n: adjacency[n])
+    by_kruskal = kruskal(edges, nodes=adjacency)
+    compiled = kruskal(CompiledGraph.from_edges(edges, nodes=adjacency))
+    assert len(by_prim) == len(by_kruskal) == 305
+    assert by_prim.total_cost() == by_kruskal.total_cost() == compiled.total_cost()
+    assert len(by_prim.roots()) == len(by_kruskal.roots())
+    assert len(list(by_prim.edges())) == 305 - len(by_prim.roots())
+    for tree in (by_prim, by_kruskal, compiled):
+        check_spanning_forest(tree, adjacency)
+
+
+def test_wilson_spanning_trees_are_uniform():
+    from collections import Counter
+    from random import Random
+    from mumblecode.graphs import wilson
+
+    # the complete graph on 4 nodes has 16 spanning trees
+    adjacency = {a: [(b, 1) for b in range(4) if b != a] for a in range(4)}
+    rng = Random(0)
+    trees = Counter()
+    for _ in range(3200):
+        tree = wilson(range(4), lambda n: adjacency[n], root=0, rng=rng)
+        check_spanning_forest(tree, adjacency)
+        assert tree.roots() == [0]
+        trees[frozenset(frozenset((a, b)) for a, b, _ in tree.edges())] += 1
+    assert len(trees) == 16
+    assert all(130 < seen < 270 for seen in trees.values())
+
+
+def test_wilson_forest():
+    from random import Random
+    from mumblecode.graphs import wilson
+
+    _, adjacency = undirected_graph(1)
+    adjacency[300] = []
+    tree = wilson(adjacency, lambda n: adjacency[n], rng=Random(1))
+    assert len(tree) == 301
+    check_spanning_forest(tree, adjacency)
+    assert 300 in tree.roots()
+
+
+def test_wilson_roots_other_trees_at_lowest_node():
+    from random import Random
+    from mumblecode.graphs import wilson
+
+    adjacency = {0: [(1, 1)], 1: [(0, 1), (2, 1)], 2: [(1, 1)], 3: [(4, 1)], 4: [(3, 1), (5, 1)], 5: [(4, 1)]}
+    tree = wilson(adjacency, lambda n: adjacency[n], root=4, rng=Random(0))
+    assert sorted(tree.roots()) == [0, 4]
+
+
+def test_astar_builds_paths_for_each_destination():
+    from mumblecode.graphs import astar, convert_path
+
+    # a long chain with a shortcut from 0 to 2500
+    def edgefinder(node):
+        if node < 5000:
+            yield node + 1, 1
+        if node == 0:
+            yield 2500, 10
+
+    results = list(astar([0], lambda n: n % 1000 == 999, edgefinder))
+    assert [cost for cost, _ in results] == [509, 999, 1509, 1999, 2509]
+    assert convert_path(results[0][1]) == [0] + list(range(2500, 3000))
+    assert convert_path(results[1][1]) == list(range(1000))
+    assert convert_path(results[4][1]) == [0] + list(range(2500, 5000))
+
+
+def test_astar_shares_paths_between_destinations():
+    from mumblecode.graphs import dijkstra, convert_path
+
+    results = list(dijkstra([0], lambda n: True, lambda node: [(node + 1, 1)] if node < 20000 else []))
+    assert len(results) == 20001
+    # every path extends the one before it rather than being rebuilt from the start
+    assert all(path[1] is previous for (_, path), (_, previous) in zip(results[1:], results))
+    assert convert_path(results[-1][1]) == list(range(20001))
+
+
+def test_compiled_graph_shares_paths_between_destinations():
+    from mumblecode.graphs import CompiledGraph, convert_path
+
+    graph = CompiledGraph.from_edgefinder([0], lambda node: [(node + 1, 1)] if node < 20000 else [])
+    results = list(graph.dijkstra([0], lambda n: True))
+    assert all(path[1] is previous for (_, path), (_, previous) in zip(results[1:], results))
+    assert convert_path(results[-1][1]) == list(range(20001))
@@ -0,0 +1,102 @@
+# coding=utf-8
+from math import sqrt
+from random import Random
+
+import pytest
+
+
+def random_grid(seed, size=40, density=0.3, **kwargs):
+    from mumblecode.grids import Grid
+
+    rng = Random(seed)
+    blocked = bytearray(rng.random() < density for _ in range(size * size))
+    blocked[0] = blocked[-1] = 0
+    return Grid(size, size, blocked, **kwargs)
+
+
+def check_path(grid, cost, path, start, destination, cell_cost=lambda node: 1):
+    from mumblecode.graphs import convert_path
+
+    steps = convert_path(path)
+    assert steps[0] == start and steps[-1] == destination
+    total = 0
+    for (ax, ay), (bx, by) in zip(steps, steps[1:]):
+        assert grid.is_open((bx, by))
+        assert max(abs(ax - bx), abs(ay - by)) == 1
+        if ax != bx and ay != by:
+            assert grid.diagonal and grid.is_open((ax, by)) and grid.is_open((bx, ay))
+            total += sqrt(2) * cell_cost((bx, by))
+        else:
+            total += cell_cost((bx, by))
+    assert total == pytest.approx(cost)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_jump_point_search_matches_astar(seed):
+    from mumblecode.graphs import astar
+
+    grid = random_grid(seed, diagonal=True)
+    start, destination = (0, 0), (39, 39)
+    expected = next(astar([start], lambda n: n == destination, grid.edgefinder, grid.heuristic(destination)),
+                    (None, ()))[0]
+    for cost, path in (grid.astar(start, destination), grid.jump_point_search(start, destination)):
+        if expected is None:
+            assert (cost, path) == (None, ())
+        else:
+            assert cost == pytest.approx(expected)
+            check_path(grid, cost, path, start, destination)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_grid_astar_with_costs(seed):
+    from mumblecode.graphs import dijkstra_simple
+    from mumblecode.grids import Grid
+
+    rng = Random(seed)
+    size = 30
+    blocked = bytearray(rng.random() < 0.2 for _ in range(size * size))
+    blocked[0] = blocked[-1] = 0
+    costs = [rng.randint(1, 5) for _ in range(size * size)]
+    for diagonal in (False, True):
+        grid = Grid(size, size, blocked, costs, diagonal=diagonal)
+        start, destination = (0, 0), (size - 1, size - 1)
+        expected, _ = dijkstra_simple(start, destination, grid.edgefinder)
+        cost, path = grid.find_path(start, destination)
+        if expected is None:
+            assert cost is None
+        else:
+            assert cost == pytest.approx(expected)
+            check_path(grid, cost, path, start, destination, lambda node: costs[node[1] * size + node[0]])
+
+
+def test_grid_from_rows():
+    from mumblecode.graphs import convert_path
+    from mumblecode.grids import Grid
+
+    grid = Grid.from_rows([
+        '....#',
+        '.##.#',
+        '...#.',
+    ])
+    cost, path = grid.astar((0, 0), (3, 1))
+    assert cost == 4
+    assert convert_path(path) == [(0, 0), (1, 0), (2, 0), (3, 0), (3, 1)]
+    assert grid.astar((0, 0), (4, 2)) == (None, ())
+    assert grid.astar((0, 0), (4, 0)) == (None, ())
+    # the diagonal from (3, 1) to (4, 2) would cut the corner of (3, 2)
+    diagonal = Grid.from_rows(['....#', '.##.#', '...#.'], diagonal=True)
+    assert diagonal.jump_point_search((0, 0), (4, 2)) == (None, ())
+    with pytest.raises(ValueError):
+        grid.jump_point_search((0, 0), (3, 1))
+
+
+def test_grid_accepts_numpy_bitmap():
+    np = pytest.importorskip('numpy')
+    from mumblecode.grids import Grid
+
+    blocked = np.zeros((10, 10), dtype=bool)
+    blocked[5, :9] = True
+    grid = Grid(10, 10, blocked, diagonal=True)
+    cost, _ = grid.find_path((0, 0), (0, 9))
+    # around the end of the wall at (9, 5), which has to be passed straight through
+    assert cost == pytest.approx(13 + 7 * sqrt(2))
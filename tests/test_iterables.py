@@ -0,0 +1,195 @@
+# coding=utf-8
+from time import sleep
+
+import pytest
+
+
+def test_timed_grouper_flushes_slow_stream():
+    from mumblecode.iterables import timed_grouper
+
+    def slow():
+        yield 1
+        yield 2
+        sleep(0.3)
+        yield 3
+
+    assert list(timed_grouper(10, 0.05, slow())) == [[1, 2], [3]]
+
+
+def test_timed_grouper_raises_after_yielding():
+    from mumblecode.iterables import timed_grouper
+
+    def broken():
+        yield 1
+        raise RuntimeError("boom")
+
+    it = timed_grouper(10, 5, broken())
+    assert next(it) == [1]
+    with pytest.raises(RuntimeError):
+        next(it)
+
+
+def test_timed_grouper_close_stops_producer():
+    from mumblecode.iterables import timed_grouper
+
+    produced = []
+
+    def endless():
+        n = 0
+        while True:
+            produced.append(n)
+            yield n
+            n += 1
+
+    it = timed_grouper(2, 5, endless())
+    assert next(it) == [0, 1]
+    it.close()
+    sleep(0.1)
+    stopped_at = len(produced)
+    sleep(0.1)
+    assert len(produced) == stopped_at
+
+
+def test_timed_grouper_source_ends_while_waiting():
+    from threading import Thread
+    from mumblecode.iterables import timed_grouper
+
+    def source():
+        yield from range(4)
+        sleep(0.1)  # the consumer is already waiting for the next group when the source ends
+
+    result = []
+    consumer = Thread(target=lambda: result.extend(timed_grouper(2, 5, source())), daemon=True)
+    consumer.start()
+    consumer.join(2)
+    assert not consumer.is_alive()
+    assert result == [[0, 1], [2, 3]]
+
+
+@pytest.mark.parametrize('k', [1, 2, 3, 5, 8, 13, 64])
+@pytest.mark.parametrize('reverse', [False, True])
+def test_collate_matches_heapq_merge(k, reverse):
+    from heapq import merge as heapq_merge
+    from operator import itemgetter
+    from random import Random
+    from mumblecode.iterables import collate
+
+    rng = Random(k)
+    # few distinct keys so that ties between iterators are common
+    feeds = [
+        sorted(((rng.randrange(10), i, j) for j in range(rng.randrange(20))), key=itemgetter(0), reverse=reverse)
+        for i in range(k)
+    ]
+    expected = list(heapq_merge(*feeds, key=itemgetter(0), reverse=reverse))
+    assert list(collate(feeds, key=itemgetter(0), reverse=reverse)) == expected
+
+
+def test_merge_with_key():
+    from mumblecode.iterables import merge
+
+    feeds = [
+        [(1, 'a'), (3, 'a'), (4, 'a')],
+        [(1, 'b'), (2, 'b'), (4, 'b')],
+    ]
+    assert list(merge(feeds, key=lambda x: x[0])) == [(1, 'a'), (2, 'b'), (3, 'a'), (4, 'a')]
+
+
+@pytest.mark.parametrize('unique', [False, True])
+@pytest.mark.parametrize('reverse', [False, True])
+def test_external_sort_multiple_passes(unique, reverse):
+    from itertools import groupby
+    from operator import itemgetter
+    from random import Random
+    from mumblecode.iterables import external_sort
+
+    rng = Random(0)
+    data = [(rng.randrange(500), i) for i in range(5000)]
+    # a couple dozen items per run and three files per merge forces several merge passes
+    result = list(external_sort(
+        iter(data), key=itemgetter(0), reverse=reverse, unique=unique, max_memory=2000, max_files=3
+    ))
+    expected = sorted(data, key=itemgetter(0), reverse=reverse)
+    if unique:
+        expected = [next(g) for _, g in groupby(expected, key=itemgetter(0))]
+    assert result == expected
+
+
+def test_iterator_files_read_across_chunks():
+    import io
+    from random import Random
+    from mumblecode.iterables import BytesIteratorFile, IteratorFile
+
+    rng = Random(0)
+    chunks = [''.join(rng.choice('ab\n') for _ in range(rng.randrange(50))) for _ in range(200)]
+    expected = ''.join(chunks)
+    read_sizes = [rng.randrange(1, 120) for _ in range(len(expected))]
+
+    f = IteratorFile(chunks)
+    assert ''.join(f.read(n) for n in read_sizes) == expected
+    assert f.read() == ''
+
+    f = BytesIteratorFile(chunk.encode() for chunk in chunks)
+    assert b''.join(f.read(n) for n in read_sizes) == expected.encode()
+    assert f.read() == b''
+
+    assert list(IteratorFile(chunks)) == expected.splitlines(keepends=True)
+    text = io.TextIOWrapper(io.BufferedReader(BytesIteratorFile(chunk.encode() for chunk in chunks)))
+    assert list(text) == expected.splitlines(keepends=True)
+
+
+def test_pipeline_overlaps_stages():
+    from threading import Event
+    from mumblecode.iterables import pipeline
+
+    last_stage_started = Event()
+    overlapped = []
+
+    def source():
+        yield 0
+        # run one stage at a time, the last stage would only start once the source is exhausted
+        overlapped.append(last_stage_started.wait(5))
+        yield from range(1, 10)
+
+    def last_step(x):
+        last_stage_started.set()
+        return x
+
+    result = list(pipeline(source()).map(lambda x: x).map(last_step, workers=2))
+    assert result == list(range(10))
+    assert overlapped == [True]
+
+
+def test_pipeline_propagates_exceptions():
+    from mumblecode.iterables import pipeline
+
+    def fail_on_three(x):
+        if x == 3:
+            raise KeyError(x)
+        return x
+
+    results = []
+    with pytest.raises(KeyError):
+        for x in pipeline(range(10)).map(fail_on_three, workers=2).batch(1):
+            results.append(x)
+    assert results == [[0], [1], [2]]
+
+
+def test_pipeline_close_stops_source():
+    from mumblecode.iterables import pipeline
+
+    closed = []
+
+    def endless():
+        try:
+            n = 0
+            while True:
+                yield n
+                n += 1
+        finally:
+            closed.append(True)
+
+    it = iter(pipeline(endless(), depth=2).map(lambda x: x + 1).filter(bool))
+    assert next(it) == 1
+    it.close()
+    sleep(0.2)
+    assert closed == [True]